@@ -0,0 +1,58 @@
+"""
+Per-entity refresh cadence.
+
+Profile, posts, followers and following each have their own refresh
+interval. Stored payloads get a long hard expiry (CACHE_HARD_TTL) and a soft
+freshness timestamp per entity in ``ig:refreshed_at:{username}``, so readers
+keep getting the last good data while a refresh is late or failing, and a
+scheduled refresh runs only the entities whose interval has passed.
+Likers/comments are re-crawled per post after POST_RECRAWL_AGE_SECONDS (see
+api/ig-refresh.py). Helper module for api/ig-refresh.py.
+"""
+
+import os
+import time
+
+ENTITIES = ("profile", "posts", "followers", "following")
+REFRESH_INTERVALS = {
+    "profile": int(os.environ.get("PROFILE_REFRESH_SECONDS", "900")),
+    "posts": int(os.environ.get("POSTS_REFRESH_SECONDS", "3600")),
+    "followers": int(os.environ.get("FOLLOWERS_REFRESH_SECONDS", "21600")),
+    "following": int(os.environ.get("FOLLOWING_REFRESH_SECONDS", "21600")),
+}
+# Stored payloads outlive many missed refreshes; freshness is tracked separately
+CACHE_HARD_TTL = int(os.environ.get("CACHE_HARD_TTL_SECONDS", str(30 * 86400)))
+
+
+def refreshed_key(username: str) -> str:
+    return f"ig:refreshed_at:{username}"
+
+
+def mark_refreshed(r, username: str, entity: str, at: float | None = None):
+    r.hset(refreshed_key(username), entity, at or time.time())
+
+
+def refreshed_at(r, username: str) -> dict:
+    """Last successful refresh time (epoch seconds) per entity."""
+    return {entity: float(value) for entity, value in r.hgetall(refreshed_key(username)).items()}
+
+
+def due_entities(r, username: str, now: float | None = None) -> list:
+    """Entities whose refresh interval has passed (never-refreshed ones are always due)."""
+    now = now or time.time()
+    last = refreshed_at(r, username)
+    return [entity for entity in ENTITIES if now - last.get(entity, 0) >= REFRESH_INTERVALS[entity]]
+
+
+def freshness(r, username: str, now: float | None = None) -> dict:
+    """Per-entity ``{refreshedAt, ageSeconds, stale}`` for status endpoints."""
+    now = now or time.time()
+    last = refreshed_at(r, username)
+    return {
+        entity: {
+            "refreshedAt": last.get(entity),
+            "ageSeconds": round(now - last[entity]) if entity in last else None,
+            "stale": now - last.get(entity, 0) >= REFRESH_INTERVALS[entity],
+        }
+        for entity in ENTITIES
+    }
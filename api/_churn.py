@@ -0,0 +1,113 @@
+"""
+Follower/following churn tracking.
+
+Each published follow list is mirrored into a Redis set of compact user
+ids. The next refresh streams its ids into a fresh set, and Redis computes
+who was gained and lost with SDIFF, so the client holds only the churn
+itself. Every diff is appended to a sorted set scored by refresh time.
+Helper module for api/ig-refresh.py.
+"""
+
+import json
+import os
+import time
+
+CHURN_HISTORY_LIMIT = int(os.environ.get("CHURN_HISTORY_LIMIT", "500"))
+ID_BATCH = 1000
+
+
+def snapshot_key(username: str, kind: str) -> str:
+    return f"ig:{kind}_ids:{username}"
+
+
+def history_key(username: str, kind: str) -> str:
+    return f"ig:churn:{kind}:{username}"
+
+
+def track_ids(r, key: str, ids, batch: int = ID_BATCH):
+    """Pass ``ids`` through unchanged while adding them to the set at ``key``."""
+    r.delete(key)
+    pending = []
+    for user_id in ids:
+        pending.append(user_id)
+        if len(pending) >= batch:
+            r.sadd(key, *pending)
+            pending.clear()
+        yield user_id
+    if pending:
+        r.sadd(key, *pending)
+
+
+def user_rows(r, users_key: str, user_fields: tuple, ids: list) -> list:
+    """Resolve ids to user dicts so history stays readable after users are pruned."""
+    rows = []
+    for start in range(0, len(ids), ID_BATCH):
+        batch = ids[start:start + ID_BATCH]
+        for user_id, raw in zip(batch, r.hmget(users_key, batch)):
+            user = {"id": user_id}
+            if raw:
+                user.update(zip(user_fields, json.loads(raw)))
+            rows.append(user)
+    return rows
+
+
+def record_churn(
+    r,
+    username: str,
+    kind: str,
+    next_key: str,
+    users_key: str,
+    user_fields: tuple,
+    complete: bool = True,
+) -> dict | None:
+    """
+    Diff the ids collected in ``next_key`` against the previous snapshot.
+
+    Gained/lost users are appended to ``ig:churn:{kind}:{username}`` (scored
+    by refresh time, trimmed to CHURN_HISTORY_LIMIT entries) and ``next_key``
+    becomes the new snapshot. Truncated lists (errors or caps) are not
+    diffed, since users past the cut-off would show up as lost. The first
+    snapshot only sets the baseline. Returns the recorded entry, if any.
+    """
+    prev_key = snapshot_key(username, kind)
+    if not complete:
+        r.delete(next_key)
+        print(f"Skipping {kind} churn: list was truncated")
+        return None
+
+    if not r.exists(prev_key):
+        if r.exists(next_key):
+            r.rename(next_key, prev_key)
+        print(f"Recorded {kind} baseline snapshot")
+        return None
+
+    gained = sorted(int(user_id) for user_id in r.sdiff(next_key, prev_key))
+    lost = sorted(int(user_id) for user_id in r.sdiff(prev_key, next_key))
+    now = time.time()
+    entry = {
+        "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+        "gained": user_rows(r, users_key, user_fields, gained),
+        "lost": user_rows(r, users_key, user_fields, lost),
+    }
+
+    pipe = r.pipeline()
+    pipe.zadd(history_key(username, kind), {json.dumps(entry): now})
+    pipe.zremrangebyrank(history_key(username, kind), 0, -CHURN_HISTORY_LIMIT - 1)
+    if r.exists(next_key):
+        pipe.rename(next_key, prev_key)
+    else:
+        pipe.delete(prev_key)
+    pipe.execute()
+    print(f"{kind.capitalize()} churn: +{len(gained)} / -{len(lost)}")
+    return entry
+
+
+def latest_churn(r, username: str, kind: str) -> dict | None:
+    """Most recent churn entry ("new/lost since last refresh")."""
+    entries = r.zrevrange(history_key(username, kind), 0, 0)
+    return json.loads(entries[0]) if entries else None
+
+
+def churn_since(r, username: str, kind: str, since: float) -> list:
+    """All churn entries recorded at or after the ``since`` Unix timestamp, newest first."""
+    return [json.loads(entry) for entry in r.zrevrangebyscore(history_key(username, kind), "+inf", since)]
@@ -0,0 +1,185 @@
+"""
+Engagement graph index.
+
+Inverts the likers, commenters and repliers of the stored posts into one
+row per user in ``ig:engagement:{username}`` (compact user id -> liked and
+commented shortcodes, comment and reply counts) and ranks users by
+weighted engagement in the ``ig:top_fans:{username}`` sorted set. Each
+post's contribution is remembered, so a refresh only applies the
+difference for posts whose engagement changed or that were dropped. Fans
+are joined against the follower snapshot kept by api/_churn.py into
+engaged non-followers (sorted set) and silent followers (set). Helper
+module for api/ig-refresh.py.
+"""
+
+import json
+import os
+
+from _churn import ID_BATCH, snapshot_key
+
+LIKE_WEIGHT = float(os.environ.get("FAN_LIKE_WEIGHT", "1"))
+COMMENT_WEIGHT = float(os.environ.get("FAN_COMMENT_WEIGHT", "3"))
+REPLY_WEIGHT = float(os.environ.get("FAN_REPLY_WEIGHT", "2"))
+
+
+def index_key(username: str) -> str:
+    return f"ig:engagement:{username}"
+
+
+def contributions_key(username: str) -> str:
+    return f"ig:engagement:{username}:posts"
+
+
+def fans_key(username: str) -> str:
+    return f"ig:top_fans:{username}"
+
+
+def nonfollowers_key(username: str) -> str:
+    return f"ig:engaged_nonfollowers:{username}"
+
+
+def silent_key(username: str) -> str:
+    return f"ig:silent_followers:{username}"
+
+
+def post_contribution(post: dict, exclude: int | None = None) -> dict:
+    """``{user id: [liked, comments, replies]}`` for one compact post."""
+    counts = {}
+
+    def entry(user_id):
+        return counts.setdefault(str(user_id), [0, 0, 0])
+
+    for user_id in post.get("likerIds", []):
+        entry(user_id)[0] = 1
+    for comment in post.get("comments", []):
+        entry(comment["ownerId"])[1] += 1
+        for reply in comment.get("replies", []):
+            entry(reply["ownerId"])[2] += 1
+    counts.pop(str(exclude), None)
+    return counts
+
+
+def fan_score(row: dict) -> float:
+    return len(row["liked"]) * LIKE_WEIGHT + row["comments"] * COMMENT_WEIGHT + row["replies"] * REPLY_WEIGHT
+
+
+def apply_contribution(row: dict, shortcode: str, counts: list, sign: int):
+    liked, comments, replies = counts
+    if liked:
+        if sign > 0:
+            row["liked"].append(shortcode)
+        elif shortcode in row["liked"]:
+            row["liked"].remove(shortcode)
+    if comments or replies:
+        if sign > 0:
+            row["commented"].append(shortcode)
+        elif shortcode in row["commented"]:
+            row["commented"].remove(shortcode)
+    row["comments"] += sign * comments
+    row["replies"] += sign * replies
+
+
+def update_engagement_index(r, username: str, posts: list, exclude: int | None = None) -> dict:
+    """
+    Bring the index in line with ``posts`` (the full stored payload).
+
+    Only users touched by a changed, new or dropped post are read and
+    rewritten. ``exclude`` is the account's own user id, so its replies
+    don't rank it as a fan. Returns ``{posts, users}`` change counts.
+    """
+    stored = r.hgetall(contributions_key(username))
+    current = {post["shortcode"]: post_contribution(post, exclude) for post in posts}
+    encoded = {shortcode: json.dumps(counts, sort_keys=True) for shortcode, counts in current.items()}
+    changed = [shortcode for shortcode in encoded if stored.get(shortcode) != encoded[shortcode]]
+    dropped = [shortcode for shortcode in stored if shortcode not in current]
+    if not changed and not dropped:
+        return {"posts": 0, "users": 0}
+
+    deltas = []
+    for shortcode in changed + dropped:
+        old = json.loads(stored.get(shortcode) or "{}")
+        new = current.get(shortcode, {})
+        for user_id in old.keys() | new.keys():
+            if old.get(user_id) != new.get(user_id):
+                deltas.append((user_id, shortcode, old.get(user_id), new.get(user_id)))
+
+    user_ids = list({user_id for user_id, *_ in deltas})
+    rows = {}
+    for start in range(0, len(user_ids), ID_BATCH):
+        batch = user_ids[start:start + ID_BATCH]
+        for user_id, raw in zip(batch, r.hmget(index_key(username), batch)):
+            rows[user_id] = json.loads(raw) if raw else {"liked": [], "commented": [], "comments": 0, "replies": 0}
+    for user_id, shortcode, old, new in deltas:
+        if old:
+            apply_contribution(rows[user_id], shortcode, old, -1)
+        if new:
+            apply_contribution(rows[user_id], shortcode, new, 1)
+
+    pipe = r.pipeline()
+    for user_id, row in rows.items():
+        score = fan_score(row)
+        if score > 0:
+            pipe.hset(index_key(username), user_id, json.dumps(row))
+            pipe.zadd(fans_key(username), {user_id: score})
+        else:
+            pipe.hdel(index_key(username), user_id)
+            pipe.zrem(fans_key(username), user_id)
+    if changed:
+        pipe.hset(contributions_key(username), mapping={shortcode: encoded[shortcode] for shortcode in changed})
+    if dropped:
+        pipe.hdel(contributions_key(username), *dropped)
+    pipe.execute()
+    print(f"Engagement index: {len(changed) + len(dropped)} posts, {len(rows)} users updated")
+    return {"posts": len(changed) + len(dropped), "users": len(rows)}
+
+
+def refresh_follower_joins(r, username: str) -> dict | None:
+    """
+    Rebuild engaged non-followers and silent followers from the top fans
+    and the last complete follower snapshot. Returns their sizes, or None
+    (keeping the previous joins) when there is no snapshot yet.
+    """
+    followers = snapshot_key(username, "followers")
+    if not r.exists(followers):
+        return None
+
+    fan_ids = set()
+    nonfollowers_next = f"{nonfollowers_key(username)}:next"
+    silent_next = f"{silent_key(username)}:next"
+    r.delete(nonfollowers_next, silent_next)
+    fans = r.zrange(fans_key(username), 0, -1, withscores=True)
+    engaged_nonfollowers = 0
+    for start in range(0, len(fans), ID_BATCH):
+        batch = fans[start:start + ID_BATCH]
+        fan_ids.update(user_id for user_id, _ in batch)
+        following_back = r.smismember(followers, [user_id for user_id, _ in batch])
+        outside = {user_id: score for (user_id, score), member in zip(batch, following_back) if not member}
+        if outside:
+            r.zadd(nonfollowers_next, outside)
+            engaged_nonfollowers += len(outside)
+
+    silent = 0
+    pending = []
+    for user_id in r.sscan_iter(followers, count=ID_BATCH):
+        if user_id not in fan_ids:
+            pending.append(user_id)
+        if len(pending) >= ID_BATCH:
+            r.sadd(silent_next, *pending)
+            silent += len(pending)
+            pending.clear()
+    if pending:
+        r.sadd(silent_next, *pending)
+        silent += len(pending)
+
+    pipe = r.pipeline()
+    for next_key, key, size in (
+        (nonfollowers_next, nonfollowers_key(username), engaged_nonfollowers),
+        (silent_next, silent_key(username), silent),
+    ):
+        if size:
+            pipe.rename(next_key, key)
+        else:
+            pipe.delete(key)
+    pipe.execute()
+    print(f"Engaged non-followers: {engaged_nonfollowers}, silent followers: {silent}")
+    return {"engagedNonFollowers": engaged_nonfollowers, "silentFollowers": silent}
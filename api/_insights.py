@@ -0,0 +1,193 @@
+"""
+Precomputed insights for the dashboard.
+
+Computes engagement, content, timing and hashtag aggregates once per
+refresh from the stored posts payload, so /api/data/stats and the insights
+page read one small key instead of scanning every post. Helper module for
+api/ig-refresh.py (the leading underscore keeps Vercel from serving it).
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+DAY_NAMES = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+TYPENAMES = ["GraphImage", "GraphVideo", "GraphSidecar"]
+TOP_POSTS = 10
+TOP_HASHTAGS = 50
+ROLLING_WINDOW = 5
+
+# Fields kept for posts listed in top-post tables
+SUMMARY_FIELDS = ("id", "shortcode", "typename", "mediaType", "caption", "timestamp", "likeCount", "commentCount")
+
+
+def post_summary(post: dict) -> dict:
+    return {field: post.get(field) for field in SUMMARY_FIELDS}
+
+
+def rounded(value) -> int:
+    """Round like JavaScript's Math.round for the non-negative values used here."""
+    return int(np.floor(value + 0.5))
+
+
+def best_bucket(values: np.ndarray) -> int:
+    """Index of the largest value; ties go to the first, like a stable sort."""
+    return int(np.argmax(values))
+
+
+def compute_insights(profile: dict | None, posts: list) -> dict:
+    """Compute all dashboard aggregates for ``posts`` using NumPy column arrays."""
+    insights = {
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "profile": None,
+        "engagement": None,
+        "content": None,
+        "timing": None,
+        "engagementTiming": None,
+        "hashtags": [],
+        "postsByMonth": [],
+        "topPostsByLikes": [],
+        "topPostsByComments": [],
+        "mediaTypes": {},
+        "rollingEngagement": [],
+    }
+    followers = (profile or {}).get("followersCount") or 0
+
+    if profile:
+        insights["profile"] = {
+            "username": profile["username"],
+            "followersCount": profile["followersCount"],
+            "followingCount": profile["followingCount"],
+            "postsCount": profile.get("postsCount") or 0,
+        }
+
+    if not posts:
+        return insights
+
+    # Column extraction
+    likes = np.array([p["likeCount"] for p in posts], dtype=np.int64)
+    comments = np.array([p["commentCount"] for p in posts], dtype=np.int64)
+    views = np.array([p.get("videoViewCount") or np.nan for p in posts], dtype=np.float64)
+    typenames = np.array([p.get("typename") or "" for p in posts])
+    has_location = np.array([bool(p.get("location")) for p in posts])
+    stamps = np.array([p["timestamp"].rstrip("Z") for p in posts], dtype="datetime64[s]")
+    seconds = stamps.astype(np.int64)
+    days = seconds // 86400
+    weekday = (days + 4) % 7  # 1970-01-01 was a Thursday; 0 = Sunday
+    hour = (seconds // 3600) % 24
+    count = len(posts)
+
+    total_likes = int(likes.sum())
+    total_comments = int(comments.sum())
+    insights["engagement"] = {
+        "totalLikes": total_likes,
+        "totalComments": total_comments,
+        "totalVideoViews": int(np.nansum(views)),
+        "avgLikesPerPost": rounded(total_likes / count),
+        "avgCommentsPerPost": rounded(total_comments / count),
+        "medianLikes": rounded(float(np.median(likes))),
+        "engagementRate": round((total_likes + total_comments) / count / followers * 100, 2) if followers else 0,
+    }
+
+    # Hashtags: flatten, then count and sum likes per tag in one pass
+    tag_lists = [p.get("captionHashtags") or [] for p in posts]
+    flat_tags = np.array([tag for tags in tag_lists for tag in tags])
+    hashtags = []
+    if flat_tags.size:
+        tag_likes = np.repeat(likes, [len(tags) for tags in tag_lists])
+        unique_tags, first_seen, inverse = np.unique(flat_tags, return_index=True, return_inverse=True)
+        tag_counts = np.bincount(inverse)
+        tag_like_sums = np.bincount(inverse, weights=tag_likes)
+        # Most used first; ties keep first-appearance order
+        order = np.lexsort((first_seen, -tag_counts))
+        hashtags = [
+            {
+                "tag": str(unique_tags[i]),
+                "count": int(tag_counts[i]),
+                "avgLikes": rounded(tag_like_sums[i] / tag_counts[i]),
+            }
+            for i in order[:TOP_HASHTAGS]
+        ]
+    insights["hashtags"] = hashtags
+
+    insights["content"] = {
+        "totalPosts": count,
+        "imagePosts": int(np.count_nonzero(typenames == "GraphImage")),
+        "videoPosts": int(np.count_nonzero(typenames == "GraphVideo")),
+        "carouselPosts": int(np.count_nonzero(typenames == "GraphSidecar")),
+        "postsWithLocation": int(np.count_nonzero(has_location)),
+        "topHashtags": [{"tag": h["tag"], "count": h["count"]} for h in hashtags[:10]],
+    }
+
+    # Timing histograms
+    day_counts = np.bincount(weekday, minlength=7)
+    hour_counts = np.bincount(hour, minlength=24)
+    day_likes = np.bincount(weekday, weights=likes, minlength=7)
+    hour_likes = np.bincount(hour, weights=likes, minlength=24)
+    day_avg = np.divide(day_likes, day_counts, out=np.zeros(7), where=day_counts > 0)
+    hour_avg = np.divide(hour_likes, hour_counts, out=np.zeros(24), where=hour_counts > 0)
+
+    insights["timing"] = {
+        "postsByDayOfWeek": {DAY_NAMES[d]: int(day_counts[d]) for d in range(7)},
+        "postsByHour": {str(h): int(hour_counts[h]) for h in range(24)},
+        "bestDayToPost": DAY_NAMES[best_bucket(day_counts)],
+        "bestHourToPost": best_bucket(hour_counts),
+    }
+    insights["engagementTiming"] = {
+        "byDay": [
+            {"day": DAY_NAMES[d], "count": int(day_counts[d]), "avgLikes": rounded(day_avg[d])}
+            for d in range(7)
+        ],
+        "byHour": [
+            {"hour": h, "count": int(hour_counts[h]), "avgLikes": rounded(hour_avg[h])}
+            for h in range(24)
+        ],
+        "bestDay": DAY_NAMES[best_bucket(np.floor(day_avg + 0.5))],
+        "bestHour": best_bucket(np.floor(hour_avg + 0.5)),
+    }
+
+    # Posts per month (UTC), newest first
+    months, month_counts = np.unique(stamps.astype("datetime64[M]"), return_counts=True)
+    insights["postsByMonth"] = [
+        {"month": str(month), "count": int(n)}
+        for month, n in zip(months[::-1], month_counts[::-1])
+    ]
+
+    # Top posts (stable, so ties keep payload order)
+    by_likes = np.argsort(-likes, kind="stable")[:TOP_POSTS]
+    by_comments = np.argsort(-comments, kind="stable")[:TOP_POSTS]
+    insights["topPostsByLikes"] = [post_summary(posts[i]) for i in by_likes]
+    insights["topPostsByComments"] = [post_summary(posts[i]) for i in by_comments]
+
+    # Per-media-type medians
+    for typename in TYPENAMES:
+        mask = typenames == typename
+        if not mask.any():
+            continue
+        type_views = views[mask]
+        insights["mediaTypes"][typename] = {
+            "count": int(mask.sum()),
+            "medianLikes": float(np.median(likes[mask])),
+            "medianComments": float(np.median(comments[mask])),
+            "medianVideoViews": float(np.nanmedian(type_views)) if np.isfinite(type_views).any() else None,
+        }
+
+    # Rolling engagement rate over the last ROLLING_WINDOW posts, oldest first
+    if followers:
+        order = np.argsort(seconds, kind="stable")
+        rate = (likes[order] + comments[order]) / followers * 100
+        cumulative = np.concatenate(([0.0], np.cumsum(rate)))
+        idx = np.arange(1, count + 1)
+        start = np.maximum(idx - ROLLING_WINDOW, 0)
+        rolling = (cumulative[idx] - cumulative[start]) / (idx - start)
+        insights["rollingEngagement"] = [
+            {
+                "shortcode": posts[i]["shortcode"],
+                "timestamp": posts[i]["timestamp"],
+                "engagementRate": round(float(r), 3),
+                "rollingEngagementRate": round(float(avg), 3),
+            }
+            for i, r, avg in zip(order, rate, rolling)
+        ]
+
+    return insights
@@ -0,0 +1,112 @@
+"""
+Refresh job records.
+
+A POST to api/ig-refresh creates a job (or joins the active one) and
+returns 202 right away; a worker runs the pipeline and records the outcome
+here. ``ig:refresh_job:active`` points at the queued or running job, so
+concurrent triggers coalesce into one crawl. Live per-stage progress is
+published by the refresh lease (api/_lease.py). Helper module for
+api/ig-refresh.py.
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+
+JOB_TTL = int(os.environ.get("REFRESH_JOB_TTL_SECONDS", "86400"))
+# Upper bound on how long one job may stay active (queued or running)
+JOB_TIMEOUT = int(os.environ.get("REFRESH_JOB_TIMEOUT_SECONDS", "900"))
+
+ACTIVE_KEY = "ig:refresh_job:active"
+LATEST_KEY = "ig:refresh_job:latest"
+
+
+# KEYS: active pointer. ARGV: job id, timeout s, job key prefix.
+# Returns the active job id: the given one if it claimed the pointer.
+CLAIM_SCRIPT = """
+local active = redis.call('get', KEYS[1])
+if active and redis.call('exists', ARGV[3] .. active) == 1 then
+    return active
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return ARGV[1]
+"""
+
+
+def job_key(job_id: str) -> str:
+    return f"ig:refresh_job:{job_id}"
+
+
+def utc_now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def load_job(r, job_id: str | None) -> dict | None:
+    if not job_id:
+        return None
+    return json.loads(r.get(job_key(job_id)) or "null")
+
+
+def save_job(r, job: dict):
+    r.setex(job_key(job["id"]), JOB_TTL, json.dumps(job))
+
+
+def update_job(r, job_id: str, **fields) -> dict | None:
+    job = load_job(r, job_id)
+    if job is None:
+        return None
+    job.update(fields)
+    save_job(r, job)
+    return job
+
+
+def create_or_join_job(r, accounts: list, entities) -> tuple:
+    """
+    Return ``(job, created)``. A new job refreshing ``entities`` (a list, or
+    "due" for whatever is due per account) of ``accounts`` is only created
+    when no other job is queued or running; otherwise the active job is
+    returned, whatever it covers.
+
+    The job record is written before the active pointer is claimed, so a
+    pointer always has its record; the pointer is only taken over when its
+    job record has expired.
+    """
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "status": "queued",
+        "accounts": accounts,
+        "entities": entities,
+        "createdAt": utc_now(),
+        "startedAt": None,
+        "finishedAt": None,
+        "stages": {},
+        "result": None,
+        "error": None,
+    }
+    save_job(r, job)
+    while True:
+        active_id = r.register_script(CLAIM_SCRIPT)(
+            keys=[ACTIVE_KEY], args=[job["id"], JOB_TIMEOUT, job_key("")]
+        )
+        if active_id == job["id"]:
+            r.set(LATEST_KEY, job["id"], ex=JOB_TTL)
+            return job, True
+        active = load_job(r, active_id)
+        if active is not None:
+            r.delete(job_key(job["id"]))
+            return active, False
+        # The active job's record expired since the claim; try again
+
+
+def claim_job(r, job_id: str) -> bool:
+    """True for exactly one caller per job, so a job never runs twice."""
+    return bool(r.set(f"{job_key(job_id)}:claim", 1, nx=True, ex=JOB_TTL))
+
+
+def finish_job(r, job_id: str, status: str, **fields) -> dict | None:
+    """Record the final state and free the active slot if this job holds it."""
+    job = update_job(r, job_id, status=status, finishedAt=utc_now(), **fields)
+    if r.get(ACTIVE_KEY) == job_id:
+        r.delete(ACTIVE_KEY)
+    return job
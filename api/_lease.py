@@ -0,0 +1,198 @@
+"""
+Refresh lease with heartbeat and progress reporting.
+
+A refresh holds ``ig:refresh_lock`` (SET NX with a random owner token) for
+its whole run. A background thread extends the lease every
+LEASE_HEARTBEAT_SECONDS and republishes progress, so long crawls keep the
+lock and a crashed invocation frees it within LEASE_TTL_SECONDS. Extension
+and release only act if the caller still owns the lock; a refresh whose
+lease was taken over, or has run out since its last successful heartbeat
+(so another refresh may take it), stops at its next ``check`` instead of
+overwriting the new holder's data. Helper module for api/ig-refresh.py.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+LEASE_TTL = int(os.environ.get("LEASE_TTL_SECONDS", "90"))
+LEASE_HEARTBEAT = int(os.environ.get("LEASE_HEARTBEAT_SECONDS", "20"))
+STATUS_TTL = 300
+
+LOCK_KEY = "ig:refresh_lock"
+STATUS_KEY = "ig:refresh_status"
+PROGRESS_KEY = "ig:refresh_progress"
+
+# KEYS: lock, status, progress. ARGV: token, ttl ms, progress JSON
+EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('pexpire', KEYS[1], ARGV[2])
+redis.call('set', KEYS[2], 'running', 'PX', ARGV[2])
+redis.call('set', KEYS[3], ARGV[3], 'PX', ARGV[2])
+return 1
+"""
+
+# KEYS: lock, status, progress. ARGV: token, status, status ttl s, progress JSON
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('del', KEYS[1])
+redis.call('set', KEYS[2], ARGV[2], 'EX', ARGV[3])
+redis.call('set', KEYS[3], ARGV[4], 'EX', ARGV[3])
+return 1
+"""
+
+
+class LeaseLost(Exception):
+    """Raised by ``check`` once another refresh has taken over the lease."""
+
+
+def utc_now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class RefreshLease:
+    """
+    Owner-checked refresh lock that also tracks per-stage progress.
+
+    Stages report through ``update``/``advance``; progress is written to
+    ``ig:refresh_progress`` on every heartbeat rather than on every item,
+    and immediately when a stage changes state or publishes data.
+    """
+
+    def __init__(self, r, ttl: int = LEASE_TTL, heartbeat: int = LEASE_HEARTBEAT):
+        self.r = r
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.token = uuid.uuid4().hex
+        self.lost = False
+        self._expires = 0.0
+        self._extend = r.register_script(EXTEND_SCRIPT)
+        self._release = r.register_script(RELEASE_SCRIPT)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._progress = {"startedAt": utc_now(), "heartbeatAt": None, "stages": {}}
+
+    def acquire(self) -> bool:
+        """Take the lease and start the heartbeat. False if another refresh holds it."""
+        if not self.r.set(LOCK_KEY, self.token, nx=True, ex=self.ttl):
+            return False
+        self.beat()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def update(
+        self,
+        stage: str,
+        state: str | None = None,
+        done: int | None = None,
+        total: int | None = None,
+        published: bool | None = None,
+    ):
+        """
+        Record a stage's state ("running", "done", "checkpointed", "deferred",
+        "failed"), counts, and whether its (possibly partial) data is readable.
+        """
+        with self._lock:
+            entry = self._progress["stages"].setdefault(
+                stage, {"state": "running", "done": 0, "total": None, "published": False}
+            )
+            changed = (state is not None and state != entry["state"]) or \
+                (published is not None and published != entry["published"])
+            if state is not None:
+                entry["state"] = state
+            if done is not None:
+                entry["done"] = done
+            if total is not None:
+                entry["total"] = total
+            if published is not None:
+                entry["published"] = published
+        if changed and self._thread is not None:
+            self.beat()
+
+    def advance(self, stage: str, count: int = 1):
+        """Add ``count`` items done to ``stage``."""
+        with self._lock:
+            entry = self._progress["stages"].setdefault(
+                stage, {"state": "running", "done": 0, "total": None, "published": False}
+            )
+            entry["done"] += count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            progress = json.loads(json.dumps(self._progress))
+        running = [name for name, entry in progress["stages"].items() if entry["state"] == "running"]
+        progress["stage"] = running[0] if len(running) == 1 else (running or None)
+        return progress
+
+    def beat(self) -> bool:
+        """Extend the lease and publish progress. Marks the lease lost if it was taken over."""
+        with self._lock:
+            self._progress["heartbeatAt"] = utc_now()
+        expires = time.monotonic() + self.ttl
+        ok = self._extend(
+            keys=[LOCK_KEY, STATUS_KEY, PROGRESS_KEY],
+            args=[self.token, self.ttl * 1000, json.dumps(self.snapshot())],
+        )
+        if ok:
+            self._expires = expires
+        elif not self.lost:
+            self.lost = True
+            print("Refresh lease lost; another refresh may be running")
+        return bool(ok)
+
+    def check(self):
+        """Raise LeaseLost if a heartbeat found the lease taken over or it expired since the last one."""
+        if not self.lost and time.monotonic() >= self._expires:
+            self.lost = True
+            print("Refresh lease expired; another refresh may take over")
+        if self.lost:
+            raise LeaseLost("Refresh lease lost to another refresh")
+
+    def _run(self):
+        while not self._stopped.wait(self.heartbeat):
+            try:
+                self.beat()
+            except Exception as e:
+                print(f"Lease heartbeat failed: {e}")
+
+    def release(self, status: str) -> bool:
+        """Stop the heartbeat and, if still the owner, free the lock and set the final status."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return bool(self._release(
+            keys=[LOCK_KEY, STATUS_KEY, PROGRESS_KEY],
+            args=[self.token, status, STATUS_TTL, json.dumps(self.snapshot())],
+        ))
+
+
+class AccountProgress:
+    """Reports one account's stages of a batch refresh on a shared lease as ``{account}/{stage}``."""
+
+    def __init__(self, lease: RefreshLease, account: str):
+        self.lease = lease
+        self.account = account
+
+    def update(self, stage: str, *args, **kwargs):
+        self.lease.update(f"{self.account}/{stage}", *args, **kwargs)
+
+    def advance(self, stage: str, count: int = 1):
+        self.lease.advance(f"{self.account}/{stage}", count)
+
+    def check(self):
+        self.lease.check()
+
+
+def read_progress(r) -> dict | None:
+    """Progress of the current (or last finished) refresh."""
+    return json.loads(r.get(PROGRESS_KEY) or "null")
+
@@ -0,0 +1,235 @@
+"""
+Content-addressed media cache.
+
+Instagram CDN URLs are signed and expire, so with MEDIA_CACHE on, the
+images a refresh references (profile pictures, post images and sidecar
+frames) are downloaded into Redis and the payloads point at
+``/api/media/{digest}`` (src/app/api/media/[digest]/route.ts) instead.
+
+Only JPEG, PNG, WebP and GIF images are cached (by content type and
+signature bytes, since they are served from the dashboard's origin). Each
+image is stored once under the hash of its bytes in ``ig:media:{digest}``,
+a hash of its content type, the original and WebP thumbnails per
+MEDIA_THUMBNAIL_SIZES (with Pillow installed; without it only originals
+are stored). ``ig:media_urls`` maps a CDN URL without
+its signature parameters to the digest, so an image already cached is
+neither downloaded nor rewritten again and its payload stays unchanged.
+Referenced media has its MEDIA_TTL_SECONDS extended on every refresh.
+Helper module for api/ig-refresh.py.
+"""
+
+import hashlib
+import importlib.util
+import io
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from _metrics import metrics
+
+MEDIA_CACHE = os.environ.get("MEDIA_CACHE", "false").lower() == "true"
+MEDIA_WORKERS = int(os.environ.get("MEDIA_WORKERS", "8"))
+# Downloads per refresh; the rest keep their CDN URLs until the next refresh
+MEDIA_MAX_DOWNLOADS = int(os.environ.get("MEDIA_MAX_DOWNLOADS", "500"))
+MEDIA_MAX_BYTES = int(os.environ.get("MEDIA_MAX_BYTES", str(8 * 1024 * 1024)))
+MEDIA_TIMEOUT = float(os.environ.get("MEDIA_TIMEOUT_SECONDS", "10"))
+MEDIA_TTL = int(os.environ.get("MEDIA_TTL_SECONDS", str(30 * 86400)))
+THUMBNAIL_SIZES = [int(size) for size in os.environ.get("MEDIA_THUMBNAIL_SIZES", "64,320").split(",") if size]
+THUMBNAIL_QUALITY = 80
+
+MEDIA_PREFIX = "/api/media/"
+URLS_KEY = "ig:media_urls"
+# Payload fields holding image URLs (video URLs are left on the CDN)
+IMAGE_FIELDS = ("profilePicUrl", "mediaUrl", "displayUrl")
+IMAGE_LIST_FIELDS = ("mediaUrls",)
+# CDN query parameters that sign or route a URL rather than select the image
+VOLATILE_PARAMS = ("oh", "oe", "ccb", "edm", "efg", "ig_cache_key")
+USER_AGENT = "Mozilla/5.0 (compatible; coolfollowers-media/1.0)"
+# Raster formats served from /api/media (mirrored in src/app/api/media/[digest]/route.ts)
+RASTER_TYPES = ("image/jpeg", "image/png", "image/webp", "image/gif")
+
+
+def media_key(digest: str) -> str:
+    return f"ig:media:{digest}"
+
+
+def url_key(url: str) -> str:
+    """``url`` without its signature parameters, stable across refreshes."""
+    parts = urlsplit(url)
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parts.query)
+        if name not in VOLATILE_PARAMS and not name.startswith("_nc_")
+    )
+    return parts.netloc + parts.path + ("?" + urlencode(params) if params else "")
+
+
+def sniff_type(body: bytes) -> str | None:
+    """The RASTER_TYPES entry ``body``'s signature bytes match, if any."""
+    if body.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if body.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if body[:4] == b"RIFF" and body[8:12] == b"WEBP":
+        return "image/webp"
+    if body[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
+
+
+def download(url: str) -> tuple:
+    """``(body, content type)`` of a raster image URL, up to MEDIA_MAX_BYTES."""
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=MEDIA_TIMEOUT) as response:
+        content_type = response.headers.get_content_type()
+        body = response.read(MEDIA_MAX_BYTES + 1)
+    if content_type not in RASTER_TYPES:
+        raise ValueError(f"not a raster image ({content_type})")
+    if len(body) > MEDIA_MAX_BYTES:
+        raise ValueError(f"larger than {MEDIA_MAX_BYTES} bytes")
+    # The stored type is what the bytes are, whatever the header claimed
+    sniffed = sniff_type(body)
+    if sniffed is None:
+        raise ValueError(f"body is not a {content_type} image")
+    return body, sniffed
+
+
+def make_thumbnails(body: bytes) -> dict:
+    """``{size: WebP bytes}`` for each thumbnail size smaller than the image; empty without Pillow."""
+    if not THUMBNAIL_SIZES or importlib.util.find_spec("PIL") is None:
+        return {}
+    from PIL import Image
+
+    thumbnails = {}
+    try:
+        with Image.open(io.BytesIO(body)) as image:
+            image.load()
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            for size in sorted(THUMBNAIL_SIZES):
+                if max(image.size) <= size:
+                    break
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size))
+                out = io.BytesIO()
+                thumbnail.save(out, "WEBP", quality=THUMBNAIL_QUALITY)
+                thumbnails[size] = out.getvalue()
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not make thumbnails: {e}")
+    return thumbnails
+
+
+class MediaCache:
+    """
+    One refresh's view of the media cache (safe to share between threads).
+
+    ``rewrite`` maps URLs already cached and remembers the others; ``sync``
+    downloads what was remembered and extends the TTL of everything the
+    refresh referenced.
+    """
+
+    def __init__(self, r):
+        self.r = r
+        mapping = r.hgetall(URLS_KEY)
+        digests = list(set(mapping.values()))
+        pipe = r.pipeline(transaction=False)
+        for digest in digests:
+            pipe.exists(media_key(digest))
+        present = {digest for digest, exists in zip(digests, pipe.execute()) if exists}
+        # Mappings whose media expired are downloaded again
+        self.known = {key: digest for key, digest in mapping.items() if digest in present}
+        self.wanted = {}
+        self.referenced = set()
+        self._lock = threading.Lock()
+
+    def rewrite(self, url: str | None) -> str | None:
+        """The cached asset for ``url`` if there is one, else ``url`` (queued for ``sync``)."""
+        if not url:
+            return url
+        if url.startswith(MEDIA_PREFIX):
+            with self._lock:
+                self.referenced.add(urlsplit(url).path[len(MEDIA_PREFIX):])
+            return url
+        if not url.startswith(("http://", "https://")):
+            return url
+        key = url_key(url)
+        with self._lock:
+            digest = self.known.get(key)
+            if digest is None:
+                self.wanted[key] = url
+                return url
+            self.referenced.add(digest)
+        return MEDIA_PREFIX + digest
+
+    def rewrite_payload(self, data):
+        """Copy of ``data`` with every image URL field passed through ``rewrite``."""
+        if isinstance(data, list):
+            return [self.rewrite_payload(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+        rewritten = {}
+        for field, value in data.items():
+            if field in IMAGE_FIELDS and isinstance(value, str):
+                rewritten[field] = self.rewrite(value)
+            elif field in IMAGE_LIST_FIELDS and isinstance(value, list):
+                rewritten[field] = [self.rewrite(url) if isinstance(url, str) else url for url in value]
+            else:
+                rewritten[field] = self.rewrite_payload(value)
+        return rewritten
+
+    def fetch(self, url: str) -> str | None:
+        """Download ``url`` and store it unless its content is cached already; returns its digest."""
+        try:
+            body, content_type = download(url)
+        except Exception as e:
+            print(f"Warning: could not cache {url}: {e}")
+            metrics.incr("errors")
+            return None
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        key = media_key(digest)
+        metrics.incr("items")
+        # Same bytes under another URL: keep the stored copy
+        if self.r.exists(key):
+            metrics.incr("skippedWrites")
+            return digest
+        fields = {"type": content_type, "orig": body}
+        fields.update({f"w{size}": thumbnail for size, thumbnail in make_thumbnails(body).items()})
+        pipe = self.r.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, MEDIA_TTL)
+        pipe.execute()
+        metrics.incr("bytes", sum(len(value) for value in fields.values() if isinstance(value, bytes)))
+        return digest
+
+    def sync(self) -> int:
+        """
+        Download up to MEDIA_MAX_DOWNLOADS uncached images on MEDIA_WORKERS
+        threads and extend the TTL of all referenced media. Returns the
+        number of URLs newly mapped (payloads need rewriting when > 0).
+        """
+        with self._lock:
+            wanted = list(self.wanted.items())
+            self.wanted = {}
+        batch = wanted[:MEDIA_MAX_DOWNLOADS]
+        bind = {"initializer": metrics.bind, "initargs": (metrics.account,)}
+        with ThreadPoolExecutor(max_workers=max(1, MEDIA_WORKERS), **bind) as pool:
+            digests = list(pool.map(self.fetch, [url for _, url in batch]))
+        mapped = {key: digest for (key, _), digest in zip(batch, digests) if digest}
+
+        with self._lock:
+            self.known.update(mapped)
+            self.referenced.update(mapped.values())
+            referenced = list(self.referenced)
+        pipe = self.r.pipeline(transaction=False)
+        if mapped:
+            pipe.hset(URLS_KEY, mapping=mapped)
+        pipe.expire(URLS_KEY, MEDIA_TTL)
+        for digest in referenced:
+            pipe.expire(media_key(digest), MEDIA_TTL)
+        pipe.execute()
+        print(
+            f"Media cache: {len(mapped)} cached, {len(batch) - len(mapped)} failed, "
+            f"{len(wanted) - len(batch)} deferred, {len(referenced)} referenced"
+        )
+        return len(mapped)
@@ -0,0 +1,158 @@
+"""
+Per-stage refresh instrumentation.
+
+Counters are attributed to the stage running on the current thread (set
+with ``metrics.stage``), so work spread over the stage and engagement pools
+is still split by profile/posts/likers/comments/followers/following. A
+batch refresh keeps one run per account: threads are bound to an account
+with ``metrics.bind`` (also usable as a pool initializer). One compact record
+per refresh is pushed to ``ig:refresh_metrics:{username}`` and trimmed to
+METRICS_HISTORY entries. Helper module for api/ig-refresh.py.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_HISTORY = int(os.environ.get("METRICS_HISTORY", "50"))
+
+# requests: Instagram queries issued; rateWaitMs: time blocked on the shared limiter;
+# items: entities yielded; retries: 429s and restarted crawls; errors: exceptions
+# swallowed by a stage; bytes/redisWrites/redisWriteMs: encoded payloads written;
+# skippedWrites: payloads left in place because their content hash was unchanged
+COUNTERS = (
+    "requests", "rateWaitMs", "items", "retries", "errors", "bytes", "redisWrites", "redisWriteMs", "skippedWrites",
+)
+UNATTRIBUTED = "other"
+# Run used by threads not bound to an account
+DEFAULT_ACCOUNT = ""
+
+
+class RefreshMetrics:
+    """Thread-safe counters and timers for refresh runs, one run per account."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.runs = {}
+        self.start()
+
+    def start(self, account: str = DEFAULT_ACCOUNT):
+        """Reset all counters for a new run of ``account``."""
+        with self._lock:
+            self.runs[account] = {
+                "startedAt": datetime.utcnow().isoformat() + "Z",
+                "started": time.perf_counter(),
+                "stages": {},
+            }
+
+    def bind(self, account: str):
+        """Attribute work on this thread to ``account``'s run."""
+        self._local.account = account
+
+    @property
+    def account(self) -> str:
+        return getattr(self._local, "account", DEFAULT_ACCOUNT)
+
+    def _run(self) -> dict:
+        run = self.runs.get(self.account)
+        if run is None:
+            run = self.runs[self.account] = {"startedAt": None, "started": time.perf_counter(), "stages": {}}
+        return run
+
+    def _entry(self, stage: str) -> dict:
+        stages = self._run()["stages"]
+        entry = stages.get(stage)
+        if entry is None:
+            entry = stages[stage] = {"seconds": 0.0, **{name: 0 for name in COUNTERS}}
+        return entry
+
+    @property
+    def current(self) -> str:
+        return getattr(self._local, "stage", UNATTRIBUTED)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Attribute work on this thread to ``name`` and add its time to the stage.
+
+        Stages that run on several threads at once (likers, comments)
+        accumulate busy time, which can exceed the refresh's wall time.
+        """
+        previous = getattr(self._local, "stage", None)
+        self._local.stage = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._entry(name)["seconds"] += elapsed
+            if previous is None:
+                del self._local.stage
+            else:
+                self._local.stage = previous
+
+    def staged(self, name: str, fn):
+        """Wrap ``fn`` so it runs inside ``stage(name)`` (for executor submissions)."""
+        def run(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return run
+
+    def incr(self, counter: str, amount: float = 1):
+        with self._lock:
+            self._entry(self.current)[counter] += amount
+
+    @contextmanager
+    def redis_write(self, size: int = 0):
+        """Time one Redis write of ``size`` encoded bytes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                entry = self._entry(self.current)
+                entry["redisWrites"] += 1
+                entry["redisWriteMs"] += elapsed_ms
+                entry["bytes"] += size
+
+    def record(self, status: str) -> dict:
+        """Compact summary of the current thread's account run so far."""
+        with self._lock:
+            run = self._run()
+            stages = {
+                name: {key: round(value, 3) if isinstance(value, float) else value for key, value in entry.items()}
+                for name, entry in run["stages"].items()
+            }
+            duration = time.perf_counter() - run["started"]
+        totals = {name: sum(entry[name] for entry in stages.values()) for name in COUNTERS}
+        totals["rateWaitMs"] = round(totals["rateWaitMs"], 3)
+        totals["redisWriteMs"] = round(totals["redisWriteMs"], 3)
+        return {
+            "startedAt": run["startedAt"],
+            "status": status,
+            "seconds": round(duration, 3),
+            "totals": totals,
+            "stages": stages,
+        }
+
+    def store(self, r, key: str, status: str, limit: int = METRICS_HISTORY) -> dict:
+        """Push this run's record onto the history list at ``key``."""
+        record = self.record(status)
+        pipe = r.pipeline()
+        pipe.lpush(key, json.dumps(record))
+        pipe.ltrim(key, 0, limit - 1)
+        pipe.execute()
+        return record
+
+
+def load_metrics(r, key: str, count: int = 1) -> list:
+    """Most recent ``count`` metrics records, newest first."""
+    return [json.loads(record) for record in r.lrange(key, 0, count - 1)]
+
+
+metrics = RefreshMetrics()
@@ -0,0 +1,191 @@
+"""
+Request budget and work prioritization for refreshes.
+
+Instagram requests are budgeted per rolling hour across runs: usage is
+counted in hourly buckets in Redis, and each run starts with whatever is
+left of REQUEST_BUDGET_PER_HOUR. The budget adapts to throttling: a run that
+hits 429s halves the budget factor and backs off for THROTTLE_BACKOFF_SECONDS
+(doubling per consecutive throttled run); clean runs recover it step by step.
+
+Work items (per-post engagement crawls, follower/following lists) are
+reserved against the run's allowance in order of expected value per
+request, so when the budget runs out the freshest, most-changed data has
+already been fetched. Helper module for api/ig-refresh.py.
+"""
+
+import calendar
+import math
+import os
+import threading
+import time
+
+REQUEST_BUDGET_PER_HOUR = int(os.environ.get("REQUEST_BUDGET_PER_HOUR", "600"))
+THROTTLE_BACKOFF_SECONDS = int(os.environ.get("THROTTLE_BACKOFF_SECONDS", "900"))
+RECENT_POST_DAYS = float(os.environ.get("RECENT_POST_DAYS", "30"))
+FOLLOW_LIST_MAX_AGE = int(os.environ.get("FOLLOW_LIST_MAX_AGE_SECONDS", "86400"))
+
+MIN_BUDGET_FACTOR = 0.1
+RECOVERY_STEP = 0.1
+# Share of the per-post liker/comment caps spent on posts older than RECENT_POST_DAYS
+OLD_POST_CAP_SHARE = 0.2
+
+
+def page_length() -> int:
+    """Items per request of instaloader's GraphQL pages (posts, likes, comments and follow lists)."""
+    # Imported here: status reads never load instaloader (see api/ig-refresh.py)
+    from instaloader import NodeIterator
+    return NodeIterator.page_length()
+
+
+def pages(items: int) -> int:
+    """Requests needed to fetch ``items`` items."""
+    return math.ceil(max(0, items) / page_length())
+
+
+def post_age_days(post_data: dict, now: float) -> float:
+    posted = calendar.timegm(time.strptime(post_data["timestamp"][:19], "%Y-%m-%dT%H:%M:%S"))
+    return max(0.0, (now - posted) / 86400)
+
+
+def engagement_caps(post_data: dict, now: float, max_likers: int, max_comments: int) -> tuple:
+    """Liker/comment caps for a post: full for recent posts, a fraction for old ones."""
+    if post_age_days(post_data, now) <= RECENT_POST_DAYS:
+        return max_likers, max_comments
+    return max(1, int(max_likers * OLD_POST_CAP_SHARE)), max(1, int(max_comments * OLD_POST_CAP_SHARE))
+
+
+def engagement_cost(post_data: dict, max_likers: int, max_comments: int) -> int:
+    """Estimated requests to crawl a post's likers and comments under the given caps."""
+    likers = pages(min(post_data.get("likeCount") or 0, max_likers)) if max_likers else 0
+    comments = pages(min(post_data.get("commentCount") or 0, max_comments)) if max_comments else 0
+    return max(1, likers + comments)
+
+
+def engagement_value(post_data: dict, fingerprint: dict | None, now: float, recrawl_age: float) -> float:
+    """
+    Expected value of re-crawling a post's engagement.
+
+    New posts and posts whose counts changed outrank posts that are only
+    stale; recency (half-life of RECENT_POST_DAYS) scales everything.
+    """
+    recency = 0.5 ** (post_age_days(post_data, now) / RECENT_POST_DAYS)
+    if fingerprint is None or not fingerprint.get("crawledAt"):
+        change = 3.0
+    else:
+        delta = abs(post_data["likeCount"] - fingerprint["likeCount"]) + \
+            abs(post_data["commentCount"] - fingerprint["commentCount"])
+        total = max(1, post_data["likeCount"] + post_data["commentCount"])
+        staleness = min(1.0, (now - fingerprint["crawledAt"]) / max(1.0, recrawl_age))
+        change = min(2.0, 1.0 + 10 * delta / total) if delta else 0.5 * staleness
+    return change * (0.1 + recency)
+
+
+def follow_value(age_seconds: float | None) -> float:
+    """Expected value of re-crawling a follow list last published ``age_seconds`` ago."""
+    if age_seconds is None:
+        return 3.0
+    return min(3.0, age_seconds / FOLLOW_LIST_MAX_AGE)
+
+
+class RequestScheduler:
+    """
+    Per-run request allowance backed by cross-run state in Redis.
+
+    ``reserve`` hands out the allowance; ``charge``/``throttle`` are called by
+    the rate controller for every request and 429; ``commit`` records usage
+    and adapts the budget for the next run.
+    """
+
+    def __init__(self, r, username: str, per_hour: int = REQUEST_BUDGET_PER_HOUR):
+        self.r = r
+        self.state_key = f"ig:scheduler:{username}"
+        self.usage_prefix = f"ig:requests:{username}"
+        self.per_hour = per_hour
+        self._lock = threading.Lock()
+        self.used = 0
+        self.throttled = 0
+        self.reserved = 0
+        self.deferred = []
+        # Requests all pending engagement crawls would have cost (set by fetch_posts)
+        self.engagement_demand = None
+
+        state = r.hgetall(self.state_key)
+        self.factor = float(state.get("factor", 1.0))
+        self.streak = int(state.get("streak", 0))
+        self.backoff_until = float(state.get("backoffUntil", 0))
+        self.engagement_estimate = int(state.get("engagementEstimate", 0))
+        now = time.time()
+        self.backing_off = now < self.backoff_until
+        self.allowance = 0 if self.backing_off else max(0, int(per_hour * self.factor) - self.recent_usage(now))
+
+    def recent_usage(self, now: float) -> int:
+        """Requests in the last hour, interpolating the previous hourly bucket."""
+        hour = int(now // 3600)
+        current, previous = self.r.mget(f"{self.usage_prefix}:{hour}", f"{self.usage_prefix}:{hour - 1}")
+        elapsed = (now % 3600) / 3600
+        return int(int(current or 0) + int(previous or 0) * (1 - elapsed))
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return self.allowance - self.reserved
+
+    def reserve(self, cost: int, label: str = "", force: bool = False) -> bool:
+        """Reserve ``cost`` requests; ``force`` always succeeds (essential work)."""
+        with self._lock:
+            if not force and self.reserved + cost > self.allowance:
+                if label:
+                    self.deferred.append(label)
+                return False
+            self.reserved += cost
+            return True
+
+    def charge(self):
+        with self._lock:
+            self.used += 1
+
+    def throttle(self):
+        with self._lock:
+            self.throttled += 1
+
+    def commit(self, adapt: bool = True) -> dict:
+        """
+        Record this run's usage and adapt the budget factor and backoff.
+
+        Without ``adapt`` (one-off fetches such as a page of post engagement)
+        only a 429 changes the budget; clean calls don't count as a recovery.
+        """
+        now = time.time()
+        with self._lock:
+            used, throttled = self.used, self.throttled
+        if throttled:
+            self.factor = max(MIN_BUDGET_FACTOR, self.factor / 2)
+            self.streak += 1
+            self.backoff_until = now + THROTTLE_BACKOFF_SECONDS * 2 ** (self.streak - 1)
+        elif adapt and not self.backing_off:
+            self.factor = min(1.0, self.factor + RECOVERY_STEP)
+            self.streak = 0
+        if self.engagement_demand is not None:
+            # Smoothed, so one quiet run doesn't release the whole reserve
+            self.engagement_estimate = math.ceil((self.engagement_estimate + self.engagement_demand) / 2)
+
+        bucket = f"{self.usage_prefix}:{int(now // 3600)}"
+        summary = {
+            "factor": round(self.factor, 3),
+            "streak": self.streak,
+            "backoffUntil": self.backoff_until,
+            "engagementEstimate": self.engagement_estimate,
+        }
+        pipe = self.r.pipeline()
+        if used:
+            pipe.incrby(bucket, used)
+            pipe.expire(bucket, 7200)
+        pipe.hset(self.state_key, mapping=summary)
+        pipe.execute()
+        return {
+            **summary,
+            "allowance": self.allowance,
+            "used": used,
+            "throttled": throttled,
+            "deferred": self.deferred,
+        }
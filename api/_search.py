@@ -0,0 +1,188 @@
+"""
+Full-text search over captions and comments.
+
+Each stored post contributes documents to an inverted index: its caption
+(with caption hashtags and mentions, kept both as ``#tag``/``@name`` terms
+and as plain words) and each comment and reply. ``ig:search:{username}``
+maps a term to its posting list ``{doc: count}``, where a doc is a
+shortcode (the caption) or ``shortcode/comment id``; the terms are also
+kept in a lexicographic sorted set so a query word matches every term it
+is a prefix of. As with api/_engagement.py, each post's terms are
+remembered and a refresh only rewrites the postings of changed or dropped
+posts. Helper module for api/ig-refresh.py.
+"""
+
+import json
+import math
+import re
+from collections import Counter
+
+from _churn import ID_BATCH
+
+TOKEN = re.compile(r"([#@]?)(\w+)")
+MIN_TERM_LENGTH = 2
+# Terms one query word may expand to by prefix (the lexicographically first ones)
+MAX_PREFIX_TERMS = 50
+# An exact term match outranks a longer word it is a prefix of
+PREFIX_PENALTY = 0.7
+
+
+def index_key(username: str) -> str:
+    return f"ig:search:{username}"
+
+
+def terms_key(username: str) -> str:
+    return f"ig:search:{username}:terms"
+
+
+def contributions_key(username: str) -> str:
+    return f"ig:search:{username}:posts"
+
+
+def meta_key(username: str) -> str:
+    return f"ig:search:{username}:meta"
+
+
+def tokenize(text: str | None):
+    """Lowercased words of ``text``; a ``#tag`` or ``@name`` also yields itself."""
+    for sigil, word in TOKEN.findall((text or "").lower()):
+        if len(word) < MIN_TERM_LENGTH:
+            continue
+        if sigil:
+            yield sigil + word
+        yield word
+
+
+def post_documents(post: dict) -> dict:
+    """``{doc: Counter(terms)}`` for a post's caption and its comments and replies."""
+    shortcode = post["shortcode"]
+    caption = Counter(tokenize(post.get("caption")))
+    for sigil, names in (("#", post.get("captionHashtags") or []), ("@", post.get("captionMentions") or [])):
+        for name in names:
+            for term in tokenize(sigil + name):
+                caption.setdefault(term, 1)
+    documents = {shortcode: caption} if caption else {}
+
+    def add(comment):
+        terms = Counter(tokenize(comment.get("text")))
+        if terms:
+            documents[f"{shortcode}/{comment['id']}"] = terms
+        for reply in comment.get("replies", []):
+            add(reply)
+
+    for comment in post.get("comments", []):
+        add(comment)
+    return documents
+
+
+def post_contribution(post: dict) -> dict:
+    """``{term: {doc: count}}`` for one post."""
+    contribution = {}
+    for doc, terms in post_documents(post).items():
+        for term, count in terms.items():
+            contribution.setdefault(term, {})[doc] = count
+    return contribution
+
+
+def update_search_index(r, username: str, posts: list) -> dict:
+    """
+    Bring the index in line with ``posts`` (the full stored payload).
+
+    Only the postings of terms in changed, new or dropped posts are read
+    and rewritten. Returns ``{posts, terms}`` change counts.
+    """
+    stored = r.hgetall(contributions_key(username))
+    encoded = {
+        post["shortcode"]: json.dumps(post_contribution(post), sort_keys=True, separators=(",", ":"))
+        for post in posts
+    }
+    changed = [shortcode for shortcode in encoded if stored.get(shortcode) != encoded[shortcode]]
+    dropped = [shortcode for shortcode in stored if shortcode not in encoded]
+    if not changed and not dropped:
+        return {"posts": 0, "terms": 0}
+
+    updates = {}
+    for shortcode in changed + dropped:
+        old = json.loads(stored.get(shortcode) or "{}")
+        new = json.loads(encoded.get(shortcode) or "{}")
+        for term in old.keys() | new.keys():
+            if old.get(term) != new.get(term):
+                updates.setdefault(term, []).append((old.get(term, {}), new.get(term, {})))
+
+    terms = list(updates)
+    docs_delta = 0
+    pipe = r.pipeline()
+    for start in range(0, len(terms), ID_BATCH):
+        batch = terms[start:start + ID_BATCH]
+        for term, raw in zip(batch, r.hmget(index_key(username), batch)):
+            postings = json.loads(raw) if raw else {}
+            for old, new in updates[term]:
+                for doc in old:
+                    postings.pop(doc, None)
+                postings.update(new)
+            if postings:
+                pipe.hset(index_key(username), term, json.dumps(postings, separators=(",", ":")))
+                pipe.zadd(terms_key(username), {term: 0})
+            else:
+                pipe.hdel(index_key(username), term)
+                pipe.zrem(terms_key(username), term)
+    for shortcode in changed + dropped:
+        old = {doc for postings in json.loads(stored.get(shortcode) or "{}").values() for doc in postings}
+        new = {doc for postings in json.loads(encoded.get(shortcode) or "{}").values() for doc in postings}
+        docs_delta += len(new) - len(old)
+    if changed:
+        pipe.hset(contributions_key(username), mapping={shortcode: encoded[shortcode] for shortcode in changed})
+    if dropped:
+        pipe.hdel(contributions_key(username), *dropped)
+    pipe.hincrby(meta_key(username), "docs", docs_delta)
+    pipe.execute()
+    print(f"Search index: {len(changed) + len(dropped)} posts, {len(terms)} terms updated")
+    return {"posts": len(changed) + len(dropped), "terms": len(terms)}
+
+
+def search(r, username: str, query: str, limit: int = 20) -> list:
+    """
+    Rank captions and comments matching every word of ``query``.
+
+    A word matches itself and the terms it is a prefix of. Each matched
+    term adds ``idf * tf / (tf + 1)``, at PREFIX_PENALTY for prefix
+    matches. Returns ``[{shortcode, commentId, score}]``, best first.
+    """
+    words = list(dict.fromkeys(tokenize(query)))
+    if not words:
+        return []
+    # Two round trips: prefix expansion (and the doc count), then the postings
+    pipe = r.pipeline(transaction=False)
+    for word in words:
+        # Redis orders members bytewise, so a 0xff byte sorts after every UTF-8 continuation
+        pipe.zrangebylex(terms_key(username), f"[{word}", f"[{word}".encode() + b"\xff", 0, MAX_PREFIX_TERMS)
+    pipe.hget(meta_key(username), "docs")
+    *matches, total_docs = pipe.execute()
+    expansions = dict(zip(words, matches))
+    if not all(matches):
+        return []
+    terms = list({term for matched in matches for term in matched})
+    postings = {term: json.loads(raw) for term, raw in zip(terms, r.hmget(index_key(username), terms)) if raw}
+    total_docs = max(1, int(total_docs or 0))
+
+    scores = None
+    for word, matched in expansions.items():
+        word_scores = Counter()
+        for term in matched:
+            docs = postings.get(term, {})
+            idf = math.log(1 + total_docs / max(1, len(docs)))
+            weight = idf * (1 if term == word else PREFIX_PENALTY)
+            for doc, count in docs.items():
+                word_scores[doc] += weight * count / (count + 1)
+        if scores is None:
+            scores = word_scores
+        else:
+            scores = Counter({doc: score + word_scores[doc] for doc, score in scores.items() if doc in word_scores})
+        if not scores:
+            return []
+
+    results = []
+    for doc, score in scores.most_common(limit):
+        shortcode, _, comment_id = doc.partition("/")
+        results.append({"shortcode": shortcode, "commentId": comment_id or None, "score": round(score, 4)})
+    return results
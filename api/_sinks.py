@@ -0,0 +1,278 @@
+"""
+Storage sinks shared by both refresh entry points.
+
+A sink takes the payloads in the shape the dashboard reads them (the
+profile, posts with ``likers`` and comments with their ``owner`` expanded,
+and follow lists as user dicts; see src/lib/ig/schema.ts), so
+api/ig-refresh.py and scripts/refresh_instagram_data.py store the same
+fields whatever each of them fetched.
+
+``SQLiteSink`` normalizes them into tables of accounts, posts, hashtags,
+users, likes, comments and follow edges, indexed by post timestamp,
+hashtag, typename and username, so questions such as "top posts of a
+month by likes" or "every comment by one user" are indexed queries
+instead of scans over the posts payload. Each write is one transaction of
+batched ``executemany`` statements over WRITE_BATCH rows at a time, so
+posts and follow lists can be streamed in from a file; a post's likes,
+comments and hashtags and an account's follow lists are replaced by the
+latest payload that carries them (a post without ``likers`` or
+``comments`` keeps the stored ones), and a user's fields by the latest
+record that has them.
+"""
+
+import itertools
+import re
+import sqlite3
+from datetime import datetime
+
+HASHTAG = re.compile(r"#(\w+)")
+WRITE_BATCH = 500
+TYPENAMES = {"image": "GraphImage", "video": "GraphVideo", "carousel": "GraphSidecar"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    username TEXT PRIMARY KEY,
+    full_name TEXT,
+    bio TEXT,
+    followers_count INTEGER,
+    following_count INTEGER,
+    posts_count INTEGER,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    full_name TEXT,
+    profile_pic_url TEXT,
+    is_verified INTEGER,
+    is_private INTEGER
+);
+CREATE TABLE IF NOT EXISTS posts (
+    shortcode TEXT PRIMARY KEY,
+    account TEXT NOT NULL,
+    id TEXT,
+    typename TEXT,
+    caption TEXT,
+    timestamp TEXT NOT NULL,
+    like_count INTEGER,
+    comment_count INTEGER,
+    video_view_count INTEGER,
+    permalink TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_account_timestamp ON posts (account, timestamp);
+CREATE INDEX IF NOT EXISTS posts_typename ON posts (typename);
+CREATE TABLE IF NOT EXISTS post_hashtags (
+    hashtag TEXT NOT NULL,
+    shortcode TEXT NOT NULL,
+    PRIMARY KEY (hashtag, shortcode)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS post_hashtags_shortcode ON post_hashtags (shortcode);
+CREATE TABLE IF NOT EXISTS likes (
+    shortcode TEXT NOT NULL,
+    username TEXT NOT NULL,
+    PRIMARY KEY (shortcode, username)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS likes_username ON likes (username);
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    shortcode TEXT NOT NULL,
+    parent_id TEXT,
+    username TEXT NOT NULL,
+    text TEXT,
+    timestamp TEXT,
+    likes_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS comments_shortcode ON comments (shortcode);
+CREATE INDEX IF NOT EXISTS comments_username ON comments (username, timestamp);
+CREATE TABLE IF NOT EXISTS follows (
+    account TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    username TEXT NOT NULL,
+    PRIMARY KEY (account, kind, username)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS follows_username ON follows (username);
+"""
+
+
+def flag(user: dict, field: str) -> int | None:
+    """``field`` as 0/1, or None when the record doesn't carry it (so the stored value is kept)."""
+    return None if user.get(field) is None else int(bool(user[field]))
+
+
+def user_row(user: dict) -> tuple:
+    return (
+        user["username"],
+        user.get("fullName"),
+        user.get("profilePicUrl"),
+        flag(user, "isVerified"),
+        flag(user, "isPrivate"),
+    )
+
+
+def post_hashtags(post: dict) -> set:
+    """
+    ``captionHashtags``, or the hashtags in the caption when a payload
+    doesn't carry them; None when it carries neither.
+    """
+    hashtags = post.get("captionHashtags")
+    if hashtags is None:
+        if "caption" not in post:
+            return None
+        hashtags = HASHTAG.findall(post["caption"] or "")
+    return {hashtag.lower() for hashtag in hashtags}
+
+
+def batched(items, size: int = WRITE_BATCH):
+    """Lists of up to ``size`` items of the iterable ``items``."""
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def flatten_comments(shortcode: str, comments: list, parent_id: str | None = None):
+    """Yield ``(comment row, owner)`` for each comment and reply."""
+    for comment in comments:
+        owner = comment["owner"]
+        yield (
+            comment["id"],
+            shortcode,
+            parent_id,
+            owner["username"],
+            comment.get("text"),
+            comment.get("timestamp"),
+            comment.get("likesCount", 0),
+        ), owner
+        yield from flatten_comments(shortcode, comment.get("replies") or [], comment["id"])
+
+
+class SQLiteSink:
+    """Normalized SQLite copy of the refreshed payloads (see module docstring)."""
+
+    def __init__(self, path):
+        # Accounts refreshed in parallel open one sink each; WAL lets them take turns writing
+        self.conn = sqlite3.connect(str(path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert_users(self, users):
+        self.conn.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?) ON CONFLICT (username) DO UPDATE SET "
+            "full_name = coalesce(excluded.full_name, full_name), "
+            "profile_pic_url = coalesce(excluded.profile_pic_url, profile_pic_url), "
+            "is_verified = coalesce(excluded.is_verified, is_verified), "
+            "is_private = coalesce(excluded.is_private, is_private)",
+            (user_row(user) for user in users),
+        )
+
+    def write_profile(self, profile: dict):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO accounts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    profile["username"],
+                    profile.get("fullName"),
+                    profile.get("bio"),
+                    profile.get("followersCount"),
+                    profile.get("followingCount"),
+                    profile.get("postsCount"),
+                    profile.get("lastUpdated") or datetime.utcnow().isoformat() + "Z",
+                ),
+            )
+
+    def write_posts(self, account: str, posts) -> int:
+        """
+        Upsert ``posts`` (any iterable) and replace the likes, comments and
+        hashtags of those that carry them. Returns rows written.
+        """
+        with self.conn:
+            return sum(self._write_posts(account, batch) for batch in batched(posts))
+
+    def _write_posts(self, account: str, posts: list) -> int:
+        replaced = {"post_hashtags": [], "likes": [], "comments": []}
+        likes, comments, users, hashtags = [], [], {}, []
+        for post in posts:
+            shortcode = post["shortcode"]
+            tags = post_hashtags(post)
+            if tags is not None:
+                replaced["post_hashtags"].append((shortcode,))
+                hashtags.extend((hashtag, shortcode) for hashtag in tags)
+            if post.get("likers") is not None:
+                replaced["likes"].append((shortcode,))
+                for liker in post["likers"]:
+                    users[liker["username"]] = liker
+                    likes.append((shortcode, liker["username"]))
+            if post.get("comments") is not None:
+                replaced["comments"].append((shortcode,))
+                for row, owner in flatten_comments(shortcode, post["comments"]):
+                    users[owner["username"]] = owner
+                    comments.append(row)
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    post["shortcode"],
+                    account,
+                    post.get("id"),
+                    post.get("typename") or TYPENAMES.get(post.get("mediaType")),
+                    post.get("caption"),
+                    post["timestamp"],
+                    post.get("likeCount"),
+                    post.get("commentCount"),
+                    post.get("videoViewCount"),
+                    post.get("permalink"),
+                )
+                for post in posts
+            ),
+        )
+        for table, shortcodes in replaced.items():
+            self.conn.executemany(f"DELETE FROM {table} WHERE shortcode = ?", shortcodes)
+        self.upsert_users(users.values())
+        self.conn.executemany("INSERT OR IGNORE INTO post_hashtags VALUES (?, ?)", hashtags)
+        self.conn.executemany("INSERT OR IGNORE INTO likes VALUES (?, ?)", likes)
+        self.conn.executemany("INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?, ?, ?)", comments)
+        return len(posts) + len(likes) + len(comments)
+
+    def write_follow_list(self, account: str, kind: str, users) -> int:
+        """
+        Replace ``account``'s ``kind`` (followers or following) edges with
+        ``users`` (any iterable). Returns the count.
+        """
+        count = 0
+        with self.conn:
+            self.conn.execute("DELETE FROM follows WHERE account = ? AND kind = ?", (account, kind))
+            for batch in batched(users):
+                self.upsert_users(batch)
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO follows VALUES (?, ?, ?)",
+                    ((account, kind, user["username"]) for user in batch),
+                )
+                count += len(batch)
+        return count
+
+    def top_posts(self, account: str, month: str, limit: int = 10) -> list:
+        """``account``'s most liked posts of ``month`` (``YYYY-MM``)."""
+        rows = self.conn.execute(
+            "SELECT shortcode, like_count, comment_count, timestamp FROM posts "
+            "WHERE account = ? AND timestamp >= ? AND timestamp < ? ORDER BY like_count DESC LIMIT ?",
+            (account, f"{month}-01", f"{month}-32", limit),
+        )
+        return [dict(zip(("shortcode", "likeCount", "commentCount", "timestamp"), row)) for row in rows]
+
+    def comments_by(self, username: str) -> list:
+        """Every stored comment and reply by ``username``, newest first."""
+        rows = self.conn.execute(
+            "SELECT c.shortcode, p.account, c.id, c.parent_id, c.text, c.timestamp FROM comments c "
+            "JOIN posts p USING (shortcode) WHERE c.username = ? ORDER BY c.timestamp DESC",
+            (username,),
+        )
+        return [dict(zip(("shortcode", "account", "id", "parentId", "text", "timestamp"), row)) for row in rows]
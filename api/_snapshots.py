@@ -0,0 +1,230 @@
+"""
+Historical snapshot archive.
+
+Every refresh appends the account's counters and each post's likes,
+comments and video views to an append-only log partitioned by UTC day.
+A day opens with a full keyframe; later records hold only the deltas
+against the previous snapshot (changed counters, changed or added posts,
+removed shortcodes), and a refresh that changed nothing writes nothing.
+Partitions are self-contained, so a range read replays only the days it
+covers and growth curves or "gained in the last 24h" never re-read full
+copies of past refreshes.
+
+Both entry points use the same records: api/ig-refresh.py writes Redis
+lists (``ig:snapshots:{username}:{YYYY-MM-DD}``, expiring after
+SNAPSHOT_RETENTION_DAYS), scripts/refresh_instagram_data.py NDJSON files
+(``{dir}/{YYYY-MM-DD}.ndjson``), streamed line by line on read:
+
+    {"at": <epoch>, "base": true, "profile": {...}, "posts": {shortcode: [likes, comments, views]}}
+    {"at": <epoch>, "profile": {<changed>}, "posts": {<changed or added>}, "removed": [shortcode, ...]}
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+SNAPSHOT_RETENTION_DAYS = int(os.environ.get("SNAPSHOT_RETENTION_DAYS", "365"))
+PROFILE_FIELDS = ("followersCount", "followingCount", "postsCount")
+POST_FIELDS = ("likeCount", "commentCount", "videoViewCount")
+READ_BATCH = 500
+# How far back state_at looks for the last snapshot before a point in time
+MAX_LOOKBACK_DAYS = 31
+
+
+def partition(at: float) -> str:
+    return datetime.fromtimestamp(at, timezone.utc).strftime("%Y-%m-%d")
+
+
+def snapshot_state(profile: dict, posts: list) -> dict:
+    return {
+        "profile": {field: profile.get(field) for field in PROFILE_FIELDS},
+        "posts": {post["shortcode"]: [post.get(field) for field in POST_FIELDS] for post in posts},
+    }
+
+
+def diff_states(previous: dict, current: dict) -> dict:
+    """Delta from ``previous`` to ``current``; empty when nothing changed."""
+    delta = {}
+    profile = {
+        field: value for field, value in current["profile"].items() if previous["profile"].get(field) != value
+    }
+    if profile:
+        delta["profile"] = profile
+    posts = {
+        shortcode: counts for shortcode, counts in current["posts"].items()
+        if previous["posts"].get(shortcode) != counts
+    }
+    if posts:
+        delta["posts"] = posts
+    removed = [shortcode for shortcode in previous["posts"] if shortcode not in current["posts"]]
+    if removed:
+        delta["removed"] = removed
+    return delta
+
+
+def apply_record(state: dict | None, record: dict) -> dict:
+    """State after ``record`` (a keyframe or a delta on ``state``)."""
+    if record.get("base") or state is None:
+        return {"profile": dict(record.get("profile", {})), "posts": dict(record.get("posts", {}))}
+    posts = {**state["posts"], **record.get("posts", {})}
+    for shortcode in record.get("removed", []):
+        posts.pop(shortcode, None)
+    return {"profile": {**state["profile"], **record.get("profile", {})}, "posts": posts}
+
+
+class RedisSnapshotStore:
+    """Day partitions as Redis lists, plus the last snapshot for diffing."""
+
+    def __init__(self, r, username: str):
+        self.r = r
+        self.prefix = f"ig:snapshots:{username}"
+        self.last_key = f"{self.prefix}:last"
+
+    def last(self) -> tuple:
+        """``(day, state)`` of the latest snapshot, or ``(None, None)``."""
+        last = json.loads(self.r.get(self.last_key) or "null")
+        return (last["day"], last["state"]) if last else (None, None)
+
+    def append(self, day: str, record: dict, state: dict):
+        key = f"{self.prefix}:{day}"
+        pipe = self.r.pipeline()
+        pipe.rpush(key, json.dumps(record, separators=(",", ":")))
+        pipe.expire(key, SNAPSHOT_RETENTION_DAYS * 86400)
+        pipe.set(self.last_key, json.dumps({"day": day, "state": state}))
+        pipe.execute()
+
+    def read(self, day: str):
+        key = f"{self.prefix}:{day}"
+        start = 0
+        while True:
+            batch = self.r.lrange(key, start, start + READ_BATCH - 1)
+            yield from (json.loads(record) for record in batch)
+            if len(batch) < READ_BATCH:
+                return
+            start += READ_BATCH
+
+
+class FileSnapshotStore:
+    """Day partitions as NDJSON files in ``root``, plus ``last.json`` for diffing."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.last_path = self.root / "last.json"
+
+    def last(self) -> tuple:
+        if not self.last_path.exists():
+            return None, None
+        last = json.loads(self.last_path.read_text(encoding="utf-8"))
+        return last["day"], last["state"]
+
+    def append(self, day: str, record: dict, state: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f"{day}.ndjson", "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        # Replace last.json atomically so a crash never leaves it half-written
+        tmp = self.last_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"day": day, "state": state}), encoding="utf-8")
+        tmp.replace(self.last_path)
+
+    def read(self, day: str):
+        path = self.root / f"{day}.ndjson"
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def record_snapshot(store, profile: dict, posts: list, at: float | None = None) -> dict | None:
+    """
+    Append the snapshot of ``profile`` and ``posts``: a keyframe for the
+    first one of a day, otherwise the delta (nothing if unchanged).
+    Returns the record written, if any.
+    """
+    at = at or time.time()
+    day = partition(at)
+    state = snapshot_state(profile, posts)
+    last_day, last = store.last()
+    if last is None or last_day != day:
+        record = {"at": at, "base": True, **state}
+    else:
+        delta = diff_states(last, state)
+        if not delta:
+            return None
+        record = {"at": at, **delta}
+    store.append(day, record, state)
+    return record
+
+
+def days_between(since: float, until: float):
+    day = datetime.fromtimestamp(since, timezone.utc).date()
+    last = datetime.fromtimestamp(until, timezone.utc).date()
+    while day <= last:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def iter_snapshots(store, since: float, until: float | None = None):
+    """Yield ``(at, state)`` for every snapshot between ``since`` and ``until`` (default now)."""
+    until = until or time.time()
+    for day in days_between(since, until):
+        state = None
+        for record in store.read(day):
+            state = apply_record(state, record)
+            if record["at"] > until:
+                return
+            if record["at"] >= since:
+                yield record["at"], state
+
+
+def state_at(store, at: float) -> tuple:
+    """``(at, state)`` of the last snapshot at or before ``at``, or ``(None, None)``."""
+    day = datetime.fromtimestamp(at, timezone.utc).date()
+    for _ in range(MAX_LOOKBACK_DAYS):
+        found = (None, None)
+        state = None
+        for record in store.read(day.isoformat()):
+            if record["at"] > at:
+                break
+            state = apply_record(state, record)
+            found = (record["at"], state)
+        if found[0] is not None:
+            return found
+        day -= timedelta(days=1)
+    return None, None
+
+
+def counter_delta(now, then):
+    return None if now is None or then is None else now - then
+
+
+def gains(store, since: float) -> dict | None:
+    """
+    Change in the account's counters and each current post's counts since
+    ``since``, measured from the last snapshot at or before it (or the first
+    one after it, for an archive younger than the window); posts newer than
+    that count from zero. None while the window has no snapshots.
+    """
+    then_at, then = state_at(store, since)
+    if then is None:
+        then_at, then = next(iter_snapshots(store, since), (None, None))
+    _, now = store.last()
+    if then is None or now is None:
+        return None
+    zero = [0] * len(POST_FIELDS)
+    return {
+        "since": then_at,
+        "profile": {
+            field: counter_delta(now["profile"].get(field), then["profile"].get(field)) for field in PROFILE_FIELDS
+        },
+        "posts": {
+            shortcode: dict(zip(POST_FIELDS, (
+                counter_delta(current, previous)
+                for current, previous in zip(counts, then["posts"].get(shortcode, zero))
+            )))
+            for shortcode, counts in now["posts"].items()
+        },
+    }
@@ -5,38 +5,398 @@ Vercel Python Serverless Function
 This function fetches Instagram data using Instaloader and stores it in Redis.
 """
 
+from __future__ import annotations
+
 import os
+import sys
 import json
 import base64
+import functools
+import hashlib
+import hmac
+import importlib.util
+import itertools
+import socket
 import tempfile
-from datetime import datetime
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import weakref
+import zlib
+from urllib.parse import parse_qs, urlparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from http.server import BaseHTTPRequestHandler
-import instaloader
 import redis
 
+
+def lazy_import(name: str):
+    """Return module ``name``, deferring its import to the first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# Only the refresh path touches instaloader, so status reads never import it
+instaloader = lazy_import("instaloader")
+
+# Optional codecs for the storage envelope
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Helper modules live next to this file as api/_*.py
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _cadence import CACHE_HARD_TTL, ENTITIES, due_entities, freshness, mark_refreshed  # noqa: E402
+from _churn import record_churn, track_ids  # noqa: E402
+from _engagement import refresh_follower_joins, update_engagement_index  # noqa: E402
+from _jobs import (  # noqa: E402
+    LATEST_KEY,
+    claim_job,
+    create_or_join_job,
+    finish_job,
+    load_job,
+    update_job,
+)
+from _lease import LOCK_KEY, STATUS_KEY, STATUS_TTL, AccountProgress, RefreshLease, read_progress  # noqa: E402
+from _media import MEDIA_CACHE, MediaCache, url_key  # noqa: E402
+from _metrics import load_metrics, metrics  # noqa: E402
+from _search import search, update_search_index  # noqa: E402
+from _scheduler import (  # noqa: E402
+    REQUEST_BUDGET_PER_HOUR,
+    RequestScheduler,
+    engagement_caps,
+    engagement_cost,
+    engagement_value,
+    follow_value,
+    page_length,
+    pages,
+)
+from _snapshots import RedisSnapshotStore, gains, iter_snapshots, record_snapshot  # noqa: E402
+
 # Configuration
 IG_USERNAME = os.environ.get("IG_USERNAME", "anipottsbuilds")
+# Accounts a refresh may cover, refreshed as one batch by default (comma-separated)
+IG_ACCOUNTS = [name.strip() for name in os.environ.get("IG_ACCOUNTS", "").split(",") if name.strip()] or [IG_USERNAME]
 IG_SESSION_DATA = os.environ.get("IG_SESSION_DATA", "")
 REDIS_URL = os.environ.get("REDIS_URL", "")
 MAX_POSTS = int(os.environ.get("MAX_POSTS", "50"))
 MAX_LIKERS_PER_POST = int(os.environ.get("MAX_LIKERS_PER_POST", "50"))
 MAX_COMMENTS_PER_POST = int(os.environ.get("MAX_COMMENTS_PER_POST", "50"))
+MAX_REPLIES_PER_COMMENT = int(os.environ.get("MAX_REPLIES_PER_COMMENT", "5"))
 MAX_FOLLOWERS = int(os.environ.get("MAX_FOLLOWERS", "1000"))
-CACHE_TTL = int(os.environ.get("CACHE_TTL_SECONDS", "3600"))
+
+# Incremental post refresh
+INCREMENTAL_POSTS = os.environ.get("INCREMENTAL_POSTS", "true").lower() == "true"
+POST_RECRAWL_AGE = int(os.environ.get("POST_RECRAWL_AGE_SECONDS", "86400"))
+POST_FULL_SCAN_AGE = int(os.environ.get("POST_FULL_SCAN_AGE_SECONDS", "21600"))
+
+# Lazy engagement: refreshes store post metadata and counts only; likers and
+# comments are fetched per post, a page at a time, when first requested
+LAZY_ENGAGEMENT = os.environ.get("LAZY_ENGAGEMENT", "false").lower() == "true"
+POST_ENGAGEMENT_TTL = int(os.environ.get("POST_ENGAGEMENT_TTL_SECONDS", "3600"))
+# Upper bound on fetching one page; concurrent requests for it get 409 meanwhile
+POST_ENGAGEMENT_LOCK_TTL = 60
+# Required as a bearer token to fetch uncached pages from Instagram; without it
+# (or when unset) only cached pages are served
+POST_ENGAGEMENT_SECRET = os.environ.get("POST_ENGAGEMENT_SECRET", "")
+
+# Concurrency
+REFRESH_WORKERS = int(os.environ.get("REFRESH_WORKERS", "4"))
+MAX_REQUESTS_PER_MINUTE = int(os.environ.get("MAX_REQUESTS_PER_MINUTE", "60"))
+# Accounts of a batch refreshed at the same time
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "3"))
+
+# Resumable follower/following crawls
+RESUMABLE_FOLLOW_CRAWL = os.environ.get("RESUMABLE_FOLLOW_CRAWL", "false").lower() == "true"
+FOLLOW_CRAWL_BUDGET = int(os.environ.get("FOLLOW_CRAWL_BUDGET_SECONDS", "120"))
+MAX_FOLLOWERS_RESUMABLE = int(os.environ.get("MAX_FOLLOWERS_RESUMABLE", "0"))
+
+# Chunked list storage
+LIST_CHUNK_SIZE = int(os.environ.get("LIST_CHUNK_SIZE", "500"))
+POSTS_CHUNK_SIZE = int(os.environ.get("POSTS_CHUNK_SIZE", "10"))
+SUPERSEDED_CHUNK_TTL = 60
+
+# Storage envelope: json, json+zlib, json+zstd, msgpack, msgpack+zlib, msgpack+zstd
+# The dashboard (src/lib/cache.ts) reads json and json+zlib.
+STORAGE_FORMAT = os.environ.get("STORAGE_FORMAT", "json+zlib")
+# Optional normalized SQLite copy of each refresh (see api/_sinks.py); off when empty
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "")
+
+
+# Async refresh jobs (see api/_jobs.py): POST returns 202 and the job runs in a
+# worker invocation of this function, by default on the current deployment
+REFRESH_WORKER_URL = os.environ.get("REFRESH_WORKER_URL") or (
+    f"https://{os.environ['VERCEL_URL']}/api/ig-refresh" if os.environ.get("VERCEL_URL") else ""
+)
+WORKER_DISPATCH_TIMEOUT = 2
+# Required as a bearer token on scheduled GET ?due=1 refreshes when set
+CRON_SECRET = os.environ.get("CRON_SECRET", "")
+
+
+def metrics_key(username: str = IG_USERNAME) -> str:
+    """Per-account run metrics history (see api/_metrics.py)."""
+    return f"ig:refresh_metrics:{username}"
+
+
+_redis_client = None
+_binary_clients = weakref.WeakKeyDictionary()
 
 
 def get_redis_client():
-    """Create Redis client from REDIS_URL."""
-    if not REDIS_URL:
-        raise ValueError("REDIS_URL not configured")
-    return redis.from_url(REDIS_URL, decode_responses=True)
+    """
+    Redis client for REDIS_URL, created once per process: warm invocations
+    reuse its connection pool (and open connections).
+    """
+    global _redis_client
+    if _redis_client is None:
+        if not REDIS_URL:
+            raise ValueError("REDIS_URL not configured")
+        _redis_client = redis.from_url(REDIS_URL, decode_responses=True, health_check_interval=30)
+    return _redis_client
+
+
+def binary_client(r):
+    """Return a client for the same server as ``r`` that returns raw bytes (one per pool)."""
+    kwargs = dict(r.connection_pool.connection_kwargs)
+    if not kwargs.get("decode_responses"):
+        return r
+    client = _binary_clients.get(r.connection_pool)
+    if client is None:
+        kwargs["decode_responses"] = False
+        pool = r.connection_pool.__class__(connection_class=r.connection_pool.connection_class, **kwargs)
+        client = _binary_clients[r.connection_pool] = redis.Redis(connection_pool=pool)
+    return client
+
+
+# Envelope header: magic, version byte, codec byte (mirrored in src/lib/cache.ts)
+ENVELOPE_MAGIC = b"\x00IGE"
+ENVELOPE_VERSION = 1
+STORAGE_CODECS = {
+    "json": 0,
+    "json+zlib": 1,
+    "json+zstd": 2,
+    "msgpack": 3,
+    "msgpack+zlib": 4,
+    "msgpack+zstd": 5,
+}
+CODEC_NAMES = {codec: name for name, codec in STORAGE_CODECS.items()}
+
+
+# Top-level fields that change on every refresh without the content changing
+VOLATILE_FIELDS = ("lastUpdated", "generatedAt")
+# Instagram re-signs CDN URLs on every fetch; content with them is compared without
+# the signature, and rewritten with fresh ones once per this many seconds
+SIGNED_URL_MAX_AGE = int(os.environ.get("SIGNED_URL_MAX_AGE_SECONDS", "86400"))
+
+
+def url_epoch() -> int:
+    """Current SIGNED_URL_MAX_AGE period; content with CDN URLs is rewritten when it changes."""
+    return int(time.time() // SIGNED_URL_MAX_AGE)
+
+
+def normalize_urls(value) -> tuple:
+    """``(value with every http(s) URL replaced by its url_key, whether it had any)``."""
+    found = False
+
+    def normalize(value):
+        nonlocal found
+        if isinstance(value, str):
+            if value.startswith(("https://", "http://")):
+                found = True
+                return url_key(value)
+            return value
+        if isinstance(value, dict):
+            return {field: normalize(item) for field, item in value.items()}
+        if isinstance(value, list):
+            return [normalize(item) for item in value]
+        return value
+
+    return normalize(value), found
+
+
+def content_hash(data) -> str:
+    """
+    Stable hash of ``data``'s content, independent of STORAGE_FORMAT, key
+    order and CDN URL signatures (see SIGNED_URL_MAX_AGE).
+    """
+    if isinstance(data, dict):
+        data = {field: value for field, value in data.items() if field not in VOLATILE_FIELDS}
+    data, has_urls = normalize_urls(data)
+    body = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    if has_urls:
+        body += f"@{url_epoch()}"
+    return hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+
+def encode_payload(data, fmt: str | None = None) -> bytes:
+    """Serialize ``data`` into a versioned storage envelope (``fmt`` defaults to STORAGE_FORMAT)."""
+    fmt = fmt or STORAGE_FORMAT
+    if fmt not in STORAGE_CODECS:
+        raise ValueError(f"Unknown storage format: {fmt}")
+    serializer, _, compression = fmt.partition("+")
+
+    if serializer == "msgpack":
+        if msgpack is None:
+            raise ValueError("STORAGE_FORMAT requires msgpack (pip install msgpack)")
+        body = msgpack.packb(data, use_bin_type=True)
+    else:
+        body = json.dumps(data, separators=(",", ":")).encode()
+
+    if compression == "zlib":
+        body = zlib.compress(body, 6)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise ValueError("STORAGE_FORMAT requires zstandard (pip install zstandard)")
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+
+    return ENVELOPE_MAGIC + bytes([ENVELOPE_VERSION, STORAGE_CODECS[fmt]]) + body
+
+
+def decode_payload(raw: bytes | str | None):
+    """Decode a storage envelope; plain JSON values written before it still load."""
+    if raw is None:
+        return None
+    if isinstance(raw, str) or not raw.startswith(ENVELOPE_MAGIC):
+        return json.loads(raw)
+
+    version, codec = raw[len(ENVELOPE_MAGIC)], raw[len(ENVELOPE_MAGIC) + 1]
+    if version != ENVELOPE_VERSION or codec not in CODEC_NAMES:
+        raise ValueError(f"Unsupported storage envelope v{version}/{codec}")
+    serializer, _, compression = CODEC_NAMES[codec].partition("+")
+    body = raw[len(ENVELOPE_MAGIC) + 2:]
+
+    if compression == "zlib":
+        body = zlib.decompress(body)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise ValueError("Payload is zstd-compressed but zstandard is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body)
+
+    if serializer == "msgpack":
+        if msgpack is None:
+            raise ValueError("Payload is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+class RequestLimiter:
+    """Sliding-window limiter shared by every thread issuing Instagram requests.
+
+    Requests and 429s are also reported to ``scheduler`` when given, which
+    tracks the budget across runs. With a ``parent``, the window is the
+    parent's, so the per-account limiters of a batch refresh share one
+    ceiling while charging their own schedulers.
+    """
+
+    def __init__(
+        self,
+        max_per_minute: int = MAX_REQUESTS_PER_MINUTE,
+        window: float = 60.0,
+        scheduler: RequestScheduler | None = None,
+        parent: "RequestLimiter | None" = None,
+    ):
+        self.max_per_window = max(1, max_per_minute)
+        self.window = window
+        self.scheduler = scheduler
+        self.parent = parent
+        self._timestamps = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one more request fits inside the window."""
+        if self.scheduler:
+            self.scheduler.charge()
+        if self.parent:
+            self.parent.acquire()
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and self._timestamps[0] <= now - self.window:
+                    self._timestamps.popleft()
+                if len(self._timestamps) < self.max_per_window:
+                    self._timestamps.append(now)
+                    return
+                wait = self._timestamps[0] + self.window - now
+            time.sleep(wait)
+
+
+@functools.cache
+def shared_rate_controller() -> type:
+    """SharedRateController, defined on first use since it subclasses instaloader's."""
+
+    class SharedRateController(instaloader.RateController):
+        """Instaloader rate controller that routes every query through a RequestLimiter.
+
+        Instaloader's own per-query-type bookkeeping is not thread-safe, so it is
+        serialized behind a lock; the shared limiter enforces the overall ceiling.
+        """
+
+        def __init__(self, context, limiter: RequestLimiter):
+            super().__init__(context)
+            self._limiter = limiter
+            self._lock = threading.Lock()
+
+        def wait_before_query(self, query_type: str) -> None:
+            started = time.perf_counter()
+            self._limiter.acquire()
+            with self._lock:
+                super().wait_before_query(query_type)
+            metrics.incr("requests")
+            metrics.incr("rateWaitMs", (time.perf_counter() - started) * 1000)
+
+        def handle_429(self, query_type: str) -> None:
+            metrics.incr("retries")
+            if self._limiter.scheduler:
+                self._limiter.scheduler.throttle()
+            with self._lock:
+                super().handle_429(query_type)
+
+    return SharedRateController
+
+
+def create_loader(limiter: RequestLimiter) -> instaloader.Instaloader:
+    """Create an Instaloader instance whose requests go through ``limiter``."""
+    return instaloader.Instaloader(
+        download_pictures=False,
+        download_videos=False,
+        download_video_thumbnails=False,
+        download_geotags=False,
+        download_comments=False,
+        save_metadata=False,
+        compress_json=False,
+        rate_controller=lambda ctx: shared_rate_controller()(ctx, limiter),
+    )
+
+
+# Session cookies decoded from IG_SESSION_DATA, kept across warm invocations
+_session_cookies = None
 
 
 def load_session(loader: instaloader.Instaloader) -> bool:
-    """Load Instagram session from base64-encoded env var."""
+    """Load Instagram session from base64-encoded env var (decoded once per process)."""
+    global _session_cookies
     if not IG_SESSION_DATA:
         print("No session data provided")
         return False
+    if _session_cookies is not None:
+        loader.load_session(IG_USERNAME, _session_cookies)
+        return True
 
     try:
         # Decode base64 session data
@@ -53,6 +413,7 @@ def load_session(loader: instaloader.Instaloader) -> bool:
         # Clean up
         os.unlink(session_path)
 
+        _session_cookies = loader.save_session()
         print(f"Session loaded for {IG_USERNAME}")
         return True
     except Exception as e:
@@ -60,10 +421,8 @@ def load_session(loader: instaloader.Instaloader) -> bool:
         return False
 
 
-def fetch_profile(loader: instaloader.Instaloader) -> dict:
-    """Fetch profile data for the configured username."""
-    profile = instaloader.Profile.from_username(loader.context, IG_USERNAME)
-
+def fetch_profile(profile: instaloader.Profile) -> dict:
+    """Serialize profile data for the configured username."""
     return {
         "username": profile.username,
         "userid": str(profile.userid),
@@ -86,306 +445,1761 @@ def fetch_profile(loader: instaloader.Instaloader) -> dict:
     }
 
 
-def fetch_posts(loader: instaloader.Instaloader, fetch_likers: bool = True, fetch_comments: bool = True) -> list:
-    """Fetch posts with metadata, optionally including likers and comments."""
-    profile = instaloader.Profile.from_username(loader.context, IG_USERNAME)
-    posts = []
+class UserRecord:
+    """Compact in-memory user record; stored as a row in USER_FIELDS order."""
 
-    for i, post in enumerate(profile.get_posts()):
-        if i >= MAX_POSTS:
-            break
+    __slots__ = ("username", "full_name", "profile_pic_url", "is_verified", "is_private")
 
-        print(f"Fetching post {i + 1}/{MAX_POSTS}: {post.shortcode}")
+    def __init__(self, username, full_name, profile_pic_url, is_verified, is_private):
+        self.username = username
+        self.full_name = full_name
+        self.profile_pic_url = profile_pic_url
+        self.is_verified = is_verified
+        self.is_private = is_private
 
-        # Determine media type
-        typename = post.typename
-        if typename == "GraphVideo":
-            media_type = "video"
-        elif typename == "GraphSidecar":
-            media_type = "carousel"
-        else:
-            media_type = "image"
-
-        # Get media URLs
-        media_urls = []
-        sidecar_items = []
-        if post.typename == "GraphSidecar":
-            for node in post.get_sidecar_nodes():
-                media_urls.append(node.display_url)
-                sidecar_items.append({
-                    "isVideo": node.is_video,
-                    "displayUrl": node.display_url,
-                    "videoUrl": getattr(node, 'video_url', None),
-                })
-        else:
-            media_urls.append(post.url)
-
-        # Location
-        location = None
-        if post.location:
-            location = {
-                "id": str(post.location.id) if post.location.id else "",
-                "name": post.location.name or "",
-                "slug": getattr(post.location, 'slug', None),
-                "lat": post.location.lat,
-                "lng": post.location.lng,
-            }
+    @classmethod
+    def from_user(cls, user) -> "UserRecord":
+        return cls(user.username, user.full_name, user.profile_pic_url, user.is_verified, user.is_private)
+
+    def to_row(self) -> list:
+        return [self.username, self.full_name, self.profile_pic_url, self.is_verified, self.is_private]
+
+
+# Row layout of ig:users:{username} values (mirrored in src/lib/cache.ts)
+USER_FIELDS = ("username", "fullName", "profilePicUrl", "isVerified", "isPrivate")
+
+
+class UserTable:
+    """
+    Interned user table shared by posts, comments and follow lists.
+
+    Every Instagram user gets a small integer id that is stable across
+    refreshes (``ig:user_ids:{username}`` maps Instagram user ids to it) and
+    one row in ``ig:users:{username}``, per refreshed account. Payloads store these ids instead of
+    full user dicts. New or updated rows are buffered and written by
+    ``flush``, which must run before any payload referencing them is
+    published. Rows are compared with their profile picture URLs normalized
+    like content_hash, so re-signed URLs are only rewritten once per
+    SIGNED_URL_MAX_AGE. With a ``media`` cache, profile pictures already
+    cached are stored as their cached URLs. Safe to share between refresh
+    threads.
+    """
+
+    ID_BLOCK = 1000
+
+    def __init__(
+        self, r, flush_every: int = LIST_CHUNK_SIZE, username: str = IG_USERNAME, media: MediaCache | None = None
+    ):
+        self.r = r
+        self.username = username
+        self.media = media
+        self.ids_key = f"ig:user_ids:{username}"
+        self.users_key = f"ig:users:{username}"
+        self.seq_key = f"ig:user_seq:{username}"
+        self.flush_every = flush_every
+        self._ids = {key: int(value) for key, value in r.hgetall(self.ids_key).items()}
+        self._epoch = url_epoch()
+        self._resign = r.hget(f"{self.users_key}:meta", "urlEpoch") != str(self._epoch)
+        self._seen = set()
+        self._pending = {}
+        self._new_ids = {}
+        self._next_id = 0
+        self._last_id = 0
+        self._lock = threading.Lock()
 
-        # Build post data
-        post_data = {
-            "id": str(post.mediaid),
-            "shortcode": post.shortcode,
-            "typename": typename,
-            "caption": post.caption,
-            "captionHashtags": list(post.caption_hashtags) if post.caption_hashtags else [],
-            "captionMentions": list(post.caption_mentions) if post.caption_mentions else [],
-            "taggedUsers": [u.username for u in post.tagged_users] if hasattr(post, 'tagged_users') and post.tagged_users else [],
-            "mediaType": media_type,
-            "mediaUrl": post.url,
-            "mediaUrls": media_urls,
-            "videoUrl": post.video_url if post.is_video else None,
-            "videoDuration": getattr(post, 'video_duration', None),
-            "sidecarItems": sidecar_items,
-            "likeCount": post.likes,
-            "commentCount": post.comments,
-            "videoViewCount": getattr(post, 'video_view_count', None),
-            "location": location,
-            "permalink": f"https://www.instagram.com/p/{post.shortcode}/",
-            "timestamp": post.date_utc.isoformat() + "Z",
-            "isVideo": post.is_video,
-            "isPinned": getattr(post, 'is_pinned', False),
-            "isSponsored": post.is_sponsored,
-            "likers": [],
-            "comments": [],
+    def _allocate(self) -> int:
+        # Reserve ids in blocks to avoid one INCR round trip per new user
+        if self._next_id >= self._last_id:
+            self._last_id = self.r.incrby(self.seq_key, self.ID_BLOCK) + 1
+            self._next_id = self._last_id - self.ID_BLOCK
+        user_id = self._next_id
+        self._next_id += 1
+        return user_id
+
+    def intern(self, user) -> int:
+        """Return the compact id for ``user``, recording its row once per run."""
+        key = str(getattr(user, "userid", None) or user.username)
+        with self._lock:
+            user_id = self._ids.get(key)
+            if user_id is None:
+                user_id = self._allocate()
+                self._ids[key] = user_id
+                self._new_ids[key] = user_id
+            if user_id not in self._seen:
+                self._seen.add(user_id)
+                record = UserRecord.from_user(user)
+                if self.media:
+                    record.profile_pic_url = self.media.rewrite(record.profile_pic_url)
+                self._pending[user_id] = record
+            flush = len(self._pending) >= self.flush_every
+        if flush:
+            self.flush()
+        return user_id
+
+    def id_of(self, user) -> int | None:
+        """The compact id already assigned to ``user``, without interning it."""
+        with self._lock:
+            return self._ids.get(str(getattr(user, "userid", None) or user.username))
+
+    def flush(self):
+        """Write buffered rows that changed and new id mappings to Redis."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            new_ids, self._new_ids = self._new_ids, {}
+        rows = {user_id: json.dumps(record.to_row()) for user_id, record in pending.items()}
+        if rows:
+            stored = self.r.hmget(self.users_key, list(rows))
+            changed = {user_id: row for (user_id, row), old in zip(rows.items(), stored) if self._changed(row, old)}
+            metrics.incr("skippedWrites", len(rows) - len(changed))
+            rows = changed
+        if not rows and not new_ids:
+            return
+        pipe = self.r.pipeline()
+        if new_ids:
+            pipe.hset(self.ids_key, mapping=new_ids)
+        if rows:
+            pipe.hset(self.users_key, mapping=rows)
+            # Payloads are served with user rows expanded, so their ETags include this
+            pipe.hincrby(f"{self.users_key}:meta", "version", 1)
+            if self._resign:
+                pipe.hset(f"{self.users_key}:meta", "urlEpoch", self._epoch)
+        pipe.execute()
+
+    def _changed(self, row: str, old: str | None) -> bool:
+        if old is None or row == old:
+            return old is None
+        # Re-signed URLs only count as a change in a new SIGNED_URL_MAX_AGE period
+        return self._resign or normalize_urls(json.loads(row))[0] != normalize_urls(json.loads(old))[0]
+
+    def rows(self, ids) -> dict:
+        """Stored rows of ``ids`` as user dicts, keyed by id (flush first)."""
+        ids = list(set(ids))
+        rows = {}
+        for start in range(0, len(ids), LIST_CHUNK_SIZE):
+            batch = ids[start:start + LIST_CHUNK_SIZE]
+            for user_id, raw in zip(batch, self.r.hmget(self.users_key, batch)):
+                if raw:
+                    rows[user_id] = dict(zip(USER_FIELDS, json.loads(raw)))
+        return rows
+
+    def map_pictures(self, rewrite):
+        """Rewrite the profile picture URL of every row seen this run with ``rewrite``."""
+        self.flush()
+        with self._lock:
+            seen = list(self._seen)
+        picture = USER_FIELDS.index("profilePicUrl")
+        changed = {}
+        for start in range(0, len(seen), LIST_CHUNK_SIZE):
+            batch = seen[start:start + LIST_CHUNK_SIZE]
+            for user_id, raw in zip(batch, self.r.hmget(self.users_key, batch)):
+                if not raw:
+                    continue
+                row = json.loads(raw)
+                url = rewrite(row[picture])
+                if url != row[picture]:
+                    row[picture] = url
+                    changed[user_id] = json.dumps(row)
+        if changed:
+            pipe = self.r.pipeline()
+            pipe.hset(self.users_key, mapping=changed)
+            pipe.hincrby(f"{self.users_key}:meta", "version", 1)
+            pipe.execute()
+
+    def prune(self, referenced: set):
+        """Drop rows and id mappings that no stored payload references any more."""
+        self.flush()
+        with self._lock:
+            stale = {key: user_id for key, user_id in self._ids.items() if user_id not in referenced}
+            for key in stale:
+                del self._ids[key]
+        if not stale:
+            return
+        pipe = self.r.pipeline()
+        pipe.hdel(self.ids_key, *stale.keys())
+        pipe.hdel(self.users_key, *stale.values())
+        pipe.execute()
+        print(f"Pruned {len(stale)} unreferenced users")
+
+
+def referenced_user_ids(posts: list) -> set:
+    """Collect the user ids referenced by a posts payload."""
+    ids = set()
+    for post in posts:
+        ids.update(post.get("likerIds", []))
+        for comment in post.get("comments", []):
+            ids.add(comment["ownerId"])
+            ids.update(reply["ownerId"] for reply in comment.get("replies", []))
+    return ids
+
+
+def hydrate_posts(posts: list, rows: dict) -> list:
+    """
+    Expand likerIds and comment/reply ownerIds into users (mirrors
+    hydratePosts in src/lib/cache.ts, without defaulting missing engagement
+    to empty lists, so the SQLite sink keeps what it has stored).
+    """
+    unknown = {"username": "unknown", "fullName": None, "profilePicUrl": None, "isVerified": False, "isPrivate": False}
+
+    def expand(comment):
+        comment = dict(comment)
+        comment["owner"] = rows.get(comment.pop("ownerId"), unknown)
+        comment["replies"] = [expand(reply) for reply in comment.get("replies", [])]
+        return comment
+
+    def hydrate(post):
+        hydrated = {key: value for key, value in post.items() if key != "likerIds"}
+        # Posts refreshed without engagement (LAZY_ENGAGEMENT) carry neither key
+        if "likerIds" in post:
+            hydrated["likers"] = [rows[user_id] for user_id in post["likerIds"] if user_id in rows]
+        if "comments" in post:
+            hydrated["comments"] = [expand(comment) for comment in post["comments"]]
+        return hydrated
+
+    return [hydrate(post) for post in posts]
+
+
+def write_sqlite(r, users: UserTable, results: dict, entities):
+    """Copy this refresh's profile, posts and republished follow lists to SQLITE_PATH."""
+    # Imported here: only refreshes with SQLITE_PATH set use it
+    from _sinks import SQLiteSink
+
+    username = users.username
+    with SQLiteSink(SQLITE_PATH) as sink:
+        sink.write_profile(results["profile"])
+        if "posts" in entities:
+            posts = results["posts"]
+            sink.write_posts(username, hydrate_posts(posts, users.rows(referenced_user_ids(posts))))
+        for kind in ("followers", "following"):
+            if results[kind] is not None:
+                ids = load_list(r, f"ig:{kind}:{username}") or []
+                rows = users.rows(ids)
+                sink.write_follow_list(username, kind, [rows[user_id] for user_id in ids if user_id in rows])
+    print(f"Wrote SQLite copy to {SQLITE_PATH}")
+
+
+def build_post_data(post) -> dict:
+    """Build post metadata without likers or comments."""
+    # Determine media type
+    typename = post.typename
+    if typename == "GraphVideo":
+        media_type = "video"
+    elif typename == "GraphSidecar":
+        media_type = "carousel"
+    else:
+        media_type = "image"
+
+    # Get media URLs
+    media_urls = []
+    sidecar_items = []
+    if post.typename == "GraphSidecar":
+        for node in post.get_sidecar_nodes():
+            media_urls.append(node.display_url)
+            sidecar_items.append({
+                "isVideo": node.is_video,
+                "displayUrl": node.display_url,
+                "videoUrl": getattr(node, 'video_url', None),
+            })
+    else:
+        media_urls.append(post.url)
+
+    # Location
+    location = None
+    if post.location:
+        location = {
+            "id": str(post.location.id) if post.location.id else "",
+            "name": post.location.name or "",
+            "slug": getattr(post.location, 'slug', None),
+            "lat": post.location.lat,
+            "lng": post.location.lng,
         }
 
-        # Fetch likers (rate limited!)
-        if fetch_likers:
+    return {
+        "id": str(post.mediaid),
+        "shortcode": post.shortcode,
+        "typename": typename,
+        "caption": post.caption,
+        "captionHashtags": list(post.caption_hashtags) if post.caption_hashtags else [],
+        "captionMentions": list(post.caption_mentions) if post.caption_mentions else [],
+        "taggedUsers": [u.username for u in post.tagged_users] if hasattr(post, 'tagged_users') and post.tagged_users else [],
+        "mediaType": media_type,
+        "mediaUrl": post.url,
+        "mediaUrls": media_urls,
+        "videoUrl": post.video_url if post.is_video else None,
+        "videoDuration": getattr(post, 'video_duration', None),
+        "sidecarItems": sidecar_items,
+        "likeCount": post.likes,
+        "commentCount": post.comments,
+        "videoViewCount": getattr(post, 'video_view_count', None),
+        "location": location,
+        "permalink": f"https://www.instagram.com/p/{post.shortcode}/",
+        "timestamp": post.date_utc.isoformat() + "Z",
+        "isVideo": post.is_video,
+        "isPinned": getattr(post, 'is_pinned', False),
+        "isSponsored": post.is_sponsored,
+        "likerIds": [],
+        "comments": [],
+    }
+
+
+def fetch_post_likers(post, users: UserTable, limit: int = MAX_LIKERS_PER_POST) -> list:
+    """Fetch up to ``limit`` liker ids for a post (rate limited!)."""
+    likers = []
+    for j, liker in enumerate(post.get_likes()):
+        if j >= limit:
+            break
+        likers.append(users.intern(liker))
+        metrics.incr("items")
+    return likers
+
+
+def user_data(user) -> dict:
+    """A user as stored inline (the dashboard's CachedUser shape)."""
+    return dict(zip(USER_FIELDS, UserRecord.from_user(user).to_row()))
+
+
+def serialize_comment(comment, owner, max_replies: int = MAX_REPLIES_PER_COMMENT) -> dict:
+    """Serialize a comment with up to ``max_replies`` replies; ``owner(user)`` gives the owner fields."""
+    replies = []
+    if hasattr(comment, 'answers'):
+        for k, reply in enumerate(comment.answers):
+            if k >= max_replies:
+                break
+            replies.append({
+                "id": str(reply.id),
+                "text": reply.text,
+                "timestamp": reply.created_at_utc.isoformat() + "Z",
+                "likesCount": reply.likes_count,
+                **owner(reply.owner),
+                "replies": [],
+            })
+            metrics.incr("items")
+
+    metrics.incr("items")
+    return {
+        "id": str(comment.id),
+        "text": comment.text,
+        "timestamp": comment.created_at_utc.isoformat() + "Z",
+        "likesCount": comment.likes_count,
+        **owner(comment.owner),
+        "replies": replies,
+    }
+
+
+def fetch_post_comments(post, users: UserTable, limit: int = MAX_COMMENTS_PER_POST) -> list:
+    """Fetch up to ``limit`` comments for a post, with up to MAX_REPLIES_PER_COMMENT replies each."""
+    comments = []
+    for j, comment in enumerate(post.get_comments()):
+        if j >= limit:
+            break
+        comments.append(serialize_comment(comment, lambda user: {"ownerId": users.intern(user)}))
+    return comments
+
+
+def post_fingerprint(post_data: dict, crawled_at: float) -> dict:
+    """Fingerprint used to decide whether a post's engagement needs re-crawling."""
+    return {
+        "shortcode": post_data["shortcode"],
+        "likeCount": post_data["likeCount"],
+        "commentCount": post_data["commentCount"],
+        "crawledAt": crawled_at,
+    }
+
+
+def needs_engagement_crawl(post_data: dict, fingerprint: dict | None, now: float) -> bool:
+    """Return True if likers/comments must be re-fetched for this post."""
+    if not fingerprint:
+        return True
+    if fingerprint.get("likeCount") != post_data["likeCount"]:
+        return True
+    if fingerprint.get("commentCount") != post_data["commentCount"]:
+        return True
+    return now - fingerprint.get("crawledAt", 0) > POST_RECRAWL_AGE
+
+
+def load_post_fingerprints(r, username: str = IG_USERNAME) -> dict:
+    """Load per-post fingerprints keyed by shortcode."""
+    raw = r.hgetall(f"ig:post_fingerprints:{username}")
+    return {shortcode: json.loads(value) for shortcode, value in raw.items()}
+
+
+def store_post_fingerprints(r, fingerprints: dict, username: str = IG_USERNAME):
+    """Replace the stored fingerprints (no TTL, they must outlive the posts cache)."""
+    key = f"ig:post_fingerprints:{username}"
+    pipe = r.pipeline()
+    pipe.delete(key)
+    if fingerprints:
+        pipe.hset(key, mapping={
+            shortcode: json.dumps(fp) for shortcode, fp in fingerprints.items()
+        })
+    pipe.execute()
+
+
+def crawl_engagement(
+    post,
+    post_data: dict,
+    users: UserTable,
+    fetch_likers: bool = True,
+    fetch_comments: bool = True,
+    max_likers: int = MAX_LIKERS_PER_POST,
+    max_comments: int = MAX_COMMENTS_PER_POST,
+) -> bool:
+    """Fill in likers and comments for one post. Failures are logged, not raised.
+
+    Returns True if every requested fetch succeeded.
+    """
+    print(f"Fetching engagement for {post.shortcode}")
+    ok = True
+
+    # Fetch likers (rate limited!)
+    if fetch_likers:
+        with metrics.stage("likers"):
             try:
-                likers = []
-                for j, liker in enumerate(post.get_likes()):
-                    if j >= MAX_LIKERS_PER_POST:
-                        break
-                    likers.append({
-                        "username": liker.username,
-                        "fullName": liker.full_name,
-                        "profilePicUrl": liker.profile_pic_url,
-                        "isVerified": liker.is_verified,
-                        "isPrivate": liker.is_private,
-                    })
-                post_data["likers"] = likers
+                post_data["likerIds"] = fetch_post_likers(post, users, max_likers)
             except Exception as e:
-                print(f"  Failed to fetch likers: {e}")
+                print(f"  Failed to fetch likers for {post.shortcode}: {e}")
+                metrics.incr("errors")
+                ok = False
 
-        # Fetch comments
-        if fetch_comments:
+    # Fetch comments
+    if fetch_comments:
+        with metrics.stage("comments"):
             try:
-                comments = []
-                for j, comment in enumerate(post.get_comments()):
-                    if j >= MAX_COMMENTS_PER_POST:
-                        break
-
-                    # Get replies
-                    replies = []
-                    if hasattr(comment, 'answers'):
-                        for k, reply in enumerate(comment.answers):
-                            if k >= 5:
-                                break
-                            replies.append({
-                                "id": str(reply.id),
-                                "text": reply.text,
-                                "timestamp": reply.created_at_utc.isoformat() + "Z",
-                                "likesCount": reply.likes_count,
-                                "owner": {
-                                    "username": reply.owner.username,
-                                    "fullName": reply.owner.full_name,
-                                    "profilePicUrl": reply.owner.profile_pic_url,
-                                    "isVerified": reply.owner.is_verified,
-                                    "isPrivate": reply.owner.is_private,
-                                },
-                                "replies": [],
-                            })
-
-                    comments.append({
-                        "id": str(comment.id),
-                        "text": comment.text,
-                        "timestamp": comment.created_at_utc.isoformat() + "Z",
-                        "likesCount": comment.likes_count,
-                        "owner": {
-                            "username": comment.owner.username,
-                            "fullName": comment.owner.full_name,
-                            "profilePicUrl": comment.owner.profile_pic_url,
-                            "isVerified": comment.owner.is_verified,
-                            "isPrivate": comment.owner.is_private,
-                        },
-                        "replies": replies,
-                    })
-                post_data["comments"] = comments
+                post_data["comments"] = fetch_post_comments(post, users, max_comments)
             except Exception as e:
-                print(f"  Failed to fetch comments: {e}")
+                print(f"  Failed to fetch comments for {post.shortcode}: {e}")
+                metrics.incr("errors")
+                ok = False
+
+    return ok
+
 
+def fetch_posts(
+    profile: instaloader.Profile,
+    users: UserTable,
+    fetch_likers: bool = True,
+    fetch_comments: bool = True,
+    previous: list | None = None,
+    fingerprints: dict | None = None,
+    full_scan: bool = True,
+    executor: ThreadPoolExecutor | None = None,
+    progress: RefreshLease | None = None,
+    scheduler: RequestScheduler | None = None,
+    on_listing=None,
+) -> list:
+    """
+    Fetch posts with metadata, optionally including likers and comments.
+
+    When ``previous`` (the last stored posts payload) and ``fingerprints`` are
+    given, likers/comments are only re-fetched for posts that are new, whose
+    like/comment counts changed, or whose engagement data is older than
+    POST_RECRAWL_AGE; everything else is reused from ``previous``. Without
+    ``full_scan``, paging stops at the first known non-pinned post and the
+    remaining posts are carried over from ``previous``. ``fingerprints`` is
+    updated in place.
+
+    Without ``fetch_likers`` and ``fetch_comments`` (LAZY_ENGAGEMENT) only
+    metadata and counts are kept and no fingerprints are recorded, so
+    switching back re-crawls every post.
+
+    Post metadata is paged serially; likers/comments are fetched on
+    ``executor`` when given. Likers and comment owners are stored as ids
+    interned in ``users``. Engagement crawls are counted on ``progress``.
+
+    With a ``scheduler``, pending crawls are ranked by expected value per
+    request and only those fitting the remaining budget run; posts older
+    than RECENT_POST_DAYS get reduced liker/comment caps. Deferred posts keep
+    their previous engagement data and stay due for the next refresh.
+
+    ``on_listing`` is called with the posts list (previous engagement data
+    where known) once paging is done, before any likers/comments are
+    fetched; the same dicts are then filled in place.
+    """
+    # Payloads from before the user table carry inline users; re-crawl those
+    previous = [p for p in previous or [] if "likerIds" in p]
+    previous_by_shortcode = {p["shortcode"]: p for p in previous}
+    if fingerprints is None:
+        fingerprints = {}
+    now = datetime.now(timezone.utc).timestamp()
+    posts = []
+    pending = []
+
+    for i, post in enumerate(profile.get_posts()):
+        if i >= MAX_POSTS:
+            break
+
+        known = previous_by_shortcode.get(post.shortcode)
+        if not full_scan and known is not None and not getattr(post, 'is_pinned', False):
+            print(f"Reached known post {post.shortcode}, stopping incremental scan")
+            break
+
+        post_data = build_post_data(post)
+        metrics.incr("items")
+        fingerprint = fingerprints.get(post.shortcode)
+
+        if known is not None and not needs_engagement_crawl(post_data, fingerprint, now):
+            post_data["likerIds"] = known.get("likerIds", [])
+            post_data["comments"] = known.get("comments", [])
+            fingerprints[post.shortcode] = post_fingerprint(post_data, fingerprint["crawledAt"])
+            posts.append(post_data)
+            continue
+
+        print(f"Fetched post {i + 1}/{MAX_POSTS}: {post.shortcode}")
+        if known is not None:
+            # Serve the previous engagement until the re-crawl replaces it
+            post_data["likerIds"] = known.get("likerIds", [])
+            post_data["comments"] = known.get("comments", [])
+        pending.append((post, post_data))
         posts.append(post_data)
 
+    # Carry over older posts that were not paged this run
+    if not full_scan:
+        seen = {p["shortcode"] for p in posts}
+        for post_data in previous:
+            if len(posts) >= MAX_POSTS:
+                break
+            if post_data["shortcode"] not in seen:
+                posts.append(post_data)
+
+    if not fetch_likers and not fetch_comments:
+        for post_data in posts:
+            post_data["likerIds"] = []
+            post_data["comments"] = []
+        fingerprints.clear()
+        pending = []
+
+    # Decide which engagement crawls fit the budget, most valuable per request first
+    caps = {}
+    if scheduler:
+        ranked = []
+        for post, post_data in pending:
+            max_likers, max_comments = engagement_caps(post_data, now, MAX_LIKERS_PER_POST, MAX_COMMENTS_PER_POST)
+            cost = engagement_cost(post_data, max_likers if fetch_likers else 0, max_comments if fetch_comments else 0)
+            value = engagement_value(post_data, fingerprints.get(post.shortcode), now, POST_RECRAWL_AGE)
+            ranked.append((value / cost, cost, post, post_data, max_likers, max_comments))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        scheduler.engagement_demand = sum(item[1] for item in ranked)
+        scheduled = []
+        for _, cost, post, post_data, max_likers, max_comments in ranked:
+            if scheduler.reserve(cost, label=f"post:{post.shortcode}"):
+                scheduled.append((post, post_data))
+                caps[post.shortcode] = (max_likers, max_comments)
+                continue
+            # Deferred: keep what we had; the old fingerprint keeps the post due next time
+            if post.shortcode not in fingerprints:
+                fingerprints[post.shortcode] = post_fingerprint(post_data, 0)
+        if len(scheduled) < len(pending):
+            print(f"Deferred engagement for {len(pending) - len(scheduled)} posts (request budget)")
+        pending = scheduled
+
+    # Publish the listing before the engagement crawls so new posts show up early
+    if on_listing is not None:
+        on_listing(posts)
+
+    # Fetch likers/comments for new or changed posts
+    if progress:
+        progress.update("posts", done=0, total=len(pending))
+
+    def crawl(post, post_data):
+        check_lease(progress)
+        max_likers, max_comments = caps.get(post.shortcode, (MAX_LIKERS_PER_POST, MAX_COMMENTS_PER_POST))
+        ok = crawl_engagement(post, post_data, users, fetch_likers, fetch_comments, max_likers, max_comments)
+        if progress:
+            progress.advance("posts")
+        return ok
+
+    if executor is not None:
+        futures = [executor.submit(crawl, post, post_data) for post, post_data in pending]
+        outcomes = [future.result() for future in futures]
+    else:
+        outcomes = [crawl(post, post_data) for post, post_data in pending]
+
+    # A failed crawl keeps crawledAt at 0 so the next refresh retries it
+    for (post, post_data), ok in zip(pending, outcomes):
+        fingerprints[post.shortcode] = post_fingerprint(post_data, now if ok else 0)
+
+    # Drop fingerprints for posts that fell out of the window
+    kept = {p["shortcode"] for p in posts}
+    for shortcode in list(fingerprints):
+        if shortcode not in kept:
+            del fingerprints[shortcode]
+
+    print(f"Crawled engagement for {len(pending)}/{len(posts)} posts")
     return posts
 
 
-def fetch_followers(loader: instaloader.Instaloader) -> list:
-    """Fetch followers list."""
-    profile = instaloader.Profile.from_username(loader.context, IG_USERNAME)
-    followers = []
+def iter_follow_list(profile: instaloader.Profile, users: UserTable, kind: str, outcome: dict | None = None):
+    """
+    Yield up to MAX_FOLLOWERS user ids of ``kind`` ("followers" or "following").
 
+    ``outcome["complete"]`` is set to False if the list was cut short by an
+    error or the cap.
+    """
+    outcome = outcome if outcome is not None else {}
+    outcome["complete"] = True
     try:
-        for i, follower in enumerate(profile.get_followers()):
+        iterator = profile.get_followers() if kind == "followers" else profile.get_followees()
+        for i, user in enumerate(iterator):
             if i >= MAX_FOLLOWERS:
+                outcome["complete"] = False
                 break
-            followers.append({
-                "username": follower.username,
-                "fullName": follower.full_name,
-                "profilePicUrl": follower.profile_pic_url,
-                "isVerified": follower.is_verified,
-                "isPrivate": follower.is_private,
-            })
+            metrics.incr("items")
+            yield users.intern(user)
             if (i + 1) % 100 == 0:
-                print(f"Fetched {i + 1} followers...")
+                print(f"Fetched {i + 1} {kind}...")
     except Exception as e:
-        print(f"Failed to fetch followers: {e}")
+        print(f"Failed to fetch {kind}: {e}")
+        metrics.incr("errors")
+        outcome["complete"] = False
+
+
+def fetch_followers(profile: instaloader.Profile, users: UserTable) -> list:
+    """Fetch followers list as user ids."""
+    return list(iter_follow_list(profile, users, "followers"))
+
 
-    return followers
+def fetch_following(profile: instaloader.Profile, users: UserTable) -> list:
+    """Fetch following list as user ids."""
+    return list(iter_follow_list(profile, users, "following"))
 
 
-def fetch_following(loader: instaloader.Instaloader) -> list:
-    """Fetch following list."""
-    profile = instaloader.Profile.from_username(loader.context, IG_USERNAME)
-    following = []
+def check_lease(progress: RefreshLease | None):
+    """Stop the refresh (LeaseLost) if another refresh took over its lease; called before storing anything."""
+    if progress:
+        progress.check()
 
+
+def count_progress(ids, progress: RefreshLease | None, stage: str):
+    """Pass ``ids`` through, counting them on ``progress`` (and stopping if its lease is lost)."""
+    for user_id in ids:
+        if progress:
+            progress.check()
+            progress.advance(stage)
+        yield user_id
+
+
+def publish_follow_list(r, users: UserTable, kind: str, ids, outcome: dict) -> int:
+    """
+    Store a follow list from an id stream and record its churn.
+
+    Ids are mirrored into a Redis set while they are stored so the diff
+    against the previous snapshot runs server-side. ``outcome["complete"]``
+    is read after the stream is exhausted. Returns the count.
+    """
+    next_key = f"ig:{kind}_ids_next:{users.username}"
+    total = store_list(
+        r,
+        f"ig:{kind}:{users.username}",
+        track_ids(r, next_key, ids),
+        before_chunk=users.flush,
+    )
+    users.flush()
+    record_churn(
+        r,
+        users.username,
+        kind,
+        next_key,
+        users.users_key,
+        USER_FIELDS,
+        complete=outcome.get("complete", True),
+    )
+    return total
+
+
+def stream_follow_list(
+    r,
+    profile: instaloader.Profile,
+    users: UserTable,
+    kind: str,
+    progress: RefreshLease | None = None,
+) -> int:
+    """Crawl followers/following straight into chunked storage. Returns the count."""
+    outcome = {}
+    ids = count_progress(iter_follow_list(profile, users, kind, outcome), progress, kind)
+    return publish_follow_list(r, users, kind, ids, outcome)
+
+
+def crawl_follow_list(
+    r,
+    profile: instaloader.Profile,
+    users: UserTable,
+    kind: str,
+    progress: RefreshLease | None = None,
+    max_pages: int | None = None,
+) -> int | None:
+    """
+    Resumable crawl of ``kind`` ("followers" or "following") across invocations.
+
+    After every page the iterator's frozen state and the page's users are
+    saved together to ``ig:crawl:{kind}:{username}``, so a timeout or error
+    loses at most one page. Each call runs for up to FOLLOW_CRAWL_BUDGET
+    seconds (and ``max_pages`` pages, if given), resuming where the previous
+    call stopped. Once the crawl
+    completes the list is published to ``ig:{kind}:{username}`` and its
+    count returned; while it is still in progress, returns None.
+    """
+    state_key = f"ig:crawl:{kind}:{users.username}"
+    items_key = f"{state_key}:items"
+    get_iterator = profile.get_followers if kind == "followers" else profile.get_followees
     try:
-        for i, followee in enumerate(profile.get_followees()):
-            if i >= MAX_FOLLOWERS:
+        iterator = get_iterator()
+    except Exception as e:
+        print(f"Failed to start {kind} crawl: {e}")
+        metrics.incr("errors")
+        return None
+
+    # Resume from the last checkpoint if it is still usable
+    state = json.loads(r.get(state_key) or "null")
+    count = 0
+    last_username = None
+    if state:
+        frozen = instaloader.nodeiterator.FrozenNodeIterator(**state["frozen"])
+        try:
+            if frozen.best_before and frozen.best_before < time.time():
+                raise instaloader.exceptions.InvalidArgumentException("checkpoint expired")
+            iterator.thaw(frozen)
+            count = state["count"]
+            last_username = state["lastUsername"]
+            print(f"Resuming {kind} crawl at {count}")
+        except instaloader.exceptions.InvalidArgumentException as e:
+            print(f"Restarting {kind} crawl: {e}")
+            metrics.incr("retries")
+            iterator = get_iterator()
+            count = 0
+            last_username = None
+            r.delete(state_key, items_key)
+
+    resumed_from = last_username
+    started = time.monotonic()
+    page = []
+    pages_done = 0
+    complete = True
+    capped = False
+
+    def checkpoint():
+        check_lease(progress)
+        users.flush()
+        pipe = r.pipeline()
+        if page:
+            pipe.rpush(items_key, *(json.dumps(item) for item in page))
+        pipe.set(state_key, json.dumps({
+            "frozen": iterator.freeze()._asdict(),
+            "count": count,
+            "lastUsername": last_username,
+        }))
+        pipe.execute()
+        page.clear()
+
+    try:
+        for user in iterator:
+            # A thawed iterator repeats the last item it yielded before freezing
+            if resumed_from is not None:
+                skip = user.username == resumed_from
+                resumed_from = None
+                if skip:
+                    continue
+            if MAX_FOLLOWERS_RESUMABLE and count >= MAX_FOLLOWERS_RESUMABLE:
+                capped = True
                 break
-            following.append({
-                "username": followee.username,
-                "fullName": followee.full_name,
-                "profilePicUrl": followee.profile_pic_url,
-                "isVerified": followee.is_verified,
-                "isPrivate": followee.is_private,
-            })
-            if (i + 1) % 100 == 0:
-                print(f"Fetched {i + 1} following...")
+            page.append(users.intern(user))
+            metrics.incr("items")
+            count += 1
+            last_username = user.username
+            if iterator.total_index % iterator.page_length() == 0:
+                checkpoint()
+                if progress:
+                    progress.update(kind, done=count)
+                print(f"Fetched {count} {kind}...")
+                pages_done += 1
+                if time.monotonic() - started > FOLLOW_CRAWL_BUDGET or pages_done == max_pages:
+                    complete = False
+                    break
     except Exception as e:
-        print(f"Failed to fetch following: {e}")
+        print(f"{kind.capitalize()} crawl interrupted at {count}: {e}")
+        metrics.incr("errors")
+        complete = False
 
-    return following
+    if not complete:
+        # Only checkpoint fully processed items; the crawl continues next call
+        if page:
+            checkpoint()
+        return None
 
+    check_lease(progress)
+    users.flush()
+    if page:
+        r.rpush(items_key, *(json.dumps(item) for item in page))
+    total = publish_follow_list(r, users, kind, iter_redis_list(r, items_key), {"complete": not capped})
+    r.delete(state_key, items_key)
+    print(f"Completed {kind} crawl with {total} users")
+    return total
 
-def store_data(r, key: str, data, ttl: int = CACHE_TTL):
-    """Store data in Redis with TTL."""
-    r.setex(key, ttl, json.dumps(data))
 
+def store_data(r, key: str, data, ttl: int = CACHE_HARD_TTL) -> bool:
+    """
+    Store data in Redis with TTL, encoded with STORAGE_FORMAT.
 
-class handler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        """Handle refresh request."""
+    ``{key}:meta`` holds the content hash (served as ETags by the
+    dashboard), a version bumped on every change and the format it was
+    encoded with. Unchanged content already in STORAGE_FORMAT is not
+    re-encoded or rewritten, only its TTL extended, so VOLATILE_FIELDS
+    (e.g. a profile's ``lastUpdated``) record when the content last changed;
+    per-entity refresh times are in api/_cadence.py. Returns True if written.
+    """
+    digest = content_hash(data)
+    meta_key = f"{key}:meta"
+    pipe = r.pipeline()
+    pipe.hmget(meta_key, ["hash", "format"])
+    pipe.exists(key)
+    (stored_hash, stored_format), exists = pipe.execute()
+    if stored_hash == digest and stored_format == STORAGE_FORMAT and exists:
+        pipe = r.pipeline()
+        pipe.expire(key, ttl)
+        pipe.expire(meta_key, ttl)
+        pipe.execute()
+        metrics.incr("skippedWrites")
+        return False
+
+    payload = encode_payload(data)
+    with metrics.redis_write(len(payload)):
+        pipe = r.pipeline()
+        pipe.setex(key, ttl, payload)
+        pipe.hset(meta_key, mapping={"hash": digest, "format": STORAGE_FORMAT})
+        if stored_hash != digest:
+            pipe.hincrby(meta_key, "version", 1)
+        pipe.expire(meta_key, ttl)
+        pipe.execute()
+    return True
+
+
+def store_list(
+    r,
+    key: str,
+    items,
+    ttl: int = CACHE_HARD_TTL,
+    chunk_size: int = LIST_CHUNK_SIZE,
+    before_chunk=None,
+) -> int:
+    """
+    Store a list as fixed-size chunks plus a small manifest, consuming ``items`` lazily.
+
+    Chunks are written to ``{key}:chunk:{generation}:{n}`` as they fill, so a
+    generator producer keeps memory flat. The manifest at ``{key}:manifest``
+    is swapped in last; chunks of the previous generation are left to expire
+    shortly after so in-flight readers can finish. ``before_chunk`` is called
+    before each chunk is written (e.g. to flush the user table the chunk
+    refers to). Returns the item count.
+
+    The manifest records each chunk's content hash, a hash of the whole list,
+    a version bumped when it changes and the chunks' STORAGE_FORMAT. A chunk
+    whose content matches the previous generation's chunk at the same
+    position is kept instead of rewritten, unless the format changed.
+    """
+    manifest_key = f"{key}:manifest"
+    old_manifest = json.loads(r.get(manifest_key) or "null") or {}
+    reusable = old_manifest.get("chunkSize") == chunk_size and old_manifest.get("format") == STORAGE_FORMAT
+    old_chunks = old_manifest.get("chunks", []) if reusable else []
+    old_hashes = old_manifest.get("hashes") or []
+    generation = uuid.uuid4().hex[:8]
+    chunk_ids = []
+    hashes = []
+    chunk = []
+    count = 0
+
+    def flush():
+        if before_chunk is not None:
+            before_chunk()
+        index = len(chunk_ids)
+        digest = content_hash(chunk)
+        if index < min(len(old_chunks), len(old_hashes)) and old_hashes[index] == digest and \
+                r.expire(f"{key}:chunk:{old_chunks[index]}", ttl):
+            chunk_id = old_chunks[index]
+            metrics.incr("skippedWrites")
+        else:
+            chunk_id = f"{generation}:{index}"
+            payload = encode_payload(chunk)
+            with metrics.redis_write(len(payload)):
+                r.setex(f"{key}:chunk:{chunk_id}", ttl, payload)
+        chunk_ids.append(chunk_id)
+        hashes.append(digest)
+        chunk.clear()
+
+    for item in items:
+        chunk.append(item)
+        count += 1
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    digest = hashlib.blake2b("".join(hashes).encode(), digest_size=16).hexdigest()
+    version = old_manifest.get("version", 0) + (digest != old_manifest.get("hash"))
+    pipe = r.pipeline()
+    pipe.setex(manifest_key, ttl, json.dumps({
+        "count": count,
+        "chunkSize": chunk_size,
+        "chunks": chunk_ids,
+        "hashes": hashes,
+        "hash": digest,
+        "version": version,
+        "format": STORAGE_FORMAT,
+        "updatedAt": datetime.utcnow().isoformat() + "Z",
+    }))
+    pipe.delete(key)
+    for chunk_id in set(old_manifest.get("chunks", [])) - set(chunk_ids):
+        pipe.expire(f"{key}:chunk:{chunk_id}", SUPERSEDED_CHUNK_TTL)
+    pipe.execute()
+    return count
+
+
+def load_list(r, key: str) -> list | None:
+    """Load a list stored by store_list, falling back to a single blob."""
+    rb = binary_client(r)
+    manifest = json.loads(rb.get(f"{key}:manifest") or "null")
+    if manifest is None:
+        return decode_payload(rb.get(key))
+    items = []
+    chunk_keys = [f"{key}:chunk:{chunk_id}" for chunk_id in manifest["chunks"]]
+    for raw in (rb.mget(chunk_keys) if chunk_keys else []):
+        if raw is None:
+            return None
+        items.extend(decode_payload(raw))
+    return items
+
+
+def iter_redis_list(r, key: str, batch: int = LIST_CHUNK_SIZE):
+    """Yield JSON items from a Redis list in batches."""
+    start = 0
+    while True:
+        raw_items = r.lrange(key, start, start + batch - 1)
+        if not raw_items:
+            return
+        for raw in raw_items:
+            yield json.loads(raw)
+        start += batch
+
+
+def fetch_posts_incremental(
+    r,
+    profile: instaloader.Profile,
+    users: UserTable,
+    executor: ThreadPoolExecutor | None = None,
+    progress: RefreshLease | None = None,
+    scheduler: RequestScheduler | None = None,
+    on_listing=None,
+) -> list:
+    """Fetch posts reusing the stored payload and fingerprints from the last refresh."""
+    previous = load_list(r, f"ig:posts:{users.username}") or []
+    fingerprints = load_post_fingerprints(r, users.username) if previous else {}
+
+    scanned_key = f"ig:posts_scanned_at:{users.username}"
+    now = datetime.now(timezone.utc).timestamp()
+    last_scan = float(r.get(scanned_key) or 0)
+    # Posts whose crawl failed or was deferred are only reachable by a full scan
+    retry_due = any(not fingerprint.get("crawledAt") for fingerprint in fingerprints.values())
+    full_scan = not previous or retry_due or now - last_scan > POST_FULL_SCAN_AGE
+
+    posts = fetch_posts(
+        profile,
+        users,
+        fetch_likers=not LAZY_ENGAGEMENT,
+        fetch_comments=not LAZY_ENGAGEMENT,
+        previous=previous,
+        fingerprints=fingerprints,
+        full_scan=full_scan,
+        executor=executor,
+        progress=progress,
+        scheduler=scheduler,
+        on_listing=on_listing,
+    )
+
+    check_lease(progress)
+    store_post_fingerprints(r, fingerprints, users.username)
+    if full_scan:
+        r.set(scanned_key, str(now))
+    return posts
+
+
+ENGAGEMENT_KINDS = ("likers", "comments")
+
+
+def post_engagement_key(username: str, shortcode: str, kind: str) -> str:
+    return f"ig:post_engagement:{username}:{shortcode}:{kind}"
+
+
+# Post.get_likes() is a generator over a NodeIterator of this query (instaloader
+# 4.13); the iterator is built here instead so a page of likers can be frozen
+LIKES_QUERY_HASH = "1cb6ec562846122743b61e492c85999f"
+
+
+def engagement_iterator(context, post, kind: str):
+    """
+    A post's likers as a NodeIterator, or its comments as Post.get_comments()
+    returns them: a NodeIterator, a list (every comment inline in the post's
+    metadata) or a generator (instaloader's iPhone endpoint fallback).
+    """
+    if kind == "comments":
+        return post.get_comments()
+    if not post.likes:
+        return []
+    return instaloader.NodeIterator(
+        context,
+        LIKES_QUERY_HASH,
+        lambda data: data["data"]["shortcode_media"]["edge_liked_by"],
+        lambda node: instaloader.Profile(context, node),
+        {"shortcode": post.shortcode},
+        f"https://www.instagram.com/p/{post.shortcode}/",
+    )
+
+
+def fetch_engagement_page(context, post, kind: str, state: dict | None) -> tuple:
+    """
+    Fetch one page of a post's ``kind`` ("likers" or "comments"), resuming
+    after the page ``state`` describes.
+
+    A NodeIterator is resumed from the previous page's frozen state. Lists
+    and generators can't be frozen, so they are paged by offset, re-reading
+    the earlier items (free for a list, one request per earlier page for
+    the iPhone endpoint). Likers and comment owners are inline user dicts
+    (no user table). Returns ``(items, state)``, with ``state`` None once
+    the list is exhausted. Raises InvalidArgumentException if ``state`` can
+    no longer be resumed.
+    """
+    iterator = engagement_iterator(context, post, kind)
+
+    def serialize(node):
+        if kind == "likers":
+            metrics.incr("items")
+            return user_data(node)
+        return serialize_comment(node, lambda user: {"owner": user_data(user)})
+
+    if not isinstance(iterator, instaloader.NodeIterator):
+        if state and "offset" not in state:
+            raise instaloader.exceptions.InvalidArgumentException("cursor no longer matches the list")
+        offset = state["offset"] if state else 0
+        page_length = instaloader.NodeIterator.page_length()
+        # One item past the page tells whether another page follows
+        nodes = list(itertools.islice(iterator, offset, offset + page_length + 1))
+        items = [serialize(node) for node in nodes[:page_length]]
+        return items, {"offset": offset + page_length} if len(nodes) > page_length else None
+
+    resumed_from = None
+    if state:
+        if "frozen" not in state:
+            raise instaloader.exceptions.InvalidArgumentException("cursor no longer matches the list")
+        frozen = instaloader.nodeiterator.FrozenNodeIterator(**state["frozen"])
+        if frozen.best_before and frozen.best_before < time.time():
+            raise instaloader.exceptions.InvalidArgumentException("cursor expired")
+        iterator.thaw(frozen)
+        resumed_from = state["last"]
+
+    items = []
+    for node in iterator:
+        node_id = node.username if kind == "likers" else str(node.id)
+        # A thawed iterator repeats the last item it yielded before freezing
+        if resumed_from is not None:
+            skip = node_id == resumed_from
+            resumed_from = None
+            if skip:
+                continue
+        items.append(serialize(node))
+        if iterator.total_index % iterator.page_length() == 0:
+            return items, {"frozen": iterator.freeze()._asdict(), "last": node_id}
+    return items, None
+
+
+def engagement_page_cost(kind: str, state: dict | None) -> int:
+    """
+    Upper bound on the requests fetch_engagement_page makes for the page
+    after ``state``, plus one to resolve the post. A frozen iterator costs
+    one page; an offset page re-reads every earlier page and looks one item
+    past its own. The first page of comments may be either.
+    """
+    if state and "frozen" in state or not state and kind == "likers":
+        return 2
+    offset = state["offset"] if state else 0
+    return 1 + pages(offset + page_length() + 1)
+
+
+def plan_follow_lists(
+    r,
+    profile: instaloader.Profile,
+    scheduler: RequestScheduler,
+    username: str = IG_USERNAME,
+    kinds=("followers", "following"),
+) -> dict:
+    """
+    Pages each of ``kinds`` may use this run (None for no limit, 0 to skip).
+
+    Lists are ranked by staleness per request. Lists fresher than
+    FOLLOW_LIST_MAX_AGE leave the expected engagement cost of the posts
+    stage untouched; stale ones compete for the whole remaining budget.
+    Streamed lists are all-or-nothing; resumable crawls may take a partial
+    allowance and continue next run.
+    """
+    cap = MAX_FOLLOWERS_RESUMABLE if RESUMABLE_FOLLOW_CRAWL else MAX_FOLLOWERS
+    now = time.time()
+    candidates = []
+    for kind, count in (("followers", profile.followers), ("following", profile.followees)):
+        if kind not in kinds:
+            continue
+        manifest = json.loads(r.get(f"ig:{kind}:{username}:manifest") or "null")
+        age = None
+        if manifest:
+            updated = datetime.fromisoformat(manifest["updatedAt"].rstrip("Z")).replace(tzinfo=timezone.utc)
+            age = now - updated.timestamp()
+        cost = max(1, pages(min(count, cap) if cap else count))
+        candidates.append((follow_value(age) / cost, follow_value(age), cost, kind))
+
+    allowance = {}
+    for _, value, cost, kind in sorted(candidates, reverse=True):
+        held_back = 0 if value >= 1 else scheduler.engagement_estimate
+        available = scheduler.remaining - held_back
+        if RESUMABLE_FOLLOW_CRAWL:
+            granted = min(cost, max(0, available))
+        else:
+            granted = cost if available >= cost else 0
+        if granted and scheduler.reserve(granted):
+            allowance[kind] = granted if RESUMABLE_FOLLOW_CRAWL and granted < cost else None
+        else:
+            scheduler.deferred.append(kind)
+            allowance[kind] = 0
+    return allowance
+
+
+def run_refresh(
+    r,
+    loader: instaloader.Instaloader,
+    progress: RefreshLease | None = None,
+    scheduler: RequestScheduler | None = None,
+    username: str = IG_USERNAME,
+    entities=ENTITIES,
+) -> dict:
+    """
+    Run the refresh pipeline and store each stage's result as soon as it is ready.
+
+    The profile is resolved once and shared by all stages. Profile, posts,
+    followers and following run concurrently; per-post likers/comments run on
+    a separate pool of REFRESH_WORKERS threads. All requests go through the
+    loader's shared RequestLimiter. Results hold the profile and posts
+    payloads and the stored followers/following counts (None while a
+    RESUMABLE_FOLLOW_CRAWL crawl is still in progress). Users are interned
+    into one UserTable shared by every stage. Stage states and item counts
+    are reported on ``progress``; timings and counters go to ``metrics``,
+    attributed to the calling thread's account (see run_job). If the lease
+    behind ``progress`` is taken over, the refresh raises LeaseLost before
+    its next store instead of overwriting the new holder's data.
+
+    Only the stages in ``entities`` run (see api/_cadence.py); the profile is
+    always stored since resolving it is the one request every stage needs.
+    A skipped posts stage reuses the stored posts for insights. Each stored
+    stage records its refresh time. With MEDIA_CACHE on, images are served
+    from the media cache (see api/_media.py). With SQLITE_PATH set, what this refresh
+    stored is also written to that SQLite database (see write_sqlite).
+
+    With a ``scheduler``, the profile and post listing are always fetched,
+    while follow lists and engagement crawls only run as far as the request
+    budget allows. Skipped follow lists keep their last published version
+    and report None.
+    """
+    print(f"Resolving profile @{username}...")
+    with metrics.stage("profile"):
+        profile = instaloader.Profile.from_username(loader.context, username)
+    media = MediaCache(r) if MEDIA_CACHE else None
+    users = UserTable(r, username=username, media=media)
+    results = {}
+    kinds = [kind for kind in ("followers", "following") if kind in entities]
+    follow_pages = {kind: None if kind in kinds else 0 for kind in ("followers", "following")}
+    if scheduler:
+        scheduler.reserve(1 + (pages(MAX_POSTS) if "posts" in entities else 0), force=True)
+        follow_pages.update(plan_follow_lists(r, profile, scheduler, username, kinds))
+    if progress:
+        cap = MAX_FOLLOWERS_RESUMABLE if RESUMABLE_FOLLOW_CRAWL else MAX_FOLLOWERS
+        progress.update("profile", total=1)
+        progress.update("posts", state=None if "posts" in entities else "fresh")
+        progress.update("followers", total=min(profile.followers, cap) if cap else profile.followers)
+        progress.update("following", total=min(profile.followees, cap) if cap else profile.followees)
+
+    def localize(data):
+        # Cached images are stored as their cached URLs right away, so payloads only change once
+        return media.rewrite_payload(data) if media else data
+
+    def publish_listing(posts: list):
+        # Posts are readable (with previous engagement) while likers/comments are crawled
+        check_lease(progress)
+        users.flush()
+        store_list(r, f"ig:posts:{username}", localize(posts), chunk_size=POSTS_CHUNK_SIZE)
+        if progress:
+            progress.update("posts", published=True)
+
+    # Pool threads report metrics to this thread's account
+    bind = {"initializer": metrics.bind, "initargs": (metrics.account,)}
+    with ThreadPoolExecutor(max_workers=REFRESH_WORKERS, **bind) as engagement_pool, \
+            ThreadPoolExecutor(max_workers=4, **bind) as stage_pool:
+        stages = {stage_pool.submit(metrics.staged("profile", fetch_profile), profile): "profile"}
+        posts_stage = metrics.staged("posts", fetch_posts_incremental if INCREMENTAL_POSTS else fetch_posts)
+        if "posts" not in entities:
+            # Not due: insights and gc work from the stored posts
+            results["posts"] = load_list(r, f"ig:posts:{username}") or []
+        elif INCREMENTAL_POSTS:
+            stages[stage_pool.submit(
+                posts_stage, r, profile, users, engagement_pool, progress, scheduler, publish_listing,
+            )] = "posts"
+        else:
+            stages[stage_pool.submit(
+                posts_stage, profile, users, fetch_likers=not LAZY_ENGAGEMENT, fetch_comments=not LAZY_ENGAGEMENT,
+                executor=engagement_pool, progress=progress, scheduler=scheduler, on_listing=publish_listing,
+            )] = "posts"
+        # Follow lists are streamed into chunked storage by the stage itself
+        for kind in ("followers", "following"):
+            if follow_pages[kind] == 0:
+                fresh = kind not in entities
+                print(f"Skipping {kind} (not due)" if fresh else f"Deferring {kind} (request budget)")
+                results[kind] = None
+                if progress:
+                    progress.update(kind, state="fresh" if fresh else "deferred")
+                continue
+            if RESUMABLE_FOLLOW_CRAWL:
+                future = stage_pool.submit(
+                    metrics.staged(kind, crawl_follow_list), r, profile, users, kind, progress, follow_pages[kind],
+                )
+            else:
+                future = stage_pool.submit(metrics.staged(kind, stream_follow_list), r, profile, users, kind, progress)
+            stages[future] = kind
+
+        for future in as_completed(stages):
+            stage = stages[future]
+            try:
+                results[stage] = future.result()
+                if stage in ("profile", "posts"):
+                    results[stage] = localize(results[stage])
+            except Exception:
+                if progress:
+                    progress.update(stage, state="failed")
+                raise
+            check_lease(progress)
+            if stage == "profile":
+                with metrics.stage("store"):
+                    store_data(r, f"ig:profile:{username}", results[stage])
+                if progress:
+                    progress.update(stage, done=1)
+            elif stage == "posts":
+                with metrics.stage("store"):
+                    users.flush()
+                    store_list(r, f"ig:posts:{username}", results[stage], chunk_size=POSTS_CHUNK_SIZE)
+            elif results[stage] is None:
+                # Resumable crawl still in progress; keep the last published list
+                print(f"{stage.capitalize()} crawl checkpointed, not publishing yet")
+                if progress:
+                    progress.update(stage, state="checkpointed")
+                continue
+            mark_refreshed(r, username, stage)
+            if progress:
+                progress.update(stage, state="done", published=True)
+            print(f"Stored {stage}")
+
+    # Post-processing: precompute dashboard insights from the final payloads
+    check_lease(progress)
+    with metrics.stage("insights"):
+        # Imported here: NumPy is only needed by this stage
+        from _insights import compute_insights
+        insights = compute_insights(results["profile"], results["posts"])
+        store_data(r, f"ig:stats:{username}", insights)
+    print("Stored insights")
+
+    # Append this refresh's counters to the snapshot archive (deltas only)
+    check_lease(progress)
+    with metrics.stage("snapshot"):
+        record_snapshot(RedisSnapshotStore(r, username), results["profile"], results["posts"])
+
+    # Inverted engagement index and its joins with the follower snapshot
+    check_lease(progress)
+    with metrics.stage("engagement"):
+        if "posts" in entities:
+            update_engagement_index(r, username, results["posts"], exclude=users.id_of(profile))
+        if "posts" in entities or results["followers"] is not None:
+            refresh_follower_joins(r, username)
+
+    # Inverted index over captions, comments and replies of changed posts
+    check_lease(progress)
+    with metrics.stage("search"):
+        if "posts" in entities:
+            update_search_index(r, username, results["posts"])
+
+    # Garbage-collect users no stored list references, including the pages of
+    # follow-list crawls still in progress, whichever lists finished this run
+    check_lease(progress)
+    with metrics.stage("gc"):
+        referenced = referenced_user_ids(results["posts"])
+        complete = True
+        for kind in ("followers", "following"):
+            ids = load_list(r, f"ig:{kind}:{username}")
+            # A published list with an expired chunk can't tell which users it needs
+            complete = complete and (ids is not None or not r.exists(f"ig:{kind}:{username}:manifest"))
+            referenced.update(ids or [])
+            referenced.update(iter_redis_list(r, f"ig:crawl:{kind}:{username}:items"))
+        if complete:
+            users.prune(referenced)
+        else:
+            users.flush()
+
+    # Download images not cached yet and point the payloads at them
+    if media:
+        check_lease(progress)
+        with metrics.stage("media"):
+            stored_posts = results["posts"]
+            # Stored posts that weren't refreshed may still hold CDN URLs
+            results["posts"] = localize(results["posts"])
+            synced = media.sync()
+            # Downloads can outlast the lease
+            check_lease(progress)
+            if synced:
+                results["profile"] = localize(results["profile"])
+                results["posts"] = localize(results["posts"])
+                store_data(r, f"ig:profile:{username}", results["profile"])
+                users.map_pictures(media.rewrite)
+            if results["posts"] != stored_posts:
+                store_list(r, f"ig:posts:{username}", results["posts"], chunk_size=POSTS_CHUNK_SIZE)
+
+    if SQLITE_PATH:
+        check_lease(progress)
+        with metrics.stage("sqlite"):
+            write_sqlite(r, users, results, entities)
+
+    return results
+
+
+def dispatch_worker(job_id: str) -> bool:
+    """
+    Start ``job_id`` in a separate invocation at REFRESH_WORKER_URL.
+
+    The worker keeps running after this short request stops waiting for its
+    response, so a read timeout counts as dispatched. Returns False when no
+    worker URL is configured or the worker could not be reached.
+    """
+    if not REFRESH_WORKER_URL:
+        return False
+    request = urllib.request.Request(f"{REFRESH_WORKER_URL}?worker={job_id}", data=b"", method="POST")
+    try:
+        urllib.request.urlopen(request, timeout=WORKER_DISPATCH_TIMEOUT).close()
+    except socket.timeout:
+        pass
+    except urllib.error.HTTPError as e:
+        # 409: another worker already claimed the job
+        if e.code != 409:
+            print(f"Worker dispatch for job {job_id} returned {e.code}")
+            return False
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Worker dispatch for job {job_id} failed: {e}")
+        return False
+    print(f"Dispatched refresh job {job_id}")
+    return True
+
+
+def refresh_account(
+    r,
+    username: str,
+    loader: instaloader.Instaloader,
+    scheduler: RequestScheduler,
+    progress,
+    entities=ENTITIES,
+) -> dict:
+    """Refresh ``entities`` of one account on the calling thread and record its metrics and budget."""
+    metrics.bind(username)
+    try:
+        results = run_refresh(r, loader, progress, scheduler, username, entities)
+    except Exception as e:
+        print(f"Error refreshing @{username}: {e}")
+        outcome = {"status": f"error:{str(e)[:50]}", "error": str(e)}
+    else:
+        r.set(f"ig:last_refresh:{username}", datetime.utcnow().isoformat() + "Z")
+        outcome = {
+            "status": "complete",
+            "entities": list(entities),
+            "profile": results["profile"]["username"],
+            "postsCount": len(results["posts"]),
+            "followersCount": results["followers"],
+            "followingCount": results["following"],
+        }
+    outcome["budget"] = scheduler.commit()
+    outcome["metrics"] = metrics.store(r, metrics_key(username), outcome["status"])
+    return outcome
+
+
+def run_job(r, job_id: str) -> dict | None:
+    """
+    Run a claimed refresh job and record its outcome on the job.
+
+    The job's accounts are refreshed on up to BATCH_WORKERS threads with one
+    Instagram session and one Redis client. Each account has its own loader,
+    request scheduler (with an even share of REQUEST_BUDGET_PER_HOUR), keys
+    and metrics; all loaders share one RequestLimiter, so the batch stays
+    under MAX_REQUESTS_PER_MINUTE. Stage progress is published by the lease
+    while the job runs (``{account}/{stage}`` for batches); profile and posts
+    become readable as soon as their stages finish (see run_refresh).
+
+    A job created with ``entities="due"`` refreshes only each account's due
+    entities (api/_cadence.py); accounts with nothing due are not crawled.
+    """
+    job = load_job(r, job_id) or {}
+    accounts = job.get("accounts") or [IG_USERNAME]
+    lease = RefreshLease(r)
+    if not lease.acquire():
+        return finish_job(r, job_id, "skipped", error="Refresh already in progress")
+    update_job(r, job_id, status="running", startedAt=datetime.utcnow().isoformat() + "Z")
+    try:
+        if job.get("entities") == "due":
+            plan = {username: due_entities(r, username) for username in accounts}
+        else:
+            plan = {username: list(job.get("entities") or ENTITIES) for username in accounts}
+        result = {
+            username: {"status": "complete", "entities": []} for username in accounts if not plan[username]
+        }
+        accounts = [username for username in accounts if plan[username]]
+        if not accounts:
+            lease.release("complete")
+            return finish_job(r, job_id, "complete", result=result)
+
+        # One loader per account sharing a request ceiling and the session cookies
+        shared = RequestLimiter()
+        per_hour = max(1, REQUEST_BUDGET_PER_HOUR // len(accounts))
+        runs = {}
+        session = None
+        for username in accounts:
+            metrics.start(username)
+            scheduler = RequestScheduler(r, username, per_hour)
+            loader = create_loader(RequestLimiter(scheduler=scheduler, parent=shared))
+            if session is None:
+                # Load session
+                if not load_session(loader):
+                    lease.release("error:session_failed")
+                    for name in accounts:
+                        metrics.bind(name)
+                        metrics.store(r, metrics_key(name), "error:session_failed")
+                    return finish_job(r, job_id, "error:session_failed", error="Failed to load Instagram session")
+                session = loader.save_session() if loader.context.is_logged_in else {}
+            elif session:
+                loader.load_session(IG_USERNAME, session)
+            runs[username] = (loader, scheduler)
+
+        # Fetch and store profile, posts, followers and following of every account
+        with ThreadPoolExecutor(max_workers=max(1, min(BATCH_WORKERS, len(accounts)))) as pool:
+            futures = {
+                username: pool.submit(
+                    refresh_account, r, username, loader, scheduler,
+                    AccountProgress(lease, username) if len(runs) > 1 else lease,
+                    plan[username],
+                )
+                for username, (loader, scheduler) in runs.items()
+            }
+            result.update({username: future.result() for username, future in futures.items()})
+
+        failed = [username for username, outcome in result.items() if outcome["status"] != "complete"]
+        if not failed:
+            status = "complete"
+        elif len(result) == 1:
+            status = result[failed[0]]["status"]
+        else:
+            status = f"error:{len(failed)} of {len(result)} accounts failed"
+        lease.release(status)
+        return finish_job(r, job_id, status, stages=lease.snapshot()["stages"], result=result)
+
+    except Exception as e:
+        print(f"Error during refresh: {e}")
+        status = f"error:{str(e)[:50]}"
         try:
-            r = get_redis_client()
+            lease.release(status)
+        except Exception:
+            pass
+        return finish_job(r, job_id, status, error=str(e), stages=lease.snapshot()["stages"])
+
+
+class handler(BaseHTTPRequestHandler):
+    def send_json(self, code: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def enqueue(self, r, query: dict):
+        """
+        Create or join a refresh job for the requested accounts and answer 202.
 
-            # Check if already running
-            status = r.get("ig:refresh_status")
-            if status == "running":
-                self.send_response(409)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "Refresh already in progress"}).encode())
+        With ``?due=1`` only entities past their refresh interval are
+        refreshed, and nothing is queued when no account has any due. If
+        the worker at REFRESH_WORKER_URL can't be reached, the new job is
+        failed and the answer is 503.
+        """
+        requested = [name for name in (query.get("accounts") or [""])[0].split(",") if name]
+        accounts = [name for name in IG_ACCOUNTS if name in requested] if requested else IG_ACCOUNTS
+        if not accounts:
+            self.send_json(400, {"error": "No configured accounts requested", "accounts": IG_ACCOUNTS})
+            return
+        entities = list(ENTITIES)
+        if (query.get("due") or [""])[0] in ("1", "true"):
+            entities = "due"
+            due = {username: due_entities(r, username) for username in accounts}
+            if not any(due.values()):
+                self.send_json(200, {"status": "fresh", "due": due})
                 return
 
-            # Set status to running
-            r.setex("ig:refresh_status", 300, "running")
-
-            # Create Instaloader instance
-            loader = instaloader.Instaloader(
-                download_pictures=False,
-                download_videos=False,
-                download_video_thumbnails=False,
-                download_geotags=False,
-                download_comments=False,
-                save_metadata=False,
-                compress_json=False,
-            )
-
-            # Load session
+        job, created = create_or_join_job(r, accounts, entities)
+        if created and not r.exists(LOCK_KEY):
+            r.set(STATUS_KEY, "queued", ex=STATUS_TTL)
+        body = {
+            "jobId": job["id"],
+            "status": job["status"],
+            "accounts": job.get("accounts"),
+            "entities": job.get("entities"),
+            "joined": not created,
+            "progress": read_progress(r),
+        }
+        if not created or dispatch_worker(job["id"]):
+            self.send_json(202, body)
+            return
+
+        if REFRESH_WORKER_URL:
+            # The worker is unreachable; fail the job unless it got claimed anyway
+            if not claim_job(r, job["id"]):
+                self.send_json(202, body)
+                return
+            finish_job(r, job["id"], "error:dispatch_failed", error="Could not start a refresh worker")
+            if not r.exists(LOCK_KEY):
+                r.set(STATUS_KEY, "error:dispatch_failed", ex=STATUS_TTL)
+            self.send_json(503, {**body, "status": "error:dispatch_failed", "error": "Could not start a refresh worker"})
+            return
+
+        # Self-hosted only (no VERCEL_URL or REFRESH_WORKER_URL): answer now, then run the
+        # job in this process; a serverless runtime may freeze it once the response is sent
+        self.send_json(202, body)
+        self.wfile.flush()
+        if claim_job(r, job["id"]):
+            run_job(r, job["id"])
+
+    def serve_search(self, r, query: dict):
+        """
+        Captions, comments and replies of the stored posts matching every
+        word of ``?q=`` (prefixes included), best first (``?limit=``, up to
+        100; ``?account=``). Each hit names the post and, for comments and
+        replies, the comment id (see api/_search.py).
+        """
+        account = (query.get("account") or [IG_USERNAME])[0] or IG_USERNAME
+        text = query["q"][0].strip()
+        limit = (query.get("limit") or ["20"])[0]
+        if not text or not limit.isdigit():
+            self.send_json(400, {"error": "q must not be empty and limit must be a number"})
+            return
+        started = time.perf_counter()
+        hits = search(r, account, text, min(100, max(1, int(limit))))
+        self.send_json(200, {
+            "account": account,
+            "query": text,
+            "hits": hits,
+            "tookMs": round((time.perf_counter() - started) * 1000, 2),
+        })
+
+    def serve_growth(self, r, query: dict):
+        """
+        Gains over the last ``?growth=<hours>`` (followers, following, posts
+        and each post's likes, comments and views) and the account counters
+        of every snapshot in that window, from the snapshot archive.
+        """
+        account = (query.get("account") or [IG_USERNAME])[0] or IG_USERNAME
+        hours = query["growth"][0]
+        if not hours.isdigit() or int(hours) == 0:
+            self.send_json(400, {"error": "growth must be a number of hours"})
+            return
+        store = RedisSnapshotStore(r, account)
+        since = time.time() - int(hours) * 3600
+        window = gains(store, since)
+        if window is None:
+            self.send_json(404, {"error": f"No snapshots for @{account} yet"})
+            return
+        self.send_json(200, {
+            "account": account,
+            "hours": int(hours),
+            "gains": window,
+            "series": [{"at": at, **state["profile"]} for at, state in iter_snapshots(store, since)],
+        })
+
+    def serve_post_engagement(self, r, query: dict):
+        """
+        Page ``?cursor=N`` (default 0) of one stored post's likers or comments
+        (``?post=<shortcode>&kind=likers|comments``, ``?account=``).
+
+        Pages are cached in ``ig:post_engagement:{account}:{shortcode}:{kind}``
+        for POST_ENGAGEMENT_TTL after the first one is fetched. Cached pages
+        are public. The next uncached page is only fetched for callers with
+        ``Authorization: Bearer $POST_ENGAGEMENT_SECRET`` (403 otherwise),
+        resuming the previous page's iterator, and its requests are reserved
+        from the account's hourly request budget first (429 when it is
+        spent). A cursor into pages that have expired answers 410; start
+        again from 0.
+        """
+        account = (query.get("account") or [IG_USERNAME])[0] or IG_USERNAME
+        shortcode = query["post"][0]
+        kind = (query.get("kind") or ["comments"])[0]
+        cursor = (query.get("cursor") or ["0"])[0] or "0"
+        if kind not in ENGAGEMENT_KINDS or not cursor.isdigit():
+            self.send_json(400, {"error": "kind must be likers or comments and cursor a page number"})
+            return
+        cursor = int(cursor)
+        if shortcode not in {post["shortcode"] for post in load_list(r, f"ig:posts:{account}") or []}:
+            self.send_json(404, {"error": f"No stored post {shortcode} for @{account}"})
+            return
+
+        key = post_engagement_key(account, shortcode, kind)
+        cached = r.hgetall(key)
+        pages = int(cached.get("pages", 0))
+        state = json.loads(cached.get("state") or "null")
+        response = {"shortcode": shortcode, "kind": kind, "cursor": cursor}
+        if cursor < pages:
+            self.send_json(200, {
+                **response,
+                "items": json.loads(cached[f"page:{cursor}"]),
+                "nextCursor": cursor + 1 if cursor + 1 < pages or state else None,
+                "fetchedAt": cached.get("fetchedAt"),
+            })
+            return
+        if cursor > 0 and not pages:
+            self.send_json(410, {"error": "Cursor expired; start again from cursor 0"})
+            return
+        if cursor > pages or (pages and not state):
+            self.send_json(400, {"error": "Cursor is past the last page"})
+            return
+        authorization = self.headers.get("Authorization") or ""
+        if not POST_ENGAGEMENT_SECRET or not hmac.compare_digest(authorization, f"Bearer {POST_ENGAGEMENT_SECRET}"):
+            self.send_json(403, {"error": "Only cached pages are available", "cursor": cursor})
+            return
+
+        lock_key = f"{key}:lock"
+        if not r.set(lock_key, 1, nx=True, ex=POST_ENGAGEMENT_LOCK_TTL):
+            self.send_json(409, {"error": "This page is being fetched; retry shortly"})
+            return
+        try:
+            scheduler = RequestScheduler(r, account)
+            if not scheduler.reserve(engagement_page_cost(kind, state)):
+                self.send_json(429, {"error": "Request budget exhausted; retry later"})
+                return
+            loader = create_loader(RequestLimiter(scheduler=scheduler))
             if not load_session(loader):
-                r.setex("ig:refresh_status", 300, "error:session_failed")
-                self.send_response(500)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "Failed to load Instagram session"}).encode())
+                self.send_json(500, {"error": "Failed to load Instagram session"})
+                return
+            try:
+                post = instaloader.Post.from_shortcode(loader.context, shortcode)
+                items, state = fetch_engagement_page(loader.context, post, kind, state)
+            except instaloader.exceptions.InvalidArgumentException:
+                r.delete(key)
+                self.send_json(410, {"error": "Cursor expired; start again from cursor 0"})
                 return
+            finally:
+                scheduler.commit(adapt=False)
+
+            fetched_at = cached.get("fetchedAt") or datetime.utcnow().isoformat() + "Z"
+            r.hset(key, mapping={
+                f"page:{cursor}": json.dumps(items),
+                "pages": cursor + 1,
+                "state": json.dumps(state) if state else "",
+                "fetchedAt": fetched_at,
+            })
+            # Later pages share the first page's expiry (reset if it lapsed meanwhile)
+            if not pages or r.ttl(key) < 0:
+                r.expire(key, POST_ENGAGEMENT_TTL)
+        finally:
+            r.delete(lock_key)
+        self.send_json(200, {
+            **response,
+            "items": items,
+            "nextCursor": cursor + 1 if state else None,
+            "fetchedAt": fetched_at,
+        })
 
-            # Fetch and store profile
-            print("Fetching profile...")
-            profile = fetch_profile(loader)
-            store_data(r, f"ig:profile:{IG_USERNAME}", profile)
-
-            # Fetch and store posts
-            print("Fetching posts...")
-            posts = fetch_posts(loader, fetch_likers=True, fetch_comments=True)
-            store_data(r, f"ig:posts:{IG_USERNAME}", posts)
-
-            # Fetch and store followers
-            print("Fetching followers...")
-            followers = fetch_followers(loader)
-            store_data(r, f"ig:followers:{IG_USERNAME}", followers)
-
-            # Fetch and store following
-            print("Fetching following...")
-            following = fetch_following(loader)
-            store_data(r, f"ig:following:{IG_USERNAME}", following)
-
-            # Update last refresh time and status
-            r.set(f"ig:last_refresh:{IG_USERNAME}", datetime.utcnow().isoformat() + "Z")
-            r.setex("ig:refresh_status", 300, "complete")
-
-            # Return success
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({
-                "success": True,
-                "profile": profile["username"],
-                "postsCount": len(posts),
-                "followersCount": len(followers),
-                "followingCount": len(following),
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-            }).encode())
+    def do_POST(self):
+        """
+        Enqueue a refresh job and return 202 with its id right away.
+
+        The job covers IG_ACCOUNTS, or the subset given as ``?accounts=a,b``,
+        and every entity, or only the due ones with ``?due=1``. Concurrent
+        triggers join the active job. The job runs in a worker invocation
+        (``?worker=<job id>``, see dispatch_worker; 503 if it can't be
+        reached), or in this invocation after the response is sent when no
+        worker URL is set (self-hosted only).
+        """
+        try:
+            r = get_redis_client()
+            query = parse_qs(urlparse(self.path).query)
+            worker = (query.get("worker") or [""])[0]
+            if worker:
+                job = load_job(r, worker)
+                if job is None or job["status"] != "queued" or not claim_job(r, worker):
+                    self.send_json(409, {"error": "Job is not queued", "job": job})
+                    return
+                self.send_json(200, run_job(r, worker))
+                return
+            self.enqueue(r, query)
 
         except Exception as e:
             print(f"Error during refresh: {e}")
-            try:
-                r = get_redis_client()
-                r.setex("ig:refresh_status", 300, f"error:{str(e)[:50]}")
-            except:
-                pass
-
-            self.send_response(500)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": str(e)}).encode())
+            self.send_json(500, {"error": str(e)})
 
     def do_GET(self):
-        """Return refresh status."""
+        """
+        Return refresh status, progress, an account's last refresh time,
+        per-entity freshness and metrics (``?account=``, default IG_USERNAME;
+        ``?history=N`` for past runs) and a refresh job (``?job=<id>``,
+        default the latest one).
+
+        ``?due=1`` is the scheduled entry point (Vercel Cron sends GET): it
+        enqueues the due entities like POST, and requires
+        ``Authorization: Bearer $CRON_SECRET`` when CRON_SECRET is set.
+        ``?post=<shortcode>`` serves a post's likers or comments (see
+        serve_post_engagement), ``?growth=<hours>`` the snapshot archive's
+        gains and counter history over that window (see serve_growth),
+        ``?q=<words>`` search results (see serve_search).
+        """
         try:
             r = get_redis_client()
-            status = r.get("ig:refresh_status") or "idle"
-            last_refresh = r.get(f"ig:last_refresh:{IG_USERNAME}")
+            query = parse_qs(urlparse(self.path).query)
+            if query.get("post"):
+                self.serve_post_engagement(r, query)
+                return
+            if query.get("growth"):
+                self.serve_growth(r, query)
+                return
+            if "q" in query:
+                self.serve_search(r, query)
+                return
+            if (query.get("due") or [""])[0] in ("1", "true"):
+                authorization = self.headers.get("Authorization") or ""
+                if CRON_SECRET and not hmac.compare_digest(authorization, f"Bearer {CRON_SECRET}"):
+                    self.send_json(401, {"error": "Unauthorized"})
+                    return
+                self.enqueue(r, query)
+                return
+            account = (query.get("account") or [IG_USERNAME])[0] or IG_USERNAME
+            history = (query.get("history") or ["1"])[0] or "1"
+            if not history.isdigit():
+                self.send_json(400, {"error": "history must be a number of runs"})
+                return
+            history = max(1, int(history))
+            status = r.get(STATUS_KEY) or "idle"
+            last_refresh = r.get(f"ig:last_refresh:{account}")
+            progress = read_progress(r)
+            runs = load_metrics(r, metrics_key(account), history)
+            job = load_job(r, (query.get("job") or [None])[0] or r.get(LATEST_KEY))
+            if job is not None and job["status"] == "running" and progress:
+                job["stages"] = progress["stages"]
 
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self.send_json(200, {
                 "status": status,
+                "account": account,
                 "lastRefresh": last_refresh,
-            }).encode())
+                "freshness": freshness(r, account),
+                "progress": progress,
+                "metrics": runs[0] if runs else None,
+                "job": job,
+                **({"metricsHistory": runs} if history > 1 else {}),
+            })
         except Exception as e:
-            self.send_response(500)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"error": str(e)}).encode())
+            self.send_json(500, {"error": str(e)})
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Cold Start Benchmark
+
+Measures what a fresh invocation of api/ig-refresh.py pays before it can
+answer: each run starts a new Python process that imports the function
+(wall time, and whether instaloader/NumPy were loaded), serves one status
+request (do_GET, the dashboard's progress poll) and then loads what the
+refresh path needs on top (instaloader and the insights module). Warm
+status requests are timed in the same process. Redis is fakeredis, or a
+local server via --redis-url. Reports the median over --runs processes.
+
+Usage:
+    python scripts/bench_cold_start.py [--runs N] [--warm N] [--redis-url URL] [--json] [--output FILE]
+
+Example:
+    python scripts/bench_cold_start.py --runs 10 --json --output cold-start.json
+
+Prerequisites:
+    pip install -r requirements.txt
+    pip install "fakeredis[lua]"   # unless --redis-url points at a local Redis
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Runs in a fresh interpreter and prints one JSON line of timings
+CHILD = r"""
+import importlib.util, io, json, os, sys, time
+
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("ig_refresh", os.path.join(sys.argv[1], "api", "ig-refresh.py"))
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+import_ms = (time.perf_counter() - started) * 1000
+loaded = {name: name in sys.modules for name in ("instaloader.instaloader", "numpy")}
+
+if not os.environ.get("REDIS_URL"):
+    import fakeredis
+    client = fakeredis.FakeRedis(decode_responses=True)
+    module.get_redis_client = lambda: client
+
+def status_ms():
+    handler = module.handler.__new__(module.handler)
+    handler.path = "/api/ig-refresh"
+    handler.headers = {}
+    handler.wfile = io.BytesIO()
+    handler.send_response = lambda *args: None
+    handler.send_header = lambda *args: None
+    handler.end_headers = lambda: None
+    started = time.perf_counter()
+    handler.do_GET()
+    return (time.perf_counter() - started) * 1000
+
+first_status_ms = status_ms()
+warm = sorted(status_ms() for _ in range(int(sys.argv[2])))
+loaded_by_status = "instaloader.instaloader" in sys.modules
+
+started = time.perf_counter()
+module.instaloader.Instaloader
+import _insights
+refresh_imports_ms = (time.perf_counter() - started) * 1000
+
+print(json.dumps({
+    "importMs": import_ms,
+    "firstStatusMs": first_status_ms,
+    "warmStatusMs": warm[len(warm) // 2],
+    "refreshImportsMs": refresh_imports_ms,
+    "instaloaderOnImport": loaded["instaloader.instaloader"],
+    "numpyOnImport": loaded["numpy"],
+    "instaloaderOnStatus": loaded_by_status,
+}))
+"""
+
+TIMINGS = ("importMs", "firstStatusMs", "warmStatusMs", "refreshImportsMs")
+
+
+def run_child(warm: int, redis_url: str | None) -> dict:
+    env = dict(os.environ)
+    env.pop("REDIS_URL", None)
+    if redis_url:
+        env["REDIS_URL"] = redis_url
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, str(ROOT), str(warm)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark process failed:\n{result.stderr}")
+    # The function logs with print; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[sys.argv.index("--runs") + 1]) if "--runs" in sys.argv else 5
+    warm = int(sys.argv[sys.argv.index("--warm") + 1]) if "--warm" in sys.argv else 20
+    redis_url = sys.argv[sys.argv.index("--redis-url") + 1] if "--redis-url" in sys.argv else None
+    output = sys.argv[sys.argv.index("--output") + 1] if "--output" in sys.argv else None
+    as_json = "--json" in sys.argv
+
+    samples = [run_child(warm, redis_url) for _ in range(runs)]
+    summary = {name: round(statistics.median(sample[name] for sample in samples), 2) for name in TIMINGS}
+    for flag in ("instaloaderOnImport", "numpyOnImport", "instaloaderOnStatus"):
+        summary[flag] = any(sample[flag] for sample in samples)
+
+    report = {
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "config": {"runs": runs, "warm": warm, "redis": "url" if redis_url else "fakeredis"},
+        "results": summary,
+        "samples": samples,
+    }
+    if output:
+        Path(output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'measure':<22} {'median ms':>10}")
+    print("-" * 33)
+    for name in TIMINGS:
+        print(f"{name:<22} {summary[name]:>10}")
+    print()
+    print(f"instaloader imported at startup:  {summary['instaloaderOnImport']}")
+    print(f"NumPy imported at startup:        {summary['numpyOnImport']}")
+    print(f"instaloader imported by a status: {summary['instaloaderOnStatus']}")
+    if output:
+        print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Refresh Benchmark
+
+Runs the refresh code in api/ig-refresh.py offline against a synthetic
+Instagram account (scripts/fake_instagram.py) and an in-memory Redis
+(fakeredis, or a local server via --redis-url). Measures fetch_posts,
+fetch_followers, store_data and a full handler.do_POST for wall time,
+throughput, Instagram request count, injected 429s, simulated rate-limit
+wait and peak Python memory (tracemalloc). With --accounts N, do_POST runs a
+batch refresh of N accounts (each served the same synthetic account). With
+--media, do_POST also runs the media cache stage against a local HTTP
+stand-in for the CDN (FakeCDN) and reports its request count.
+
+Usage:
+    python scripts/bench_refresh.py [--posts N] [--likers N] [--comments N] [--replies N]
+        [--followers N] [--following N] [--latency MS] [--rate-limit P] [--workers N]
+        [--accounts N] [--media] [--only NAME,...] [--redis-url URL] [--json] [--output FILE]
+
+Example:
+    python scripts/bench_refresh.py --posts 50 --followers 5000 --latency 20 --json --output bench.json
+
+Prerequisites:
+    pip install -r requirements.txt
+    pip install "fakeredis[lua]"   # unless --redis-url points at a local Redis
+"""
+
+import contextlib
+import importlib.util
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import instaloader
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_instagram import INSTAGRAM_CDN, FakeCDN, FakeInstagram  # noqa: E402
+
+BENCHMARKS = ("fetch_posts", "fetch_followers", "store_data", "do_POST")
+
+
+def load_refresh_module():
+    """Import api/ig-refresh.py (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("ig_refresh", ROOT / "api" / "ig-refresh.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def redis_client(url: str | None):
+    """A decode_responses client on ``url``, or fakeredis when no URL is given."""
+    if url:
+        import redis
+        return redis.from_url(url, decode_responses=True)
+    try:
+        import fakeredis
+    except ImportError:
+        print("Error: fakeredis is not installed.")
+        print('Install it with: pip install "fakeredis[lua]" (or pass --redis-url)')
+        sys.exit(1)
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+class SimulatedWait:
+    """Collects rate-controller sleeps instead of sleeping.
+
+    Shifting the controller's request history back by the skipped time is
+    equivalent to the clock having advanced, so later queries are not
+    charged for the same throttle window again.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def sleep(self, controller, secs: float):
+        self.seconds += secs
+        controller._query_timestamps = {
+            query_type: [t - secs for t in stamps]
+            for query_type, stamps in controller._query_timestamps.items()
+        }
+        controller._earliest_next_request_time -= secs
+        controller._iphone_earliest_next_request_time -= secs
+
+
+def create_bench_loader(module, fake: FakeInstagram, wait: SimulatedWait, create_loader=None, limiter=None):
+    """Loader whose rate controller records throttling as simulated time.
+
+    A ``limiter`` from the refresh code is reused (so its request scheduler
+    still sees every request) with the per-minute ceiling, and that of the
+    batch-wide limiter it defers to, lifted.
+    """
+    if limiter is None:
+        limiter = module.RequestLimiter()
+    limiter.max_per_window = 10_000_000
+    if limiter.parent:
+        limiter.parent.max_per_window = 10_000_000
+    loader = (create_loader or module.create_loader)(limiter)
+    loader.context.error = lambda *args, **kwargs: None
+    controller = loader.context._rate_controller
+    controller.sleep = lambda secs: wait.sleep(controller, secs)
+    controller._dump_query_timestamps = lambda *args: None
+    fake.context = loader.context
+    return loader
+
+
+class BenchHandler:
+    """Drives handler.do_POST without a socket."""
+
+    def __init__(self, handler_class):
+        self.handler = handler_class.__new__(handler_class)
+        self.handler.wfile = io.BytesIO()
+        self.handler.path = "/api/ig-refresh"
+        self.handler.send_response = self._send_response
+        self.handler.send_header = lambda *args: None
+        self.handler.end_headers = lambda: None
+        self.status = None
+
+    def _send_response(self, code, message=None):
+        self.status = code
+
+    def post(self) -> dict:
+        self.handler.wfile = io.BytesIO()
+        self.handler.do_POST()
+        return json.loads(self.handler.wfile.getvalue() or "{}")
+
+
+def measure(name: str, fn, fake: FakeInstagram, wait: SimulatedWait) -> dict:
+    """Run ``fn`` once; it returns the number of items it produced."""
+    fake.reset()
+    wait.seconds = 0.0
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = fake.stats()
+    return {
+        "benchmark": name,
+        "seconds": round(elapsed, 4),
+        "items": items,
+        "itemsPerSecond": round(items / elapsed, 1) if elapsed else None,
+        "requests": stats["requests"],
+        "requestsByType": stats["byType"],
+        "rateLimited": stats["rateLimited"],
+        "simulatedWaitSeconds": round(wait.seconds, 3),
+        "peakMemoryKb": round(peak / 1024, 1),
+    }
+
+
+def main():
+    options = {
+        "posts": 50,
+        "likers": 50,
+        "comments": 20,
+        "replies": 2,
+        "followers": 1000,
+        "following": 500,
+        "latency": 0.0,
+        "rate-limit": 0.0,
+        "workers": None,
+        "accounts": 1,
+    }
+    for name in options:
+        flag = f"--{name}"
+        if flag in sys.argv:
+            value = sys.argv[sys.argv.index(flag) + 1]
+            options[name] = float(value) if name in ("latency", "rate-limit") else int(value)
+    only = BENCHMARKS
+    if "--only" in sys.argv:
+        only = tuple(sys.argv[sys.argv.index("--only") + 1].split(","))
+    redis_url = sys.argv[sys.argv.index("--redis-url") + 1] if "--redis-url" in sys.argv else None
+    output = sys.argv[sys.argv.index("--output") + 1] if "--output" in sys.argv else None
+    as_json = "--json" in sys.argv
+    cdn = FakeCDN() if "--media" in sys.argv else None
+
+    module = load_refresh_module()
+    # Fetch everything the fake account offers, and always stream follow lists
+    module.MAX_POSTS = options["posts"]
+    module.MAX_LIKERS_PER_POST = options["likers"]
+    module.MAX_COMMENTS_PER_POST = options["comments"]
+    module.MAX_FOLLOWERS = max(options["followers"], options["following"])
+    module.RESUMABLE_FOLLOW_CRAWL = False
+    if options["workers"]:
+        module.REFRESH_WORKERS = options["workers"]
+    if options["accounts"] > 1:
+        module.IG_ACCOUNTS = [f"account{i}" for i in range(options["accounts"])]
+        module.BATCH_WORKERS = options["accounts"]
+    else:
+        module.IG_ACCOUNTS = [module.IG_USERNAME]
+    module.MEDIA_CACHE = cdn is not None
+
+    fake = FakeInstagram(
+        posts=options["posts"],
+        likers=options["likers"],
+        comments=options["comments"],
+        replies=options["replies"],
+        followers=options["followers"],
+        following=options["following"],
+        latency=options["latency"] / 1000,
+        rate_limit=options["rate-limit"],
+        cdn=cdn.base if cdn else INSTAGRAM_CDN,
+    )
+    wait = SimulatedWait()
+    r = redis_client(redis_url)
+    results = []
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    with fake.installed(), quiet, cdn or contextlib.nullcontext():
+        loader = create_bench_loader(module, fake, wait)
+        profile = instaloader.Profile.from_username(loader.context, module.IG_USERNAME)
+        posts = []
+
+        if "fetch_posts" in only or "store_data" in only:
+            r.flushdb()
+
+            def bench_fetch_posts():
+                users = module.UserTable(r)
+                with ThreadPoolExecutor(max_workers=module.REFRESH_WORKERS) as pool:
+                    posts[:] = module.fetch_posts(profile, users, executor=pool)
+                users.flush()
+                return len(posts)
+
+            result = measure("fetch_posts", bench_fetch_posts, fake, wait)
+            if "fetch_posts" in only:
+                results.append(result)
+
+        if "fetch_followers" in only:
+            r.flushdb()
+
+            def bench_fetch_followers():
+                users = module.UserTable(r)
+                followers = module.fetch_followers(profile, users)
+                users.flush()
+                return len(followers)
+
+            results.append(measure("fetch_followers", bench_fetch_followers, fake, wait))
+
+        if "store_data" in only:
+            def bench_store_data():
+                module.store_data(r, f"ig:bench_posts:{module.IG_USERNAME}", posts)
+                return len(posts)
+
+            result = measure("store_data", bench_store_data, fake, wait)
+            result["bytes"] = len(module.encode_payload(posts))
+            results.append(result)
+
+        if "do_POST" in only:
+            r.flushdb()
+            module.get_redis_client = lambda: r
+            create_loader = module.create_loader
+            module.create_loader = lambda limiter: create_bench_loader(module, fake, wait, create_loader, limiter)
+            module.load_session = lambda loader: True
+            # No worker endpoint: do_POST answers 202 and runs the job inline
+            module.REFRESH_WORKER_URL = ""
+            runner = BenchHandler(module.handler)
+
+            def bench_do_post():
+                body = runner.post()
+                job = module.load_job(r, body.get("jobId"))
+                if runner.status != 202 or job is None or job["status"] != "complete":
+                    raise RuntimeError(f"do_POST returned {runner.status}: {job or body}")
+                return sum(
+                    result["postsCount"] + (result["followersCount"] or 0) + (result["followingCount"] or 0)
+                    for result in job["result"].values()
+                )
+
+            results.append(measure("do_POST", bench_do_post, fake, wait))
+
+    report = {
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "storageFormat": module.STORAGE_FORMAT,
+        "workers": module.REFRESH_WORKERS,
+        "config": {**options, "media": cdn is not None},
+        "results": results,
+        **({"cdnRequests": cdn.requests} if cdn else {}),
+    }
+    if output:
+        Path(output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'benchmark':<16} {'seconds':>9} {'items':>8} {'items/s':>10} {'requests':>9} "
+          f"{'429s':>5} {'wait s':>8} {'peak KB':>9}")
+    print("-" * 82)
+    for row in results:
+        print(f"{row['benchmark']:<16} {row['seconds']:>9} {row['items']:>8} {row['itemsPerSecond']:>10} "
+              f"{row['requests']:>9} {row['rateLimited']:>5} {row['simulatedWaitSeconds']:>8} "
+              f"{row['peakMemoryKb']:>9}")
+    if output:
+        print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
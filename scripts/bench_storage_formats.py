@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Storage Format Benchmark
+
+Measures payload size and encode/decode time for every STORAGE_FORMAT
+supported by api/ig-refresh.py, on payloads shaped like the ones a refresh
+writes to Redis (a posts chunk with interned likers/comments, a followers
+chunk, and the sample data in data/instagram/).
+
+Usage:
+    python scripts/bench_storage_formats.py [--posts N] [--followers N] [--repeat N] [--json]
+
+Example:
+    python scripts/bench_storage_formats.py --posts 10 --followers 500 --json
+
+Prerequisites:
+    pip install -r requirements.txt
+    pip install msgpack zstandard   # optional, to include those formats
+"""
+
+import importlib.util
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+def load_refresh_module():
+    """Import api/ig-refresh.py (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("ig_refresh", ROOT / "api" / "ig-refresh.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_posts(count: int, rng: random.Random) -> list:
+    """Posts in the stored (interned) shape with likers, comments and replies."""
+    posts = []
+    for i in range(count):
+        shortcode = f"C{i:08d}"
+        comments = []
+        for j in range(rng.randint(5, 50)):
+            replies = [
+                {
+                    "id": str(10_000_000 + i * 1000 + j * 10 + k),
+                    "text": "thank you!! 🙏",
+                    "timestamp": "2025-06-01T12:00:00Z",
+                    "likesCount": rng.randint(0, 5),
+                    "ownerId": rng.randint(1, 5000),
+                    "replies": [],
+                }
+                for k in range(rng.randint(0, 5))
+            ]
+            comments.append({
+                "id": str(1_000_000 + i * 1000 + j),
+                "text": rng.choice([
+                    "this is so good 🔥",
+                    "where was this taken?",
+                    "love the colors in this one",
+                    "@friend look at this",
+                ]),
+                "timestamp": "2025-06-01T12:00:00Z",
+                "likesCount": rng.randint(0, 40),
+                "ownerId": rng.randint(1, 5000),
+                "replies": replies,
+            })
+        posts.append({
+            "id": str(3_000_000_000_000_000 + i),
+            "shortcode": shortcode,
+            "typename": rng.choice(["GraphImage", "GraphVideo", "GraphSidecar"]),
+            "caption": "Building in public, day %d. #buildinpublic #indiehacker #coding" % i,
+            "captionHashtags": ["buildinpublic", "indiehacker", "coding"],
+            "captionMentions": [],
+            "taggedUsers": [],
+            "mediaType": "image",
+            "mediaUrl": f"https://scontent.cdninstagram.com/v/t51.29350-15/{shortcode}_n.jpg?stp=dst-jpg&_nc_ht=scontent&oh=00_{shortcode}",
+            "mediaUrls": [f"https://scontent.cdninstagram.com/v/t51.29350-15/{shortcode}_n.jpg"],
+            "videoUrl": None,
+            "videoDuration": None,
+            "sidecarItems": [],
+            "likeCount": rng.randint(50, 5000),
+            "commentCount": len(comments),
+            "videoViewCount": None,
+            "location": None,
+            "permalink": f"https://www.instagram.com/p/{shortcode}/",
+            "timestamp": "2025-06-01T12:00:00Z",
+            "isVideo": False,
+            "isPinned": False,
+            "isSponsored": False,
+            "likerIds": rng.sample(range(1, 5000), 50),
+            "comments": comments,
+        })
+    return posts
+
+
+def measure(module, payload, fmt: str, repeat: int) -> dict:
+    """Encode/decode ``payload`` ``repeat`` times and return size and best timings."""
+    encoded = module.encode_payload(payload, fmt)
+    encode_times = []
+    decode_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        module.encode_payload(payload, fmt)
+        encode_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        module.decode_payload(encoded)
+        decode_times.append(time.perf_counter() - start)
+    assert module.decode_payload(encoded) == payload
+    return {
+        "format": fmt,
+        "bytes": len(encoded),
+        "encodeMs": round(min(encode_times) * 1000, 3),
+        "decodeMs": round(min(decode_times) * 1000, 3),
+    }
+
+
+def main():
+    posts_count = 10
+    followers_count = 500
+    repeat = 20
+
+    if "--posts" in sys.argv:
+        posts_count = int(sys.argv[sys.argv.index("--posts") + 1])
+    if "--followers" in sys.argv:
+        followers_count = int(sys.argv[sys.argv.index("--followers") + 1])
+    if "--repeat" in sys.argv:
+        repeat = int(sys.argv[sys.argv.index("--repeat") + 1])
+    as_json = "--json" in sys.argv
+
+    module = load_refresh_module()
+    rng = random.Random(42)
+
+    payloads = {
+        "posts_chunk": synthetic_posts(posts_count, rng),
+        "followers_chunk": [rng.randint(1, 10_000_000) for _ in range(followers_count)],
+    }
+    for name in ("profile", "posts"):
+        sample = ROOT / "data" / "instagram" / f"{name}.json"
+        if sample.exists():
+            payloads[f"sample_{name}"] = json.loads(sample.read_text(encoding="utf-8"))
+
+    formats = []
+    for fmt in module.STORAGE_CODECS:
+        if fmt.startswith("msgpack") and module.msgpack is None:
+            continue
+        if fmt.endswith("zstd") and module.zstandard is None:
+            continue
+        formats.append(fmt)
+
+    results = []
+    for name, payload in payloads.items():
+        for fmt in formats:
+            results.append({"payload": name, **measure(module, payload, fmt, repeat)})
+
+    if as_json:
+        print(json.dumps({"repeat": repeat, "results": results}, indent=2))
+        return
+
+    print(f"{'payload':<18} {'format':<14} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}")
+    print("-" * 66)
+    for row in results:
+        print(f"{row['payload']:<18} {row['format']:<14} {row['bytes']:>10} "
+              f"{row['encodeMs']:>10} {row['decodeMs']:>10}")
+
+
+if __name__ == "__main__":
+    main()
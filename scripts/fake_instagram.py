@@ -0,0 +1,458 @@
+"""
+Synthetic Instagram stand-in for offline benchmarks.
+
+Generates a deterministic profile with posts (images, videos and sidecars),
+likers, comments with replies, followers and followees at any scale, and
+serves them through objects shaped like instaloader's Profile, Post,
+Profile/Comment owners and sidecar nodes. Lists come back in the shapes
+instaloader returns them: posts and follow lists as node iterators that
+can be frozen and thawed, likes as a generator, comments as a list, a
+node iterator or a generator depending on how many there are. The likes
+GraphQL query is answered too, for code that builds its own iterator.
+Every page of results goes through the loader's rate controller, so the
+refresh code's request accounting, limiter and 429 handling run exactly
+as they would live. Latency and rate-limit errors can be injected per
+page.
+
+Image URLs point at the Instagram CDN, or at a FakeCDN (a local HTTP
+server answering every path with a generated PNG) to exercise the media
+cache offline.
+
+Used by scripts/bench_refresh.py:
+
+    fake = FakeInstagram(posts=50, followers=5000, latency=0.05)
+    with fake.installed():
+        profile = instaloader.Profile.from_username(loader.context, "anyone")
+
+    cdn = FakeCDN()
+    fake = FakeInstagram(cdn=cdn.base)
+    with cdn:
+        ...
+"""
+
+import functools
+import random
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import instaloader
+from instaloader.exceptions import InvalidArgumentException
+from instaloader.nodeiterator import FrozenNodeIterator
+
+TYPENAMES = ["GraphImage", "GraphVideo", "GraphSidecar"]
+WORDS = ["building", "in", "public", "today", "shipped", "new", "feature", "coffee", "late", "night", "debugging"]
+HASHTAGS = ["buildinpublic", "indiehacker", "coding", "startup", "nyc", "design", "ai"]
+FIRST_POST_AT = datetime(2025, 6, 1, 12, 0, 0)
+# Items per request, as in instaloader's GraphQL pages (12)
+PAGE_SIZE = instaloader.NodeIterator.page_length()
+# Comments inline in a post's metadata; Post.get_comments returns those as a list
+INLINE_COMMENTS = 3
+# instaloader's GraphQL query for a post's likes (wrapped by Post.get_likes)
+LIKES_QUERY_HASH = "1cb6ec562846122743b61e492c85999f"
+INSTAGRAM_CDN = "https://scontent.cdninstagram.com"
+
+
+class FakeUser:
+    """Stand-in for instaloader.Profile as returned by likes/comments/follow lists."""
+
+    def __init__(self, index: int, cdn: str = INSTAGRAM_CDN):
+        self.userid = 10_000_000 + index
+        self.username = f"user{index}"
+        self.full_name = f"User {index}"
+        self.profile_pic_url = f"{cdn}/v/t51.2885-19/{self.userid}_n.jpg"
+        self.is_verified = index % 97 == 0
+        self.is_private = index % 3 == 0
+
+    def node(self) -> dict:
+        """The user as a GraphQL node, as wrapped by instaloader.Profile."""
+        return {
+            "id": str(self.userid),
+            "username": self.username,
+            "full_name": self.full_name,
+            "profile_pic_url": self.profile_pic_url,
+            "profile_pic_url_hd": self.profile_pic_url,
+            "is_verified": self.is_verified,
+            "is_private": self.is_private,
+        }
+
+
+class FakeComment:
+    """Stand-in for instaloader.PostComment / PostCommentAnswer."""
+
+    def __init__(self, comment_id: int, owner: FakeUser, text: str, created: datetime, likes: int, answers=()):
+        self.id = comment_id
+        self.owner = owner
+        self.text = text
+        self.created_at_utc = created
+        self.likes_count = likes
+        self.answers = list(answers)
+
+
+class FakePost:
+    """Stand-in for instaloader.Post; likes and comments are paged lazily."""
+
+    def __init__(self, fake: "FakeInstagram", index: int, created: datetime, context=None):
+        rng = random.Random(fake.seed * 1_000_003 + index)
+        self._fake = fake
+        self._context = context
+        self._index = index
+        self.mediaid = 3_000_000_000_000_000 + index
+        self.shortcode = f"C{index:09d}"
+        self.typename = TYPENAMES[index % 3]
+        tags = rng.sample(HASHTAGS, 3)
+        self.caption = " ".join(rng.choices(WORDS, k=12)) + " " + " ".join(f"#{tag}" for tag in tags)
+        self.caption_hashtags = tags
+        self.caption_mentions = []
+        self.tagged_users = []
+        self.url = f"{fake.cdn}/v/t51.29350-15/{self.shortcode}_n.jpg"
+        self.is_video = self.typename == "GraphVideo"
+        self.video_url = f"{fake.cdn}/v/{self.shortcode}.mp4" if self.is_video else None
+        self.video_duration = 30.0 if self.is_video else None
+        self.video_view_count = rng.randint(1_000, 50_000) if self.is_video else None
+        self.likes = rng.randint(fake.likers, fake.likers * 20 + 1)
+        self.comments = fake.comments
+        self.location = None
+        self.date_utc = created
+        self.is_pinned = False
+        self.is_sponsored = False
+
+    def get_sidecar_nodes(self):
+        return [
+            SimpleNamespace(display_url=f"{self.url}?img_index={i}", is_video=False, video_url=None)
+            for i in range(3)
+        ]
+
+    def likers(self) -> list:
+        fake = self._fake
+        rng = random.Random(fake.seed * 7 + self._index)
+        return [FakeUser(i, fake.cdn) for i in rng.sample(range(max(fake.followers, fake.likers)), fake.likers)]
+
+    def get_likes(self):
+        # A generator, like instaloader's (it can't be frozen)
+        likers = self.likers()
+        yield from self._fake.paged("likes", len(likers), likers.__getitem__, self._context)
+
+    def get_comments(self):
+        # Like instaloader's: a list when all comments are inline, a node iterator for
+        # a single page, else a generator (its iPhone endpoint fallback)
+        comments = list(self._iter_comments())
+        if len(comments) <= INLINE_COMMENTS:
+            return comments
+        paged = self._fake.paged("comments", len(comments), comments.__getitem__, self._context)
+        if len(comments) <= self._fake.page_size:
+            return paged
+        return (comment for comment in paged)
+
+    def _iter_comments(self):
+        fake = self._fake
+        rng = random.Random(fake.seed * 11 + self._index)
+        pool = max(fake.followers, 1)
+        for j in range(fake.comments):
+            comment_id = self.mediaid * 1000 + j
+            created = self.date_utc + timedelta(minutes=j)
+            answers = [
+                FakeComment(comment_id * 100 + k, FakeUser(rng.randrange(pool), fake.cdn), "thank you!! 🙏",
+                            created + timedelta(minutes=k + 1), rng.randint(0, 5))
+                for k in range(fake.replies)
+            ]
+            yield FakeComment(comment_id, FakeUser(rng.randrange(pool), fake.cdn), " ".join(rng.choices(WORDS, k=6)),
+                              created, rng.randint(0, 40), answers)
+
+
+class FakeProfile:
+    """Stand-in for the instaloader.Profile of a refreshed account."""
+
+    def __init__(self, fake: "FakeInstagram", username: str, context=None):
+        self._fake = fake
+        self._context = context
+        self.username = username
+        self.userid = 1
+        self.full_name = username.title()
+        self.biography = "building in public #buildinpublic"
+        self.biography_hashtags = ["buildinpublic"]
+        self.biography_mentions = []
+        self.external_url = "https://example.com"
+        self.profile_pic_url = f"{fake.cdn}/v/t51.2885-19/1_n.jpg"
+        self.is_private = False
+        self.is_verified = False
+        self.is_business_account = True
+        self.business_category_name = "Creator"
+        self.followers = fake.followers
+        self.followees = fake.following
+        self.mediacount = fake.posts
+        self.igtvcount = 0
+
+    def get_posts(self):
+        return self._fake.paged("posts", self._fake.posts, lambda i: self._fake.post(i, self._context), self._context)
+
+    def get_followers(self):
+        return self._fake.paged(
+            "followers", self._fake.followers, lambda i: FakeUser(i, self._fake.cdn), self._context
+        )
+
+    def get_followees(self):
+        offset = self._fake.followers // 2
+        return self._fake.paged(
+            "followees", self._fake.following, lambda i: FakeUser(offset + i, self._fake.cdn), self._context
+        )
+
+
+class FakeNodeIterator:
+    """
+    Stand-in for instaloader's NodeIterator over ``count`` items built by
+    ``make(index)``, one request per page. Like the real one, a thawed
+    iterator first repeats the last item yielded before it was frozen.
+    """
+
+    def __init__(self, fake: "FakeInstagram", query_type: str, count: int, make, context=None):
+        self._fake = fake
+        self._query_type = query_type
+        self._count = count
+        self._make = make
+        self._context = context
+        self.total_index = 0
+
+    def page_length(self) -> int:
+        return self._fake.page_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.total_index >= self._count:
+            raise StopIteration
+        if self.total_index % self._fake.page_size == 0:
+            self._fake.request(self._query_type, self._context)
+        item = self._make(self.total_index)
+        self.total_index += 1
+        return item
+
+    def freeze(self) -> FrozenNodeIterator:
+        return FrozenNodeIterator(
+            query_hash=self._query_type,
+            query_variables={},
+            query_referer=None,
+            context_username=None,
+            total_index=max(0, self.total_index - 1),
+            best_before=time.time() + 86400,
+            remaining_data=None,
+            first_node=None,
+            doc_id=None,
+        )
+
+    def thaw(self, frozen: FrozenNodeIterator):
+        if self.total_index or frozen.query_hash != self._query_type:
+            raise InvalidArgumentException("Mismatching resume information.")
+        self.total_index = frozen.total_index
+
+
+class FakeInstagram:
+    """
+    Synthetic account plus request accounting.
+
+    ``latency`` seconds are slept per page; ``rate_limit`` is the probability
+    that a page first answers 429, which calls the rate controller's
+    ``handle_429`` and retries. Requests go through the rate controller of
+    the context that resolved the profile, so several loaders (one per
+    account of a batch refresh) can share one fake. Every username serves
+    the same synthetic account. Counters are thread-safe and cleared by
+    ``reset``. Image URLs start with ``cdn``.
+    """
+
+    def __init__(
+        self,
+        posts: int = 50,
+        likers: int = 50,
+        comments: int = 20,
+        replies: int = 2,
+        followers: int = 1000,
+        following: int = 500,
+        page_size: int = PAGE_SIZE,
+        latency: float = 0.0,
+        rate_limit: float = 0.0,
+        seed: int = 42,
+        cdn: str = INSTAGRAM_CDN,
+    ):
+        self.posts = posts
+        self.likers = likers
+        self.comments = comments
+        self.replies = replies
+        self.followers = followers
+        self.following = following
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.seed = seed
+        self.cdn = cdn
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.context = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.rate_limited = 0
+            self.by_type = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "rateLimited": self.rate_limited, "byType": dict(self.by_type)}
+
+    def request(self, query_type: str, context=None):
+        """Account for one Instagram query, going through the context's rate controller."""
+        controller = getattr(context or self.context, "_rate_controller", None)
+        while True:
+            if controller is not None:
+                controller.wait_before_query(query_type)
+            with self._lock:
+                self.requests += 1
+                self.by_type[query_type] = self.by_type.get(query_type, 0) + 1
+                limited = self.rate_limit > 0 and self._rng.random() < self.rate_limit
+                if limited:
+                    self.rate_limited += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if not limited:
+                return
+            if controller is not None:
+                controller.handle_429(query_type)
+
+    def paged(self, query_type: str, count: int, make, context=None) -> FakeNodeIterator:
+        """Iterate ``make(0..count-1)``, issuing one request per ``page_size`` items."""
+        return FakeNodeIterator(self, query_type, count, make, context)
+
+    def post(self, index: int, context=None) -> FakePost:
+        return FakePost(self, index, FIRST_POST_AT - timedelta(hours=index * 37), context)
+
+    def profile(self, context, username: str) -> FakeProfile:
+        self.request("profile", context)
+        return FakeProfile(self, username, context)
+
+    def post_by_shortcode(self, context, shortcode: str) -> FakePost:
+        self.request("post", context)
+        return self.post(self.post_index(shortcode), context)
+
+    def post_index(self, shortcode: str) -> int:
+        index = int(shortcode[1:]) if shortcode[1:].isdigit() else -1
+        if not 0 <= index < self.posts:
+            raise instaloader.exceptions.BadResponseException(f"Fetching Post metadata failed: {shortcode}")
+        return index
+
+    def graphql(self, context, query_hash: str, variables: dict) -> dict:
+        """Answer a GraphQL query; only the likes query is served."""
+        if query_hash != LIKES_QUERY_HASH:
+            raise instaloader.exceptions.QueryReturnedNotFoundException(f"Query {query_hash} is not faked")
+        likers = self.post(self.post_index(variables["shortcode"]), context).likers()
+        start = int(variables.get("after") or 0)
+        end = min(len(likers), start + variables["first"])
+        self.request("likes", context)
+        return {"data": {"shortcode_media": {"edge_liked_by": {
+            "count": len(likers),
+            "edges": [{"node": user.node()} for user in likers[start:end]],
+            "page_info": {"has_next_page": end < len(likers), "end_cursor": str(end)},
+        }}}}
+
+    @contextmanager
+    def installed(self):
+        """
+        Serve instaloader.Profile.from_username, Post.from_shortcode and
+        InstaloaderContext.graphql_query from this fake while active.
+        """
+        originals = (
+            instaloader.Profile.__dict__["from_username"],
+            instaloader.Post.__dict__["from_shortcode"],
+            instaloader.InstaloaderContext.graphql_query,
+        )
+        instaloader.Profile.from_username = classmethod(lambda cls, context, username: self.profile(context, username))
+        instaloader.Post.from_shortcode = classmethod(
+            lambda cls, context, shortcode: self.post_by_shortcode(context, shortcode)
+        )
+        instaloader.InstaloaderContext.graphql_query = (
+            lambda context, query_hash, variables, referer=None: self.graphql(context, query_hash, variables)
+        )
+        try:
+            yield self
+        finally:
+            (
+                instaloader.Profile.from_username,
+                instaloader.Post.from_shortcode,
+                instaloader.InstaloaderContext.graphql_query,
+            ) = originals
+
+
+def solid_png(width: int, height: int, rgb: tuple) -> bytes:
+    """A single-colour RGB PNG."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    rows = (b"\x00" + bytes(rgb) * width) * height
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeCDN:
+    """
+    Local HTTP stand-in for the Instagram CDN.
+
+    Answers every GET with a ``size`` pixel square PNG whose colour is one
+    of ``colors``, picked by the path and query, so distinct URLs often
+    serve identical bytes. Paths containing ``missing`` answer 404.
+    ``latency`` seconds are slept per request; requests are counted.
+    """
+
+    def __init__(self, size: int = 640, colors: int = 16, latency: float = 0.0):
+        self.size = size
+        self.colors = colors
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with cdn._lock:
+                    cdn.requests += 1
+                if cdn.latency:
+                    time.sleep(cdn.latency)
+                if "missing" in self.path:
+                    self.send_error(404)
+                    return
+                body = cdn.image(self.path)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        # Bound right away so URLs can be built before the server runs
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def image(self, path: str) -> bytes:
+        return self._image(zlib.crc32(path.encode()) % self.colors)
+
+    @functools.lru_cache(maxsize=None)
+    def _image(self, shade: int) -> bytes:
+        return solid_png(self.size, self.size, (shade * 16 % 256, 255 - shade * 8, shade * 40 % 256))
+
+    def __enter__(self) -> "FakeCDN":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -12,10 +12,37 @@ It uses Instaloader to fetch Instagram data and exports it to JSON files.
 Run locally, then commit the updated JSON files to the repository.
 
 Usage:
-    python scripts/refresh_instagram_data.py <username>
+    python scripts/refresh_instagram_data.py <username> [<username> ...] [--max-posts N]
+        [--fetch-likers] [--workers N] [--sqlite FILE]
+        [--stream [--fetch-followers] [--likers-workers N]]
 
 Example:
     python scripts/refresh_instagram_data.py anipottsbuilds
+    python scripts/refresh_instagram_data.py anipottsbuilds otheraccount --workers 2
+
+With several usernames, the accounts are refreshed in parallel (up to
+--workers at a time, default 3) with one Instaloader session whose request
+rate limits they share, and each account is written to
+data/instagram/<username>/.
+
+Every run also appends the account's follower/following/post counts and
+each post's likes, comments and views to snapshots/YYYY-MM-DD.ndjson in the
+output directory: a full record for the first run of a day, then only what
+changed (see api/_snapshots.py).
+
+--sqlite FILE also writes profiles, posts, hashtags and likers to a
+normalized SQLite database, the same one the serverless refresh writes
+with SQLITE_PATH (see api/_sinks.py).
+
+--stream exports through NDJSON logs in export/ under the output directory
+instead of holding everything in memory: each post (and with
+--fetch-followers, each follower) is appended and flushed as it is fetched
+and the position checkpointed, and likers are fetched --likers-workers posts
+at a time (default 4). An interrupted run picks up where it stopped when
+rerun. Once everything is fetched, the logs are compacted into posts.json
+(and followers.json), the snapshot and the --sqlite database one record at
+a time, and export/ is removed; while any post's likers are missing, or if
+writing fails, export/ is kept and the run fails so a rerun can finish it.
 
 Prerequisites:
     pip install instaloader
@@ -24,7 +51,11 @@ Note: You may need to log in for accessing some data. See Instaloader docs.
 """
 
 import json
+import shutil
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -35,15 +66,40 @@ except ImportError:
     print("Install it with: pip install instaloader")
     sys.exit(1)
 
+# The snapshot archive is shared with the serverless refresh (api/_snapshots.py)
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+from _sinks import SQLiteSink  # noqa: E402
+from _snapshots import FileSnapshotStore, record_snapshot  # noqa: E402
+
 
 # Output directory
 OUTPUT_DIR = Path(__file__).parent.parent / "data" / "instagram"
 
+# Options that take a value (everything else that isn't a flag is a username)
+VALUE_OPTIONS = ("--max-posts", "--workers", "--sqlite", "--likers-workers")
+
+# Likers fetched per post, and posts whose likers a streaming export fetches at once
+LIKERS_PER_POST = 20
+LIKERS_WORKERS = 4
+
+
+class SharedRateController(instaloader.RateController):
+    """Instaloader's rate controller, made safe to share between account threads."""
+
+    def __init__(self, context):
+        super().__init__(context)
+        self._lock = threading.Lock()
+
+    def wait_before_query(self, query_type: str) -> None:
+        with self._lock:
+            super().wait_before_query(query_type)
+
+    def handle_429(self, query_type: str) -> None:
+        with self._lock:
+            super().handle_429(query_type)
 
-def fetch_profile_data(loader: instaloader.Instaloader, username: str) -> dict:
-    """Fetch profile information for a given username."""
-    profile = instaloader.Profile.from_username(loader.context, username)
 
+def profile_record(profile: instaloader.Profile) -> dict:
     return {
         "username": profile.username,
         "fullName": profile.full_name or "",
@@ -51,10 +107,69 @@ def fetch_profile_data(loader: instaloader.Instaloader, username: str) -> dict:
         "profilePicUrl": profile.profile_pic_url,
         "followersCount": profile.followers,
         "followingCount": profile.followees,
+        "postsCount": profile.mediacount,
         "lastUpdated": datetime.utcnow().isoformat() + "Z",
     }
 
 
+def fetch_profile_data(loader: instaloader.Instaloader, username: str) -> dict:
+    """Fetch profile information for a given username."""
+    return profile_record(instaloader.Profile.from_username(loader.context, username))
+
+
+def user_record(user) -> dict:
+    return {
+        "username": user.username,
+        "fullName": user.full_name or None,
+        "profilePicUrl": user.profile_pic_url or None,
+    }
+
+
+def post_record(post: instaloader.Post) -> dict:
+    """A post as stored in posts.json, without its likers."""
+    # Determine media type
+    if post.typename == "GraphVideo":
+        media_type = "video"
+    elif post.typename == "GraphSidecar":
+        media_type = "carousel"
+    else:
+        media_type = "image"
+
+    # Get media URLs
+    media_urls = []
+    if post.typename == "GraphSidecar":
+        for node in post.get_sidecar_nodes():
+            media_urls.append(node.display_url)
+    else:
+        media_urls.append(post.url)
+
+    return {
+        "id": str(post.mediaid),
+        "shortcode": post.shortcode,
+        "typename": post.typename,
+        "caption": post.caption,
+        "captionHashtags": list(post.caption_hashtags),
+        "mediaType": media_type,
+        "mediaUrls": media_urls,
+        "permalink": f"https://www.instagram.com/p/{post.shortcode}/",
+        "timestamp": post.date_utc.isoformat() + "Z",
+        "likeCount": post.likes,
+        "commentCount": post.comments,
+        "videoViewCount": post.video_view_count if post.is_video else None,
+    }
+
+
+def fetch_post_likers(post: instaloader.Post) -> list:
+    """The first LIKERS_PER_POST likers of ``post`` (requires login, rate limited)."""
+    likers = []
+    for liker in post.get_likes():
+        likers.append(user_record(liker))
+        # Limit likers to avoid rate limits
+        if len(likers) >= LIKERS_PER_POST:
+            break
+    return likers
+
+
 def fetch_posts_data(
     loader: instaloader.Instaloader,
     username: str,
@@ -77,61 +192,25 @@ def fetch_posts_data(
         if i >= max_posts:
             break
 
-        # Determine media type
-        if post.typename == "GraphVideo":
-            media_type = "video"
-        elif post.typename == "GraphSidecar":
-            media_type = "carousel"
-        else:
-            media_type = "image"
-
-        # Get media URLs
-        media_urls = []
-        if post.typename == "GraphSidecar":
-            for node in post.get_sidecar_nodes():
-                media_urls.append(node.display_url)
-        else:
-            media_urls.append(post.url)
-
-        # Fetch likers if requested (warning: rate limited!)
-        likers = []
+        # Fetch likers if requested (warning: rate limited!); posts without
+        # them carry no "likers", so the SQLite sink keeps the stored ones
+        post_data = post_record(post)
         if fetch_likers:
             try:
-                for liker in post.get_likes():
-                    likers.append({
-                        "username": liker.username,
-                        "fullName": liker.full_name or None,
-                        "profilePicUrl": liker.profile_pic_url or None,
-                    })
-                    # Limit likers to first 20 to avoid rate limits
-                    if len(likers) >= 20:
-                        break
+                post_data["likers"] = fetch_post_likers(post)
             except Exception as e:
                 print(f"  Warning: Could not fetch likers for post {post.shortcode}: {e}")
 
-        post_data = {
-            "id": str(post.mediaid),
-            "shortcode": post.shortcode,
-            "caption": post.caption,
-            "mediaType": media_type,
-            "mediaUrls": media_urls,
-            "permalink": f"https://www.instagram.com/p/{post.shortcode}/",
-            "timestamp": post.date_utc.isoformat() + "Z",
-            "likeCount": post.likes,
-            "commentCount": post.comments,
-            "likers": likers,
-        }
-
         posts.append(post_data)
         print(f"  Fetched post {i + 1}/{max_posts}: {post.shortcode}")
 
     return posts
 
 
-def save_json(data: dict | list, filename: str) -> None:
+def save_json(data: dict | list, filename: str, output_dir: Path = OUTPUT_DIR) -> None:
     """Save data to a JSON file."""
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    filepath = OUTPUT_DIR / filename
+    output_dir.mkdir(parents=True, exist_ok=True)
+    filepath = output_dir / filename
 
     with open(filepath, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
@@ -139,32 +218,355 @@ def save_json(data: dict | list, filename: str) -> None:
     print(f"Saved: {filepath}")
 
 
+class NDJSONLog:
+    """
+    Append-only NDJSON file, flushed after every record (safe to share
+    between threads). A line torn by an interrupted run is cut off on open.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        truncate_partial_line(path)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def append(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def truncate_partial_line(path: Path) -> None:
+    """Cut ``path`` after its last newline, scanning back from the end."""
+    if not path.exists():
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, 2)
+        position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+
+
+def read_ndjson(path: Path):
+    """Yield the records of ``path``, one line at a time (nothing if it doesn't exist)."""
+    if not path.exists():
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+
+class Checkpoint:
+    """Frozen iterator positions of a streaming export, rewritten atomically after every record."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.state = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        self._lock = threading.Lock()
+
+    def resume(self, name: str, iterator):
+        """``iterator``, thawed at the saved position of ``name`` if it is still valid."""
+        frozen = self.state.get(name)
+        if frozen:
+            try:
+                iterator.thaw(instaloader.FrozenNodeIterator(**frozen))
+            except (instaloader.exceptions.InvalidArgumentException, TypeError) as e:
+                print(f"  Checkpoint for {name} no longer valid ({e}); skipping exported items instead")
+        return iterator
+
+    def save(self, name: str, iterator) -> None:
+        with self._lock:
+            self.state[name] = iterator.freeze()._asdict()
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.state), encoding="utf-8")
+            tmp.replace(self.path)
+
+
+def ndjson_offsets(path: Path, key: str) -> dict:
+    """Byte offset of the line of each ``key`` value in ``path`` (the last one wins)."""
+    offsets = {}
+    if not path.exists():
+        return offsets
+    with open(path, "rb") as f:
+        position = 0
+        for line in f:
+            if line.endswith(b"\n"):
+                offsets[json.loads(line)[key]] = position
+            position += len(line)
+    return offsets
+
+
+def export_posts(export_dir: Path):
+    """
+    Yield the posts of a streaming export with their likers attached,
+    reading each likers list from its line in likers.ndjson as it is
+    needed, so only one post is held in memory at a time.
+    """
+    likers_path = export_dir / "likers.ndjson"
+    offsets = ndjson_offsets(likers_path, "shortcode")
+    likers_file = open(likers_path, "rb") if offsets else None
+    try:
+        for record in read_ndjson(export_dir / "posts.ndjson"):
+            offset = offsets.get(record["shortcode"])
+            if offset is not None:
+                likers_file.seek(offset)
+                record["likers"] = json.loads(likers_file.readline())["likers"]
+            yield record
+    finally:
+        if likers_file:
+            likers_file.close()
+
+
+def write_json_array(records, path: Path) -> int:
+    """Write ``records`` as ``save_json`` would, one at a time, replacing ``path`` atomically."""
+    tmp = path.with_suffix(".tmp")
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(",\n" if count else "[\n")
+            f.write("\n".join("  " + line for line in json.dumps(record, indent=2, ensure_ascii=False).splitlines()))
+            count += 1
+        f.write("\n]" if count else "[]")
+    tmp.replace(path)
+    print(f"Saved: {path}")
+    return count
+
+
+def stream_account(
+    loader: instaloader.Instaloader,
+    username: str,
+    max_posts: int,
+    fetch_likers: bool,
+    fetch_followers: bool,
+    output_dir: Path,
+    likers_workers: int = LIKERS_WORKERS,
+) -> tuple:
+    """
+    Export one account through NDJSON logs in ``output_dir/export``.
+
+    Posts (and followers, if requested) are appended as they are fetched and
+    the iterator positions checkpointed after each one; likers are fetched
+    on ``likers_workers`` threads and appended per post. A rerun after an
+    interruption skips what the logs already hold. If any post's likers
+    could not be fetched, a RuntimeError is raised so the next run retries
+    them. Returns ``(profile, export_dir)``; ``refresh_account`` compacts
+    the logs and removes them.
+    """
+    export_dir = output_dir / "export"
+    export_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(export_dir / "checkpoint.json")
+
+    profile = instaloader.Profile.from_username(loader.context, username)
+    profile_data = profile_record(profile)
+    save_json(profile_data, "profile.json", output_dir)
+
+    exported = [record["shortcode"] for record in read_ndjson(export_dir / "posts.ndjson")]
+    liked = {record["shortcode"] for record in read_ndjson(export_dir / "likers.ndjson")}
+    if exported:
+        print(f"[{username}] Resuming export: {len(exported)} posts, {len(liked)} likers lists already saved")
+    posts_log = NDJSONLog(export_dir / "posts.ndjson")
+    likers_log = NDJSONLog(export_dir / "likers.ndjson")
+
+    def save_likers(shortcode: str, post: instaloader.Post | None = None) -> None:
+        try:
+            if post is None:
+                post = instaloader.Post.from_shortcode(loader.context, shortcode)
+            likers_log.append({"shortcode": shortcode, "likers": fetch_post_likers(post)})
+            liked.add(shortcode)
+        except Exception as e:
+            # Left out of the log, so the next run retries it
+            print(f"  Warning: Could not fetch likers for post {shortcode}: {e}")
+
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, likers_workers)) as pool:
+            if fetch_likers:
+                # Posts saved by an interrupted run before their likers were
+                for shortcode in exported:
+                    if shortcode not in liked:
+                        futures.append(pool.submit(save_likers, shortcode))
+
+            seen = set(exported)
+            if len(seen) < max_posts:
+                posts = checkpoint.resume("posts", profile.get_posts())
+                for post in posts:
+                    # A thawed iterator repeats the last post it yielded
+                    if post.shortcode in seen:
+                        continue
+                    posts_log.append(post_record(post))
+                    seen.add(post.shortcode)
+                    checkpoint.save("posts", posts)
+                    if fetch_likers:
+                        futures.append(pool.submit(save_likers, post.shortcode, post))
+                    print(f"  Fetched post {len(seen)}/{max_posts}: {post.shortcode}")
+                    if len(seen) >= max_posts:
+                        break
+    finally:
+        posts_log.close()
+        likers_log.close()
+    for future in futures:
+        future.result()
+
+    if fetch_followers:
+        followed = {record["username"] for record in read_ndjson(export_dir / "followers.ndjson")}
+        followers_log = NDJSONLog(export_dir / "followers.ndjson")
+        try:
+            followers = checkpoint.resume("followers", profile.get_followers())
+            for follower in followers:
+                if follower.username in followed:
+                    continue
+                followers_log.append(user_record(follower))
+                followed.add(follower.username)
+                checkpoint.save("followers", followers)
+                if len(followed) % 100 == 0:
+                    print(f"  Fetched {len(followed)} followers")
+        finally:
+            followers_log.close()
+
+    if fetch_likers:
+        missing = [shortcode for shortcode in seen if shortcode not in liked]
+        if missing:
+            raise RuntimeError(
+                f"Likers missing for {len(missing)} posts; run again to retry them (export kept in {export_dir})"
+            )
+
+    return profile_data, export_dir
+
+
+def refresh_account(
+    loader: instaloader.Instaloader,
+    username: str,
+    max_posts: int,
+    fetch_likers: bool,
+    output_dir: Path,
+    sqlite_path: Path | None = None,
+    stream: bool = False,
+    fetch_followers: bool = False,
+    likers_workers: int = LIKERS_WORKERS,
+) -> dict:
+    """
+    Fetch and save one account (also to ``sqlite_path``, if given); returns
+    a summary instead of raising. ``stream`` exports through resumable
+    NDJSON logs (see ``stream_account``), which are then read back one
+    record at a time into posts.json (and followers.json), the snapshot
+    and the SQLite sink, and removed once all of them are written.
+    """
+    started = time.perf_counter()
+    summary = {"username": username, "posts": 0, "error": None}
+    try:
+        if stream:
+            print(f"[{username}] Streaming export (max {max_posts} posts)...")
+            profile_data, export_dir = stream_account(
+                loader, username, max_posts, fetch_likers, fetch_followers, output_dir, likers_workers
+            )
+            followers_path = export_dir / "followers.ndjson" if fetch_followers else None
+            # Compaction: the same files as the in-memory refresh
+            summary["posts"] = write_json_array(export_posts(export_dir), output_dir / "posts.json")
+            if followers_path:
+                write_json_array(read_ndjson(followers_path), output_dir / "followers.json")
+            posts_data = read_ndjson(export_dir / "posts.ndjson")
+        else:
+            print(f"[{username}] Fetching profile...")
+            profile_data = fetch_profile_data(loader, username)
+            save_json(profile_data, "profile.json", output_dir)
+
+            print(f"[{username}] Fetching posts (max {max_posts})...")
+            posts_data = fetch_posts_data(loader, username, max_posts, fetch_likers)
+            save_json(posts_data, "posts.json", output_dir)
+            summary["posts"] = len(posts_data)
+
+        # Append the counters to the history archive (deltas only)
+        if record_snapshot(FileSnapshotStore(output_dir / "snapshots"), profile_data, posts_data):
+            print(f"[{username}] Recorded snapshot in {output_dir / 'snapshots'}")
+
+        if sqlite_path:
+            with SQLiteSink(sqlite_path) as sink:
+                sink.write_profile(profile_data)
+                if stream:
+                    sink.write_posts(username, export_posts(export_dir))
+                    if followers_path:
+                        sink.write_follow_list(username, "followers", read_ndjson(followers_path))
+                else:
+                    sink.write_posts(username, posts_data)
+            print(f"[{username}] Wrote {sqlite_path}")
+
+        if stream:
+            shutil.rmtree(export_dir)
+
+    except instaloader.exceptions.ProfileNotExistsException:
+        summary["error"] = f"Profile @{username} does not exist."
+    except instaloader.exceptions.PrivateProfileNotFollowedException:
+        summary["error"] = f"Profile @{username} is private and you don't follow them."
+    except Exception as e:
+        summary["error"] = str(e)
+    summary["seconds"] = round(time.perf_counter() - started, 1)
+    return summary
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python refresh_instagram_data.py <username>")
+    usernames = [
+        arg for i, arg in enumerate(sys.argv[1:], start=1)
+        if not arg.startswith("--") and sys.argv[i - 1] not in VALUE_OPTIONS
+    ]
+    if not usernames:
+        print("Usage: python refresh_instagram_data.py <username> [<username> ...]")
         print("Example: python refresh_instagram_data.py anipottsbuilds")
         sys.exit(1)
 
-    username = sys.argv[1]
-
     # Parse optional arguments
     max_posts = 50
     fetch_likers = False
+    workers = 3
 
     if "--max-posts" in sys.argv:
         idx = sys.argv.index("--max-posts")
         max_posts = int(sys.argv[idx + 1])
 
+    if "--workers" in sys.argv:
+        idx = sys.argv.index("--workers")
+        workers = max(1, int(sys.argv[idx + 1]))
+
+    sqlite_path = None
+    if "--sqlite" in sys.argv:
+        idx = sys.argv.index("--sqlite")
+        sqlite_path = Path(sys.argv[idx + 1])
+
     if "--fetch-likers" in sys.argv:
         fetch_likers = True
         print("Warning: Fetching likers is rate-limited and may require login.")
 
-    print(f"Refreshing Instagram data for @{username}")
+    stream = "--stream" in sys.argv
+    fetch_followers = "--fetch-followers" in sys.argv
+    if fetch_followers and not stream:
+        print("Error: --fetch-followers needs --stream.")
+        sys.exit(1)
+
+    likers_workers = LIKERS_WORKERS
+    if "--likers-workers" in sys.argv:
+        idx = sys.argv.index("--likers-workers")
+        likers_workers = max(1, int(sys.argv[idx + 1]))
+
+    print(f"Refreshing Instagram data for {', '.join(f'@{name}' for name in usernames)}")
     print(f"Max posts: {max_posts}")
     print(f"Fetch likers: {fetch_likers}")
+    if stream:
+        print(f"Streaming export (fetch followers: {fetch_followers}, likers workers: {likers_workers})")
     print("-" * 40)
 
-    # Create Instaloader instance
+    # Create one Instaloader instance shared by every account
     loader = instaloader.Instaloader(
         download_pictures=False,
         download_videos=False,
@@ -173,6 +575,7 @@ def main():
         download_comments=False,
         save_metadata=False,
         compress_json=False,
+        rate_controller=SharedRateController,
     )
 
     # Optional: Login for accessing more data
@@ -180,32 +583,31 @@ def main():
     # Or load session:
     # loader.load_session_from_file("your_username")
 
-    try:
-        # Fetch and save profile
-        print("Fetching profile...")
-        profile_data = fetch_profile_data(loader, username)
-        save_json(profile_data, "profile.json")
-
-        # Fetch and save posts
-        print(f"Fetching posts (max {max_posts})...")
-        posts_data = fetch_posts_data(loader, username, max_posts, fetch_likers)
-        save_json(posts_data, "posts.json")
+    # A single account keeps the flat layout; a batch writes one directory per account
+    def output_dir(username: str) -> Path:
+        return OUTPUT_DIR if len(usernames) == 1 else OUTPUT_DIR / username
 
-        print("-" * 40)
-        print("Done! Don't forget to commit the updated JSON files.")
-        print("  git add data/instagram/*.json")
-        print("  git commit -m 'Update Instagram data'")
+    with ThreadPoolExecutor(max_workers=min(workers, len(usernames))) as pool:
+        summaries = list(pool.map(
+            lambda username: refresh_account(
+                loader, username, max_posts, fetch_likers, output_dir(username), sqlite_path,
+                stream, fetch_followers, likers_workers,
+            ),
+            usernames,
+        ))
 
-    except instaloader.exceptions.ProfileNotExistsException:
-        print(f"Error: Profile @{username} does not exist.")
-        sys.exit(1)
-    except instaloader.exceptions.PrivateProfileNotFollowedException:
-        print(f"Error: Profile @{username} is private and you don't follow them.")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error: {e}")
+    print("-" * 40)
+    failed = [summary for summary in summaries if summary["error"]]
+    for summary in summaries:
+        outcome = f"Error: {summary['error']}" if summary["error"] else f"{summary['posts']} posts"
+        print(f"@{summary['username']}: {outcome} ({summary['seconds']}s)")
+    if failed:
         sys.exit(1)
 
+    print("Done! Don't forget to commit the updated JSON files.")
+    print("  git add data/instagram/")
+    print("  git commit -m 'Update Instagram data'")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,39 @@
+import { NextRequest, NextResponse } from "next/server";
+import { FollowKind, getCachedChurn } from "@/lib/cache";
+
+const MAX_ENTRIES = 100;
+
+export async function GET(request: NextRequest) {
+  const params = request.nextUrl.searchParams;
+  const kind = (params.get("kind") || "followers") as FollowKind;
+  if (kind !== "followers" && kind !== "following") {
+    return NextResponse.json(
+      { error: "kind must be followers or following" },
+      { status: 400 }
+    );
+  }
+
+  const limit = Math.min(
+    MAX_ENTRIES,
+    Math.max(1, parseInt(params.get("limit") || "1", 10) || 1)
+  );
+  const sinceParam = params.get("since");
+  const since = sinceParam ? new Date(sinceParam) : undefined;
+  if (since && isNaN(since.getTime())) {
+    return NextResponse.json(
+      { error: "since must be an ISO date" },
+      { status: 400 }
+    );
+  }
+
+  const entries = await getCachedChurn(kind, limit, since);
+  if (!entries) {
+    return NextResponse.json(
+      { error: `Failed to fetch ${kind} churn` },
+      { status: 500 }
+    );
+  }
+
+  // Newest first; entries[0] is "new/lost since last refresh"
+  return NextResponse.json({ kind, entries });
+}
@@ -0,0 +1,54 @@
+import { NextRequest, NextResponse } from "next/server";
+import {
+  getEngagedNonFollowers,
+  getSilentFollowers,
+  getTopFans,
+  getUserEngagement,
+} from "@/lib/cache";
+
+const MAX_ENTRIES = 500;
+const VIEWS = ["fans", "nonfollowers", "silent"] as const;
+
+export async function GET(request: NextRequest) {
+  const params = request.nextUrl.searchParams;
+
+  // What one user liked and commented on (id from any of the lists below)
+  const user = params.get("user");
+  if (user !== null) {
+    const id = parseInt(user, 10);
+    if (isNaN(id)) {
+      return NextResponse.json({ error: "user must be a numeric id" }, { status: 400 });
+    }
+    const engagement = await getUserEngagement(id);
+    if (!engagement) {
+      return NextResponse.json({ error: "No engagement recorded for this user" }, { status: 404 });
+    }
+    return NextResponse.json(engagement);
+  }
+
+  const view = (params.get("view") || "fans") as (typeof VIEWS)[number];
+  if (!VIEWS.includes(view)) {
+    return NextResponse.json(
+      { error: "view must be fans, nonfollowers or silent" },
+      { status: 400 }
+    );
+  }
+  const limit = Math.min(
+    MAX_ENTRIES,
+    Math.max(1, parseInt(params.get("limit") || "50", 10) || 50)
+  );
+
+  if (view === "silent") {
+    const page = await getSilentFollowers(params.get("cursor") || "0", limit);
+    if (!page) {
+      return NextResponse.json({ error: "Failed to fetch silent followers" }, { status: 500 });
+    }
+    return NextResponse.json({ view, ...page });
+  }
+
+  const users = view === "fans" ? await getTopFans(limit) : await getEngagedNonFollowers(limit);
+  if (!users) {
+    return NextResponse.json({ error: `Failed to fetch ${view}` }, { status: 500 });
+  }
+  return NextResponse.json({ view, users });
+}
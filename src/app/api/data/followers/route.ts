@@ -1,9 +1,34 @@
-import { NextResponse } from "next/server";
-import { getCachedFollowers } from "@/lib/cache";
+import { NextRequest, NextResponse } from "next/server";
+import { getCachedFollowers, getCachedFollowersPage, getContentTag, keys } from "@/lib/cache";
+import { makeETag, notModified, withETag } from "@/lib/etag";
 import { FollowersArraySchema } from "@/lib/ig/schema";
 
-export async function GET() {
+const MAX_PAGE_SIZE = 500;
+
+export async function GET(request: NextRequest) {
   try {
+    const etag = makeETag(await getContentTag(keys.followers(), { users: true }));
+    const unchanged = notModified(request, etag);
+    if (unchanged) return unchanged;
+
+    // Paginated read: only the chunks covering the page are fetched
+    const params = request.nextUrl.searchParams;
+    if (params.has("offset") || params.has("limit")) {
+      const offset = Math.max(0, parseInt(params.get("offset") || "0", 10) || 0);
+      const limit = Math.min(
+        MAX_PAGE_SIZE,
+        Math.max(1, parseInt(params.get("limit") || "100", 10) || 100)
+      );
+      const page = await getCachedFollowersPage(offset, limit);
+      if (!page) {
+        return NextResponse.json(
+          { error: "No followers data cached. Trigger a refresh first." },
+          { status: 404 }
+        );
+      }
+      return withETag(NextResponse.json(page), etag);
+    }
+
     const followers = await getCachedFollowers();
 
     if (!followers) {
@@ -17,10 +42,10 @@ export async function GET() {
     const validated = FollowersArraySchema.safeParse(followers);
     if (!validated.success) {
       console.error("Followers validation error:", validated.error);
-      return NextResponse.json(followers);
+      return withETag(NextResponse.json(followers), etag);
     }
 
-    return NextResponse.json(validated.data);
+    return withETag(NextResponse.json(validated.data), etag);
   } catch (error) {
     console.error("Error fetching followers:", error);
     return NextResponse.json(
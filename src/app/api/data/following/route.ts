@@ -1,9 +1,34 @@
-import { NextResponse } from "next/server";
-import { getCachedFollowing } from "@/lib/cache";
+import { NextRequest, NextResponse } from "next/server";
+import { getCachedFollowing, getCachedFollowingPage, getContentTag, keys } from "@/lib/cache";
+import { makeETag, notModified, withETag } from "@/lib/etag";
 import { FollowersArraySchema } from "@/lib/ig/schema";
 
-export async function GET() {
+const MAX_PAGE_SIZE = 500;
+
+export async function GET(request: NextRequest) {
   try {
+    const etag = makeETag(await getContentTag(keys.following(), { users: true }));
+    const unchanged = notModified(request, etag);
+    if (unchanged) return unchanged;
+
+    // Paginated read: only the chunks covering the page are fetched
+    const params = request.nextUrl.searchParams;
+    if (params.has("offset") || params.has("limit")) {
+      const offset = Math.max(0, parseInt(params.get("offset") || "0", 10) || 0);
+      const limit = Math.min(
+        MAX_PAGE_SIZE,
+        Math.max(1, parseInt(params.get("limit") || "100", 10) || 100)
+      );
+      const page = await getCachedFollowingPage(offset, limit);
+      if (!page) {
+        return NextResponse.json(
+          { error: "No following data cached. Trigger a refresh first." },
+          { status: 404 }
+        );
+      }
+      return withETag(NextResponse.json(page), etag);
+    }
+
     const following = await getCachedFollowing();
 
     if (!following) {
@@ -17,10 +42,10 @@ export async function GET() {
     const validated = FollowersArraySchema.safeParse(following);
     if (!validated.success) {
       console.error("Following validation error:", validated.error);
-      return NextResponse.json(following);
+      return withETag(NextResponse.json(following), etag);
     }
 
-    return NextResponse.json(validated.data);
+    return withETag(NextResponse.json(validated.data), etag);
   } catch (error) {
     console.error("Error fetching following:", error);
     return NextResponse.json(
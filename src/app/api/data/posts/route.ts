@@ -1,9 +1,15 @@
-import { NextResponse } from "next/server";
-import { getCachedPosts } from "@/lib/cache";
+import { NextRequest, NextResponse } from "next/server";
+import { getCachedPosts, getContentTag, keys } from "@/lib/cache";
+import { makeETag, notModified, withETag } from "@/lib/etag";
 import { PostsArraySchema } from "@/lib/ig/schema";
 
-export async function GET() {
+export async function GET(request: NextRequest) {
   try {
+    // Likers and comment owners are expanded from the user table
+    const etag = makeETag(await getContentTag(keys.posts(), { users: true }));
+    const unchanged = notModified(request, etag);
+    if (unchanged) return unchanged;
+
     const posts = await getCachedPosts();
 
     if (!posts) {
@@ -18,10 +24,10 @@ export async function GET() {
     if (!validated.success) {
       console.error("Posts validation error:", validated.error);
       // Return raw data anyway for debugging
-      return NextResponse.json(posts);
+      return withETag(NextResponse.json(posts), etag);
     }
 
-    return NextResponse.json(validated.data);
+    return withETag(NextResponse.json(validated.data), etag);
   } catch (error) {
     console.error("Error fetching posts:", error);
     return NextResponse.json(
@@ -1,9 +1,14 @@
-import { NextResponse } from "next/server";
-import { getCachedProfile } from "@/lib/cache";
+import { NextRequest, NextResponse } from "next/server";
+import { getCachedProfile, getContentTag, keys } from "@/lib/cache";
+import { makeETag, notModified, withETag } from "@/lib/etag";
 import { ProfileSchema } from "@/lib/ig/schema";
 
-export async function GET() {
+export async function GET(request: NextRequest) {
   try {
+    const etag = makeETag(await getContentTag(keys.profile()));
+    const unchanged = notModified(request, etag);
+    if (unchanged) return unchanged;
+
     const profile = await getCachedProfile();
 
     if (!profile) {
@@ -23,7 +28,7 @@ export async function GET() {
       );
     }
 
-    return NextResponse.json(validated.data);
+    return withETag(NextResponse.json(validated.data), etag);
   } catch (error) {
     console.error("Error fetching profile:", error);
     return NextResponse.json(
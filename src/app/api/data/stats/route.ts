@@ -1,6 +1,15 @@
-import { NextResponse } from "next/server";
-import { getCachedProfile, getCachedPosts, getLastRefreshTime, isCacheStale } from "@/lib/cache";
-import type { Post, Profile } from "@/lib/ig/schema";
+import { NextRequest, NextResponse } from "next/server";
+import {
+  getCachedProfile,
+  getCachedPosts,
+  getContentTag,
+  getLastRefreshTime,
+  isCacheStale,
+  keys,
+} from "@/lib/cache";
+import { makeETag, notModified, withETag } from "@/lib/etag";
+import { loadInsightsSafe } from "@/lib/ig/load";
+import type { Insights, Post, Profile } from "@/lib/ig/schema";
 
 interface Stats {
   profile: {
@@ -35,16 +44,50 @@ interface Stats {
     lastRefresh: string | null;
     isStale: boolean;
   };
+  // Only present when served from insights precomputed at refresh time
+  mediaTypes?: Insights["mediaTypes"];
+  rollingEngagement?: Insights["rollingEngagement"];
 }
 
-export async function GET() {
+export async function GET(request: NextRequest) {
   try {
-    const [profile, posts, lastRefresh, stale] = await Promise.all([
-      getCachedProfile() as Promise<Profile | null>,
-      getCachedPosts() as Promise<Post[] | null>,
+    // The cache block changes with every refresh, so it is part of the tag
+    const [insightsTag, profileTag, postsTag, lastRefresh, stale] = await Promise.all([
+      getContentTag(keys.stats()),
+      getContentTag(keys.profile()),
+      getContentTag(keys.posts()),
       getLastRefreshTime(),
       isCacheStale(),
     ]);
+    const cacheTag = lastRefresh?.getTime() ?? 0;
+    const etag = insightsTag
+      ? makeETag(insightsTag, cacheTag, stale)
+      : makeETag(profileTag, postsTag, cacheTag, stale);
+    const unchanged = notModified(request, etag);
+    if (unchanged) return unchanged;
+
+    // Fast path: one small GET of the insights written by the refresh
+    const insights = await loadInsightsSafe();
+    if (insights) {
+      const stats: Stats = {
+        profile: insights.profile,
+        engagement: insights.engagement,
+        content: insights.content,
+        timing: insights.timing,
+        cache: {
+          lastRefresh: lastRefresh?.toISOString() || null,
+          isStale: stale,
+        },
+        mediaTypes: insights.mediaTypes,
+        rollingEngagement: insights.rollingEngagement,
+      };
+      return withETag(NextResponse.json(stats), etag);
+    }
+
+    const [profile, posts] = await Promise.all([
+      getCachedProfile() as Promise<Profile | null>,
+      getCachedPosts() as Promise<Post[] | null>,
+    ]);
 
     const stats: Stats = {
       profile: null,
@@ -148,7 +191,7 @@ export async function GET() {
       };
     }
 
-    return NextResponse.json(stats);
+    return withETag(NextResponse.json(stats), etag);
   } catch (error) {
     console.error("Error computing stats:", error);
     return NextResponse.json(
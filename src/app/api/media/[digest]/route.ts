@@ -0,0 +1,35 @@
+import { NextRequest, NextResponse } from "next/server";
+import { getMedia } from "@/lib/cache";
+
+// Assets are addressed by the hash of their bytes, so a URL never changes content
+const CACHE_CONTROL = "public, max-age=31536000, immutable";
+// A thumbnail URL answered with the original may get its thumbnail later
+const FALLBACK_CACHE_CONTROL = "public, max-age=3600";
+// The only types api/_media.py caches (RASTER_TYPES)
+const RASTER_TYPES = ["image/jpeg", "image/png", "image/webp", "image/gif"];
+
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ digest: string }> }
+) {
+  const { digest } = await params;
+  if (!/^[0-9a-f]{32}$/.test(digest)) {
+    return NextResponse.json({ error: "Invalid media id" }, { status: 400 });
+  }
+  const width = parseInt(request.nextUrl.searchParams.get("w") || "", 10);
+  const media = await getMedia(digest, isNaN(width) ? null : width);
+  if (!media || !RASTER_TYPES.includes(media.type)) {
+    return NextResponse.json({ error: "Media not cached" }, { status: 404 });
+  }
+  const fallback = !isNaN(width) && media.variant !== `w${width}`;
+  return new NextResponse(new Uint8Array(media.body), {
+    headers: {
+      "Content-Type": media.type,
+      "Cache-Control": fallback ? FALLBACK_CACHE_CONTROL : CACHE_CONTROL,
+      ETag: `"${digest}-${media.variant}"`,
+      // Served from the dashboard's origin: never sniffed or run as a document
+      "X-Content-Type-Options": "nosniff",
+      "Content-Security-Policy": "default-src 'none'",
+    },
+  });
+}
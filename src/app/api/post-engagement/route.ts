@@ -0,0 +1,38 @@
+import { NextRequest, NextResponse } from "next/server";
+import { AUTH_COOKIE_NAME, generateAuthToken } from "@/lib/auth";
+
+const PARAMS = ["post", "kind", "cursor", "account"] as const;
+
+// Pages of a post's likers or comments from the refresh function. Cached pages
+// are public; an uncached page is fetched from Instagram, spending the hourly
+// request budget, only for visitors signed in with SITE_PASSWORD (/api/auth).
+export async function GET(request: NextRequest) {
+  const baseUrl = process.env.VERCEL_URL
+    ? `https://${process.env.VERCEL_URL}`
+    : process.env.NEXT_PUBLIC_BASE_URL || "http://localhost:3000";
+  const query = new URLSearchParams();
+  for (const name of PARAMS) {
+    const value = request.nextUrl.searchParams.get(name);
+    if (value !== null) query.set(name, value);
+  }
+
+  const sitePassword = process.env.SITE_PASSWORD;
+  const secret = process.env.POST_ENGAGEMENT_SECRET;
+  const signedIn =
+    !!sitePassword &&
+    request.cookies.get(AUTH_COOKIE_NAME)?.value === generateAuthToken(sitePassword);
+
+  try {
+    const response = await fetch(`${baseUrl}/api/ig-refresh?${query}`, {
+      headers: signedIn && secret ? { Authorization: `Bearer ${secret}` } : {},
+      cache: "no-store",
+    });
+    return new NextResponse(await response.text(), {
+      status: response.status,
+      headers: { "Content-Type": "application/json" },
+    });
+  } catch (error) {
+    console.error("Error fetching post engagement:", error);
+    return NextResponse.json({ error: "Failed to fetch post engagement" }, { status: 502 });
+  }
+}
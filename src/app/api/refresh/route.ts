@@ -1,18 +1,33 @@
 import { NextResponse } from "next/server";
-import { getRefreshStatus, setRefreshStatus, isCacheStale, getLastRefreshTime } from "@/lib/cache";
+import {
+  getRefreshStatus,
+  setRefreshStatus,
+  isCacheStale,
+  getLastRefreshTime,
+  getRefreshProgress,
+  getRefreshJob,
+  getEntityRefreshTimes,
+} from "@/lib/cache";
 
 export async function GET() {
   try {
-    const [status, stale, lastRefresh] = await Promise.all([
+    const [status, stale, lastRefresh, progress, job, refreshedAt] = await Promise.all([
       getRefreshStatus(),
       isCacheStale(),
       getLastRefreshTime(),
+      getRefreshProgress(),
+      getRefreshJob(),
+      getEntityRefreshTimes(),
     ]);
 
     return NextResponse.json({
       status,
       isStale: stale,
       lastRefresh: lastRefresh?.toISOString() || null,
+      progress,
+      job,
+      // Per-entity last refresh (epoch seconds); data stays readable when stale
+      refreshedAt,
     });
   } catch (error) {
     console.error("Error getting refresh status:", error);
@@ -25,15 +40,6 @@ export async function GET() {
 
 export async function POST() {
   try {
-    // Check if already running
-    const currentStatus = await getRefreshStatus();
-    if (currentStatus === "running") {
-      return NextResponse.json(
-        { error: "Refresh already in progress", status: "running" },
-        { status: 409 }
-      );
-    }
-
     // Check if cache is fresh (rate limiting)
     const stale = await isCacheStale();
     if (!stale) {
@@ -55,10 +61,8 @@ export async function POST() {
       ? `https://${process.env.VERCEL_URL}`
       : process.env.NEXT_PUBLIC_BASE_URL || "http://localhost:3000";
 
-    // Set status to running before calling Python function
-    await setRefreshStatus("running");
-
-    // Call the Python function at /api/ig-refresh
+    // Call the Python function at /api/ig-refresh. It enqueues a job (or joins the
+    // active one) and answers 202 right away; progress is polled via GET.
     const response = await fetch(`${baseUrl}/api/ig-refresh`, {
       method: "POST",
       headers: {
@@ -75,12 +79,14 @@ export async function POST() {
       );
     }
 
-    const result = await response.json();
-    return NextResponse.json({
-      message: "Refresh triggered",
-      status: "running",
-      ...result,
-    });
+    const job = await response.json();
+    return NextResponse.json(
+      {
+        message: job.joined ? "Refresh already in progress" : "Refresh queued",
+        ...job,
+      },
+      { status: 202 }
+    );
   } catch (error) {
     console.error("Error triggering refresh:", error);
     await setRefreshStatus(`error:${error instanceof Error ? error.message : "Unknown error"}`);
@@ -2,6 +2,7 @@ import { format } from "date-fns";
 import {
   loadPostsSafe,
   loadProfileSafe,
+  loadInsightsSafe,
   calculateStats,
   getPostsByMonth,
   getTopPostsByLikes,
@@ -22,31 +23,71 @@ import {
 } from "@/components/ui/table";
 import { Badge } from "@/components/ui/badge";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
+import type { Insights, Post } from "@/lib/ig/schema";
 
 export const metadata = {
   title: "Insights",
 };
 
+function insightsView(insights: Insights) {
+  const engagement = insights.engagement;
+  return {
+    postCount: insights.content?.totalPosts ?? 0,
+    stats: {
+      totalPosts: insights.content?.totalPosts ?? 0,
+      totalLikes: engagement?.totalLikes ?? 0,
+      totalComments: engagement?.totalComments ?? 0,
+      avgLikes: engagement?.avgLikesPerPost ?? 0,
+      avgComments: engagement?.avgCommentsPerPost ?? 0,
+      medianLikes: engagement?.medianLikes ?? 0,
+    },
+    topPostsByLikes: insights.topPostsByLikes,
+    topPostsByComments: insights.topPostsByComments,
+    monthlyData: insights.postsByMonth
+      .slice(0, 12)
+      .map(({ month, count }): [string, { count: number }] => [month, { count }]),
+    hashtagStats: insights.hashtags.slice(0, 15),
+    timingStats: insights.engagementTiming ?? getTimingStats([]),
+  };
+}
+
+type InsightsView = ReturnType<typeof insightsView>;
+
+function postsView(posts: Post[]): InsightsView {
+  const postsByMonth = getPostsByMonth(posts);
+  return {
+    postCount: posts.length,
+    stats: calculateStats(posts),
+    topPostsByLikes: getTopPostsByLikes(posts, 10),
+    topPostsByComments: getTopPostsByComments(posts, 10),
+    // Convert map to sorted array for display
+    monthlyData: Array.from(postsByMonth.entries())
+      .sort(([a], [b]) => b.localeCompare(a))
+      .slice(0, 12),
+    hashtagStats: getHashtagStats(posts).slice(0, 15),
+    timingStats: getTimingStats(posts),
+  };
+}
+
 export default async function InsightsPage() {
-  const [posts, profile] = await Promise.all([
-    loadPostsSafe(),
+  const [insights, profile] = await Promise.all([
+    loadInsightsSafe(),
     loadProfileSafe(),
   ]);
-  const stats = calculateStats(posts);
-  const topPostsByLikes = getTopPostsByLikes(posts, 10);
-  const topPostsByComments = getTopPostsByComments(posts, 10);
-  const postsByMonth = getPostsByMonth(posts);
-  const hashtagStats = getHashtagStats(posts).slice(0, 15);
-  const timingStats = getTimingStats(posts);
-
-  // Convert map to sorted array for display
-  const monthlyData = Array.from(postsByMonth.entries())
-    .sort(([a], [b]) => b.localeCompare(a))
-    .slice(0, 12);
+  // Prefer insights precomputed by the refresh; scan posts only if they are missing
+  const {
+    postCount,
+    stats,
+    topPostsByLikes,
+    topPostsByComments,
+    monthlyData,
+    hashtagStats,
+    timingStats,
+  } = insights ? insightsView(insights) : postsView(await loadPostsSafe());
 
   // Calculate engagement rate
-  const engagementRate = profile && posts.length > 0
-    ? ((stats.totalLikes + stats.totalComments) / posts.length / profile.followersCount * 100).toFixed(2)
+  const engagementRate = profile && postCount > 0
+    ? ((stats.totalLikes + stats.totalComments) / postCount / profile.followersCount * 100).toFixed(2)
     : null;
 
   return (
@@ -56,7 +97,7 @@ export default async function InsightsPage() {
         <RefreshButton />
       </div>
 
-      {posts.length === 0 ? (
+      {postCount === 0 ? (
         <div className="text-center py-16 text-muted-foreground">
           No posts found. Click Refresh Data to fetch your Instagram content.
         </div>
@@ -7,6 +7,7 @@ import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { Heart, ChevronDown, ChevronUp, MessageCircle } from "lucide-react";
 import type { Comment } from "@/lib/ig/schema";
+import { mediaSrc } from "@/lib/media";
 
 interface CommentsListProps {
   comments: Comment[];
@@ -28,7 +29,7 @@ function CommentItem({
       <div className="flex gap-3">
         <Avatar className="h-8 w-8 flex-shrink-0">
           <AvatarImage
-            src={comment.owner.profilePicUrl ?? undefined}
+            src={mediaSrc(comment.owner.profilePicUrl, 32)}
             alt={comment.owner.username}
           />
           <AvatarFallback>
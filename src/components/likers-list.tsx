@@ -1,5 +1,10 @@
+"use client";
+
+import { useState } from "react";
 import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
+import { Button } from "@/components/ui/button";
 import type { Liker } from "@/lib/ig/schema";
+import { mediaSrc } from "@/lib/media";
 
 interface LikersListProps {
   likers: Liker[];
@@ -7,6 +12,8 @@ interface LikersListProps {
 }
 
 export function LikersList({ likers, totalLikes }: LikersListProps) {
+  const [showAll, setShowAll] = useState(false);
+
   if (likers.length === 0) {
     return (
       <div className="text-sm text-muted-foreground py-4">
@@ -18,7 +25,7 @@ export function LikersList({ likers, totalLikes }: LikersListProps) {
     );
   }
 
-  const displayedLikers = likers.slice(0, 10);
+  const displayedLikers = showAll ? likers : likers.slice(0, 10);
   const remainingCount = totalLikes - displayedLikers.length;
 
   return (
@@ -29,7 +36,7 @@ export function LikersList({ likers, totalLikes }: LikersListProps) {
           <div key={liker.username} className="flex items-center gap-2">
             <Avatar className="h-8 w-8">
               <AvatarImage
-                src={liker.profilePicUrl ?? undefined}
+                src={mediaSrc(liker.profilePicUrl, 32)}
                 alt={liker.username}
               />
               <AvatarFallback>
@@ -47,6 +54,16 @@ export function LikersList({ likers, totalLikes }: LikersListProps) {
           </div>
         ))}
       </div>
+      {likers.length > 10 && (
+        <Button
+          variant="ghost"
+          size="sm"
+          className="w-full text-xs"
+          onClick={() => setShowAll(!showAll)}
+        >
+          {showAll ? "Show less" : `Show all ${likers.length} likers`}
+        </Button>
+      )}
       {remainingCount > 0 && (
         <p className="text-xs text-muted-foreground">
           and {remainingCount.toLocaleString()} others
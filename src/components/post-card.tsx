@@ -5,6 +5,7 @@ import { format } from "date-fns";
 import { Card, CardContent, CardFooter } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import type { Post } from "@/lib/ig/schema";
+import { isCachedMedia, mediaSrc } from "@/lib/media";
 
 interface PostCardProps {
   post: Post;
@@ -70,9 +71,10 @@ export function PostCard({ post, onClick }: PostCardProps) {
       <div className="relative aspect-square bg-muted">
         {mediaUrl && (
           <Image
-            src={mediaUrl}
+            src={mediaSrc(mediaUrl, 320) || mediaUrl}
             alt={post.caption || "Instagram post"}
             fill
+            unoptimized={isCachedMedia(mediaUrl)}
             className="object-cover"
             sizes="(max-width: 768px) 100vw, (max-width: 1200px) 50vw, 33vw"
           />
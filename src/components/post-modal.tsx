@@ -1,5 +1,6 @@
 "use client";
 
+import { useCallback, useEffect, useState } from "react";
 import Image from "next/image";
 import Link from "next/link";
 import { format } from "date-fns";
@@ -26,7 +27,8 @@ import {
   MessageCircle,
   Eye,
 } from "lucide-react";
-import type { Post } from "@/lib/ig/schema";
+import type { Comment, Liker, Post } from "@/lib/ig/schema";
+import { isCachedMedia } from "@/lib/media";
 
 interface PostModalProps {
   post: Post | null;
@@ -34,7 +36,78 @@ interface PostModalProps {
   onOpenChange: (open: boolean) => void;
 }
 
+// Pages of a post's likers or comments fetched on demand from the refresh
+// function (refreshes with LAZY_ENGAGEMENT store counts only). Visitors who
+// aren't signed in only get pages already cached; the rest answer 403.
+function usePostEngagement<T>(
+  shortcode: string | undefined,
+  kind: "likers" | "comments",
+  enabled: boolean
+) {
+  const [items, setItems] = useState<T[]>([]);
+  const [cursor, setCursor] = useState<number | null>(0);
+  const [loading, setLoading] = useState(false);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    setItems([]);
+    setCursor(0);
+    setFailed(false);
+  }, [shortcode]);
+
+  const loadMore = useCallback(async () => {
+    if (!shortcode || cursor === null) return;
+    setLoading(true);
+    setFailed(false);
+    try {
+      const params = new URLSearchParams({ post: shortcode, kind, cursor: String(cursor) });
+      const res = await fetch(`/api/post-engagement?${params}`);
+      if (res.status === 410) {
+        // Cached pages expired; start over
+        setItems([]);
+        setCursor(0);
+        return;
+      }
+      if (res.status === 403) {
+        // Not cached, and fetching it from Instagram needs a signed-in visitor
+        setCursor(null);
+        return;
+      }
+      if (!res.ok) {
+        setFailed(true);
+        return;
+      }
+      const page = await res.json();
+      setItems((prev) => [...prev, ...page.items]);
+      setCursor(page.nextCursor);
+    } catch {
+      setFailed(true);
+    } finally {
+      setLoading(false);
+    }
+  }, [shortcode, kind, cursor]);
+
+  useEffect(() => {
+    if (enabled && cursor === 0 && items.length === 0 && !loading && !failed) {
+      loadMore();
+    }
+  }, [enabled, cursor, items.length, loading, failed, loadMore]);
+
+  return { items, hasMore: enabled && cursor !== null, loading, loadMore };
+}
+
 export function PostModal({ post, open, onOpenChange }: PostModalProps) {
+  const lazyLikers = usePostEngagement<Liker>(
+    post?.shortcode,
+    "likers",
+    open && !!post && !post.likers?.length && post.likeCount > 0
+  );
+  const lazyComments = usePostEngagement<Comment>(
+    post?.shortcode,
+    "comments",
+    open && !!post && !post.comments?.length && post.commentCount > 0
+  );
+
   if (!post) return null;
 
   const typeLabels: Record<string, string> = {
@@ -52,8 +125,10 @@ export function PostModal({ post, open, onOpenChange }: PostModalProps) {
   const hasMentions = (post.captionMentions?.length || 0) > 0;
   const hasTaggedUsers = (post.taggedUsers?.length || 0) > 0;
   const hasLocation = !!post.location;
-  const hasLikers = (post.likers?.length || 0) > 0;
-  const hasComments = (post.comments?.length || 0) > 0;
+  const likers = post.likers?.length ? post.likers : lazyLikers.items;
+  const comments = post.comments?.length ? post.comments : lazyComments.items;
+  const hasLikers = likers.length > 0;
+  const hasComments = comments.length > 0;
 
   return (
     <Sheet open={open} onOpenChange={onOpenChange}>
@@ -74,6 +149,7 @@ export function PostModal({ post, open, onOpenChange }: PostModalProps) {
               src={post.mediaUrl || post.mediaUrls?.[0] || ""}
               alt={post.caption || "Instagram post"}
               fill
+              unoptimized={isCachedMedia(post.mediaUrl || post.mediaUrls?.[0])}
               className="object-cover"
             />
             {post.isVideo && (
@@ -206,20 +282,23 @@ export function PostModal({ post, open, onOpenChange }: PostModalProps) {
             <Tabs defaultValue="likers" className="w-full">
               <TabsList className="grid w-full grid-cols-2">
                 <TabsTrigger value="likers">
-                  Likers ({post.likers?.length || 0})
+                  Likers ({likers.length})
                 </TabsTrigger>
                 <TabsTrigger value="comments">
-                  Comments ({post.comments?.length || 0})
+                  Comments ({comments.length})
                 </TabsTrigger>
               </TabsList>
               <TabsContent value="likers" className="mt-4">
-                <LikersList likers={post.likers || []} totalLikes={post.likeCount} />
+                <LikersList likers={likers} totalLikes={post.likeCount} />
+                {lazyLikers.hasMore && hasLikers && (
+                  <LoadMoreButton loading={lazyLikers.loading} onClick={lazyLikers.loadMore} />
+                )}
               </TabsContent>
               <TabsContent value="comments" className="mt-4">
-                <CommentsList
-                  comments={post.comments || []}
-                  totalComments={post.commentCount}
-                />
+                <CommentsList comments={comments} totalComments={post.commentCount} />
+                {lazyComments.hasMore && hasComments && (
+                  <LoadMoreButton loading={lazyComments.loading} onClick={lazyComments.loadMore} />
+                )}
               </TabsContent>
             </Tabs>
           ) : (
@@ -233,3 +312,17 @@ export function PostModal({ post, open, onOpenChange }: PostModalProps) {
     </Sheet>
   );
 }
+
+function LoadMoreButton({ loading, onClick }: { loading: boolean; onClick: () => void }) {
+  return (
+    <Button
+      variant="ghost"
+      size="sm"
+      className="w-full text-xs mt-2"
+      disabled={loading}
+      onClick={onClick}
+    >
+      {loading ? "Loading..." : "Load more"}
+    </Button>
+  );
+}
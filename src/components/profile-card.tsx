@@ -3,6 +3,7 @@ import { Card, CardContent, CardHeader } from "@/components/ui/card";
 import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
 import { Badge } from "@/components/ui/badge";
 import type { Profile } from "@/lib/ig/schema";
+import { mediaSrc } from "@/lib/media";
 
 interface ProfileCardProps {
   profile: Profile;
@@ -19,7 +20,7 @@ export function ProfileCard({ profile }: ProfileCardProps) {
     <Card>
       <CardHeader className="flex flex-row items-center gap-4">
         <Avatar className="h-16 w-16">
-          <AvatarImage src={profile.profilePicUrl} alt={profile.username} />
+          <AvatarImage src={mediaSrc(profile.profilePicUrl, 64)} alt={profile.username} />
           <AvatarFallback>{initials}</AvatarFallback>
         </Avatar>
         <div className="flex-1">
@@ -5,10 +5,28 @@ import { Button } from "@/components/ui/button";
 import { RefreshCw, Check, AlertCircle, Clock } from "lucide-react";
 import { cn } from "@/lib/utils";
 
+interface StageProgress {
+  state: "running" | "done" | "checkpointed" | "deferred" | "fresh" | "failed";
+  done: number;
+  total: number | null;
+  published?: boolean;
+}
+
 interface RefreshStatus {
-  status: "idle" | "running" | "complete" | `error:${string}`;
+  status: "idle" | "queued" | "running" | "complete" | `error:${string}`;
   isStale: boolean;
   lastRefresh: string | null;
+  progress?: {
+    stages: Record<string, StageProgress>;
+  } | null;
+}
+
+function formatProgress(stages: Record<string, StageProgress>): string | null {
+  const running = Object.entries(stages).filter(([, stage]) => stage.state === "running");
+  if (running.length === 0) return null;
+  return running
+    .map(([name, stage]) => (stage.total ? `${name} ${stage.done}/${stage.total}` : name))
+    .join(", ");
 }
 
 function formatTimeAgo(dateString: string): string {
@@ -50,7 +68,7 @@ export function RefreshButton({ className }: { className?: string }) {
 
     const interval = setInterval(async () => {
       const currentStatus = await fetchStatus();
-      if (currentStatus && currentStatus !== "running") {
+      if (currentStatus && currentStatus !== "running" && currentStatus !== "queued") {
         setIsRefreshing(false);
         if (currentStatus === "complete") {
           window.location.reload();
@@ -72,13 +90,15 @@ export function RefreshButton({ className }: { className?: string }) {
       const data = await res.json();
 
       if (!res.ok) {
-        if (res.status === 409) {
-          // Already running
-          return;
-        }
         throw new Error(data.error || "Failed to trigger refresh");
       }
 
+      if (res.status === 202) {
+        // Job queued (or joined); keep polling until it finishes
+        setStatus((prev) => (prev ? { ...prev, status: "queued" } : prev));
+        return;
+      }
+
       if (data.status === "fresh") {
         setIsRefreshing(false);
         setStatus({
@@ -93,9 +113,11 @@ export function RefreshButton({ className }: { className?: string }) {
     }
   };
 
-  const isRunning = isRefreshing || status?.status === "running";
+  const isRunning = isRefreshing || status?.status === "running" || status?.status === "queued";
   const isComplete = status?.status === "complete";
   const hasError = error || status?.status?.startsWith("error:");
+  const progressText =
+    isRunning && status?.progress ? formatProgress(status.progress.stages) : null;
 
   return (
     <div className={cn("flex flex-col items-end gap-1", className)}>
@@ -128,6 +150,11 @@ export function RefreshButton({ className }: { className?: string }) {
           </>
         )}
       </Button>
+      {progressText && (
+        <p className="text-xs text-muted-foreground max-w-[200px] truncate">
+          {progressText}
+        </p>
+      )}
       {status?.lastRefresh && (
         <div className="flex items-center gap-1 text-xs text-muted-foreground">
           <Clock className="h-3 w-3" />
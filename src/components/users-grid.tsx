@@ -5,6 +5,7 @@ import { Avatar, AvatarFallback, AvatarImage } from "@/components/ui/avatar";
 import { Input } from "@/components/ui/input";
 import { Search, Shield, BadgeCheck } from "lucide-react";
 import type { Follower } from "@/lib/ig/schema";
+import { mediaSrc } from "@/lib/media";
 
 interface UsersGridProps {
   users: Follower[];
@@ -83,7 +84,7 @@ export function UsersGrid({ users, title, emptyMessage = "No users found" }: Use
             >
               <Avatar className="h-10 w-10">
                 <AvatarImage
-                  src={user.profilePicUrl ?? undefined}
+                  src={mediaSrc(user.profilePicUrl, 40)}
                   alt={user.username}
                 />
                 <AvatarFallback>
@@ -1,4 +1,5 @@
 import Redis from "ioredis";
+import { inflateSync } from "zlib";
 
 const IG_USERNAME = process.env.IG_USERNAME || "anipottsbuilds";
 const CACHE_TTL = parseInt(process.env.CACHE_TTL_SECONDS || "3600", 10);
@@ -23,18 +24,105 @@ export const keys = {
   posts: () => `ig:posts:${IG_USERNAME}`,
   followers: () => `ig:followers:${IG_USERNAME}`,
   following: () => `ig:following:${IG_USERNAME}`,
+  users: () => `ig:users:${IG_USERNAME}`,
+  stats: () => `ig:stats:${IG_USERNAME}`,
+  churn: (kind: FollowKind) => `ig:churn:${kind}:${IG_USERNAME}`,
+  engagement: () => `ig:engagement:${IG_USERNAME}`,
+  topFans: () => `ig:top_fans:${IG_USERNAME}`,
+  engagedNonFollowers: () => `ig:engaged_nonfollowers:${IG_USERNAME}`,
+  silentFollowers: () => `ig:silent_followers:${IG_USERNAME}`,
   lastRefresh: () => `ig:last_refresh:${IG_USERNAME}`,
   refreshStatus: () => `ig:refresh_status`,
+  refreshLock: () => `ig:refresh_lock`,
+  refreshProgress: () => `ig:refresh_progress`,
+  refreshedAt: () => `ig:refreshed_at:${IG_USERNAME}`,
+  refreshJob: (id: string) => `ig:refresh_job:${id}`,
+  latestRefreshJob: () => `ig:refresh_job:latest`,
+  media: (digest: string) => `ig:media:${digest}`,
 };
 
-export type RefreshStatus = "idle" | "running" | "complete" | `error:${string}`;
+export type FollowKind = "followers" | "following";
+
+export type RefreshStatus = "idle" | "queued" | "running" | "complete" | `error:${string}`;
+
+// Written by the refresh lease heartbeat in api/_lease.py
+export interface StageProgress {
+  state: "running" | "done" | "checkpointed" | "deferred" | "fresh" | "failed";
+  done: number;
+  total: number | null;
+  // Stage data (possibly partial, e.g. the post listing) is readable
+  published?: boolean;
+}
+
+export interface RefreshProgress {
+  startedAt: string;
+  heartbeatAt: string | null;
+  stage: string | string[] | null;
+  stages: Record<string, StageProgress>;
+}
+
+// Refresh job record written by api/_jobs.py
+export interface RefreshJob {
+  id: string;
+  status: "queued" | "running" | "complete" | "skipped" | `error:${string}`;
+  accounts: string[];
+  createdAt: string;
+  startedAt: string | null;
+  finishedAt: string | null;
+  // Batch jobs name stages "<account>/<stage>"
+  stages: Record<string, StageProgress>;
+  // Per-account outcome, keyed by username
+  result: Record<
+    string,
+    {
+      status: "complete" | `error:${string}`;
+      error?: string;
+      profile?: string;
+      postsCount?: number;
+      followersCount?: number | null;
+      followingCount?: number | null;
+    }
+  > | null;
+  error: string | null;
+}
+
+// Storage envelope written by encode_payload in api/ig-refresh.py:
+// "\0IGE" magic, version byte, codec byte, body. Values without the magic are plain JSON.
+const ENVELOPE_MAGIC = Buffer.from([0x00, 0x49, 0x47, 0x45]);
+const ENVELOPE_VERSION = 1;
+const CODEC_JSON = 0;
+const CODEC_JSON_ZLIB = 1;
+
+function decodePayload<T>(raw: Buffer): T {
+  const header = ENVELOPE_MAGIC.length;
+  if (raw.length < header + 2 || !raw.subarray(0, header).equals(ENVELOPE_MAGIC)) {
+    return JSON.parse(raw.toString("utf8"));
+  }
+
+  const version = raw[header];
+  const codec = raw[header + 1];
+  const body = raw.subarray(header + 2);
+  if (version !== ENVELOPE_VERSION) {
+    throw new Error(`Unsupported storage envelope version ${version}`);
+  }
+  switch (codec) {
+    case CODEC_JSON:
+      return JSON.parse(body.toString("utf8"));
+    case CODEC_JSON_ZLIB:
+      return JSON.parse(inflateSync(body).toString("utf8"));
+    default:
+      throw new Error(
+        `Unsupported storage codec ${codec}; set STORAGE_FORMAT to json or json+zlib`
+      );
+  }
+}
 
 // Generic cache operations
 export async function getCachedData<T>(key: string): Promise<T | null> {
   try {
     const redis = getRedis();
-    const data = await redis.get(key);
-    return data ? JSON.parse(data) : null;
+    const data = await redis.getBuffer(key);
+    return data ? decodePayload<T>(data) : null;
   } catch (error) {
     console.error(`Failed to get cached data for ${key}:`, error);
     return null;
@@ -56,6 +144,211 @@ export async function setCachedData<T>(
   }
 }
 
+// Chunked lists (written by store_list in api/ig-refresh.py)
+interface ListManifest {
+  count: number;
+  chunkSize: number;
+  chunks: string[];
+  // Content hashes per chunk and of the whole list; version bumps when it changes
+  hashes?: string[];
+  hash?: string;
+  version?: number;
+  updatedAt: string;
+}
+
+export interface ListPage<T> {
+  items: T[];
+  total: number;
+  offset: number;
+  limit: number;
+}
+
+const manifestKey = (key: string) => `${key}:manifest`;
+const chunkKey = (key: string, chunkId: string) => `${key}:chunk:${chunkId}`;
+
+async function getListManifest(redis: Redis, key: string): Promise<ListManifest | null> {
+  const data = await redis.get(manifestKey(key));
+  return data ? JSON.parse(data) : null;
+}
+
+async function getChunks<T>(redis: Redis, key: string, chunkIds: string[]): Promise<T[] | null> {
+  if (chunkIds.length === 0) return [];
+  const chunks = await redis.mgetBuffer(...chunkIds.map((id) => chunkKey(key, id)));
+  const items: T[] = [];
+  for (const chunk of chunks) {
+    // A missing chunk means the manifest was swapped mid-read
+    if (chunk === null) return null;
+    items.push(...decodePayload<T[]>(chunk));
+  }
+  return items;
+}
+
+export async function getCachedList<T>(key: string): Promise<T[] | null> {
+  try {
+    const redis = getRedis();
+    const manifest = await getListManifest(redis, key);
+    if (!manifest) {
+      // Fall back to lists stored as a single JSON blob
+      return getCachedData<T[]>(key);
+    }
+    return getChunks<T>(redis, key, manifest.chunks);
+  } catch (error) {
+    console.error(`Failed to get cached list for ${key}:`, error);
+    return null;
+  }
+}
+
+export async function getCachedListPage<T>(
+  key: string,
+  offset: number,
+  limit: number
+): Promise<ListPage<T> | null> {
+  try {
+    const redis = getRedis();
+    const manifest = await getListManifest(redis, key);
+    if (!manifest) {
+      const items = await getCachedData<T[]>(key);
+      if (!items) return null;
+      return { items: items.slice(offset, offset + limit), total: items.length, offset, limit };
+    }
+
+    // Only fetch the chunks that overlap the requested range
+    const first = Math.floor(offset / manifest.chunkSize);
+    const last = Math.floor((offset + limit - 1) / manifest.chunkSize);
+    const items = await getChunks<T>(redis, key, manifest.chunks.slice(first, last + 1));
+    if (!items) return null;
+
+    const start = offset - first * manifest.chunkSize;
+    return {
+      items: items.slice(start, start + limit),
+      total: manifest.count,
+      offset,
+      limit,
+    };
+  } catch (error) {
+    console.error(`Failed to get cached list page for ${key}:`, error);
+    return null;
+  }
+}
+
+// Content hash of a stored payload (manifest hash for chunked lists, {key}:meta
+// for values written by store_data), for ETags. With users, the user table
+// version is included since user ids are expanded into the response.
+export async function getContentTag(
+  key: string,
+  options: { users?: boolean } = {}
+): Promise<string | null> {
+  try {
+    const redis = getRedis();
+    const [manifest, hash, usersVersion] = await Promise.all([
+      getListManifest(redis, key),
+      redis.hget(`${key}:meta`, "hash"),
+      options.users ? redis.hget(`${keys.users()}:meta`, "version") : null,
+    ]);
+    const content = manifest ? manifest.hash : hash;
+    if (!content) return null;
+    return usersVersion ? `${content}.${usersVersion}` : content;
+  } catch (error) {
+    console.error(`Failed to get content tag for ${key}:`, error);
+    return null;
+  }
+}
+
+// Interned users (ig:users rows are [username, fullName, profilePicUrl, isVerified, isPrivate])
+export interface CachedUser {
+  username: string;
+  fullName: string | null;
+  profilePicUrl: string | null;
+  isVerified: boolean;
+  isPrivate: boolean;
+}
+
+type UserRow = [string, string | null, string | null, boolean, boolean];
+
+interface CompactComment {
+  ownerId?: number;
+  replies?: CompactComment[];
+  [field: string]: unknown;
+}
+
+interface CompactPost {
+  likerIds?: number[];
+  comments?: CompactComment[];
+  [field: string]: unknown;
+}
+
+async function getUsers(redis: Redis, ids: Iterable<number>): Promise<Map<number, CachedUser>> {
+  const unique = [...new Set(ids)];
+  const users = new Map<number, CachedUser>();
+  if (unique.length === 0) return users;
+
+  const rows = await redis.hmget(keys.users(), ...unique.map(String));
+  rows.forEach((row, i) => {
+    if (!row) return;
+    const [username, fullName, profilePicUrl, isVerified, isPrivate] = JSON.parse(row) as UserRow;
+    users.set(unique[i], { username, fullName, profilePicUrl, isVerified, isPrivate });
+  });
+  return users;
+}
+
+const UNKNOWN_USER: CachedUser = {
+  username: "unknown",
+  fullName: null,
+  profilePicUrl: null,
+  isVerified: false,
+  isPrivate: false,
+};
+
+// Resolve a list of user ids; lists stored before interning hold user objects already
+async function hydrateUserList(items: unknown[]): Promise<unknown[]> {
+  const ids = items.filter((item): item is number => typeof item === "number");
+  if (ids.length === 0) return items;
+
+  const users = await getUsers(getRedis(), ids);
+  return items.flatMap((item) => {
+    if (typeof item !== "number") return [item];
+    const user = users.get(item);
+    return user ? [user] : [];
+  });
+}
+
+// Expand likerIds and comment/reply ownerIds back into user objects
+async function hydratePosts(posts: CompactPost[]): Promise<CompactPost[]> {
+  const ids: number[] = [];
+  const collect = (comment: CompactComment) => {
+    if (comment.ownerId !== undefined) ids.push(comment.ownerId);
+    (comment.replies || []).forEach(collect);
+  };
+  for (const post of posts) {
+    ids.push(...(post.likerIds || []));
+    (post.comments || []).forEach(collect);
+  }
+  if (ids.length === 0) return posts;
+
+  const users = await getUsers(getRedis(), ids);
+  const expand = (comment: CompactComment): CompactComment => {
+    if (comment.ownerId === undefined) return comment;
+    const { ownerId, replies, ...rest } = comment;
+    return {
+      ...rest,
+      owner: users.get(ownerId) || UNKNOWN_USER,
+      replies: (replies || []).map(expand),
+    };
+  };
+  return posts.map((post) => {
+    if (!post.likerIds) return post;
+    const { likerIds, comments, ...rest } = post;
+    return {
+      ...rest,
+      likers: likerIds.flatMap((id) => {
+        const user = users.get(id);
+        return user ? [user] : [];
+      }),
+      comments: (comments || []).map(expand),
+    };
+  });
+}
+
 export async function deleteCachedData(key: string): Promise<boolean> {
   try {
     const redis = getRedis();
@@ -116,21 +409,248 @@ export async function setRefreshStatus(status: RefreshStatus): Promise<void> {
   await redis.setex(keys.refreshStatus(), 300, status);
 }
 
+// True while a refresh holds the lease (the lock expires if its heartbeat stops)
+export async function isRefreshLocked(): Promise<boolean> {
+  try {
+    const redis = getRedis();
+    return (await redis.exists(keys.refreshLock())) === 1;
+  } catch (error) {
+    console.error("Failed to check refresh lock:", error);
+    return false;
+  }
+}
+
+export async function getRefreshProgress(): Promise<RefreshProgress | null> {
+  try {
+    const redis = getRedis();
+    const progress = await redis.get(keys.refreshProgress());
+    return progress ? (JSON.parse(progress) as RefreshProgress) : null;
+  } catch (error) {
+    console.error("Failed to get refresh progress:", error);
+    return null;
+  }
+}
+
+// Last refresh time (epoch seconds) per entity, written by api/_cadence.py
+export async function getEntityRefreshTimes(): Promise<Record<string, number>> {
+  try {
+    const redis = getRedis();
+    const times = await redis.hgetall(keys.refreshedAt());
+    return Object.fromEntries(Object.entries(times).map(([entity, at]) => [entity, parseFloat(at)]));
+  } catch (error) {
+    console.error("Failed to get entity refresh times:", error);
+    return {};
+  }
+}
+
+// A refresh job by id, or the most recently created one
+export async function getRefreshJob(id?: string): Promise<RefreshJob | null> {
+  try {
+    const redis = getRedis();
+    const jobId = id || (await redis.get(keys.latestRefreshJob()));
+    if (!jobId) return null;
+    const job = await redis.get(keys.refreshJob(jobId));
+    return job ? (JSON.parse(job) as RefreshJob) : null;
+  } catch (error) {
+    console.error("Failed to get refresh job:", error);
+    return null;
+  }
+}
+
 // Convenience functions for Instagram data
 export async function getCachedProfile() {
   return getCachedData(keys.profile());
 }
 
+export async function getCachedStats() {
+  return getCachedData(keys.stats());
+}
+
 export async function getCachedPosts() {
-  return getCachedData(keys.posts());
+  try {
+    const posts = await getCachedList<CompactPost>(keys.posts());
+    return posts ? await hydratePosts(posts) : null;
+  } catch (error) {
+    console.error("Failed to hydrate cached posts:", error);
+    return null;
+  }
+}
+
+async function getCachedUserList(key: string) {
+  try {
+    const items = await getCachedList<unknown>(key);
+    return items ? await hydrateUserList(items) : null;
+  } catch (error) {
+    console.error(`Failed to hydrate cached users for ${key}:`, error);
+    return null;
+  }
+}
+
+async function getCachedUserListPage(key: string, offset: number, limit: number) {
+  try {
+    const page = await getCachedListPage<unknown>(key, offset, limit);
+    return page ? { ...page, items: await hydrateUserList(page.items) } : null;
+  } catch (error) {
+    console.error(`Failed to hydrate cached users for ${key}:`, error);
+    return null;
+  }
 }
 
 export async function getCachedFollowers() {
-  return getCachedData(keys.followers());
+  return getCachedUserList(keys.followers());
 }
 
 export async function getCachedFollowing() {
-  return getCachedData(keys.following());
+  return getCachedUserList(keys.following());
+}
+
+export async function getCachedFollowersPage(offset: number, limit: number) {
+  return getCachedUserListPage(keys.followers(), offset, limit);
+}
+
+export async function getCachedFollowingPage(offset: number, limit: number) {
+  return getCachedUserListPage(keys.following(), offset, limit);
+}
+
+// Follower churn (ig:churn:{kind} is a sorted set of diffs scored by refresh time)
+export interface ChurnUser extends Partial<CachedUser> {
+  id: number;
+}
+
+export interface ChurnEntry {
+  at: string;
+  gained: ChurnUser[];
+  lost: ChurnUser[];
+}
+
+export async function getCachedChurn(
+  kind: FollowKind,
+  limit: number = 1,
+  since?: Date
+): Promise<ChurnEntry[] | null> {
+  try {
+    const redis = getRedis();
+    const entries = since
+      ? await redis.zrevrangebyscore(
+          keys.churn(kind),
+          "+inf",
+          since.getTime() / 1000,
+          "LIMIT",
+          0,
+          limit
+        )
+      : await redis.zrevrange(keys.churn(kind), 0, limit - 1);
+    return entries.map((entry) => JSON.parse(entry) as ChurnEntry);
+  } catch (error) {
+    console.error(`Failed to get ${kind} churn:`, error);
+    return null;
+  }
+}
+
+// Engagement index (written by api/_engagement.py), keyed by compact user id
+export interface UserEngagement {
+  // Shortcodes of the posts the user liked / commented or replied on
+  liked: string[];
+  commented: string[];
+  comments: number;
+  replies: number;
+}
+
+export interface RankedUser extends Partial<CachedUser> {
+  id: number;
+  score: number;
+}
+
+async function getRankedUsers(key: string, limit: number): Promise<RankedUser[] | null> {
+  try {
+    const redis = getRedis();
+    const entries = await redis.zrevrange(key, 0, limit - 1, "WITHSCORES");
+    const ranked: { id: number; score: number }[] = [];
+    for (let i = 0; i < entries.length; i += 2) {
+      ranked.push({ id: parseInt(entries[i], 10), score: parseFloat(entries[i + 1]) });
+    }
+    const users = await getUsers(redis, ranked.map(({ id }) => id));
+    return ranked.map((entry) => ({ ...users.get(entry.id), ...entry }));
+  } catch (error) {
+    console.error(`Failed to get ranked users for ${key}:`, error);
+    return null;
+  }
+}
+
+// Users ranked by weighted likes, comments and replies across all posts
+export async function getTopFans(limit: number) {
+  return getRankedUsers(keys.topFans(), limit);
+}
+
+// Top fans who are not in the last complete followers list
+export async function getEngagedNonFollowers(limit: number) {
+  return getRankedUsers(keys.engagedNonFollowers(), limit);
+}
+
+// Followers with no likes, comments or replies on any stored post (unordered; paged by SSCAN cursor)
+export async function getSilentFollowers(
+  cursor: string,
+  limit: number
+): Promise<{ users: ChurnUser[]; cursor: string; total: number } | null> {
+  try {
+    const redis = getRedis();
+    const [[next, ids], total] = await Promise.all([
+      redis.sscan(keys.silentFollowers(), cursor, "COUNT", limit),
+      redis.scard(keys.silentFollowers()),
+    ]);
+    const numericIds = ids.map((id) => parseInt(id, 10));
+    const users = await getUsers(redis, numericIds);
+    return {
+      users: numericIds.map((id) => ({ ...users.get(id), id })),
+      cursor: next,
+      total,
+    };
+  } catch (error) {
+    console.error("Failed to get silent followers:", error);
+    return null;
+  }
+}
+
+export async function getUserEngagement(
+  id: number
+): Promise<(UserEngagement & Partial<CachedUser> & { id: number }) | null> {
+  try {
+    const redis = getRedis();
+    const [row, users] = await Promise.all([
+      redis.hget(keys.engagement(), String(id)),
+      getUsers(redis, [id]),
+    ]);
+    if (!row) return null;
+    return { ...users.get(id), id, ...(JSON.parse(row) as UserEngagement) };
+  } catch (error) {
+    console.error(`Failed to get engagement for user ${id}:`, error);
+    return null;
+  }
+}
+
+// An image from the media cache (api/_media.py): the `width` px WebP thumbnail
+// if one was stored, else the original
+export async function getMedia(
+  digest: string,
+  width: number | null
+): Promise<{ body: Buffer; type: string; variant: string } | null> {
+  try {
+    const redis = getRedis();
+    const [type, original, thumbnail] = await redis.hmgetBuffer(
+      keys.media(digest),
+      "type",
+      "orig",
+      `w${width ?? 0}`
+    );
+    if (width && thumbnail) {
+      return { body: thumbnail, type: "image/webp", variant: `w${width}` };
+    }
+    if (!type || !original) return null;
+    return { body: original, type: type.toString(), variant: "orig" };
+  } catch (error) {
+    console.error(`Failed to get media ${digest}:`, error);
+    return null;
+  }
 }
 
 // Check if any data exists in cache
@@ -0,0 +1,35 @@
+import { NextRequest, NextResponse } from "next/server";
+
+// Browsers keep the response but revalidate it on every use; unchanged data
+// comes back as an empty 304
+const CACHE_CONTROL = "private, no-cache";
+
+// Strong ETag from content tags (see getContentTag); null if any part is unknown
+export function makeETag(...parts: (string | number | boolean | null)[]): string | null {
+  if (parts.some((part) => part === null)) return null;
+  return `"${parts.join("-")}"`;
+}
+
+// 304 when the client's copy matches the current ETag
+export function notModified(request: NextRequest, etag: string | null): NextResponse | null {
+  if (!etag) return null;
+  const ifNoneMatch = request.headers.get("if-none-match");
+  if (!ifNoneMatch) return null;
+  const matches = ifNoneMatch.split(",").some((tag) => {
+    const value = tag.trim();
+    return value === "*" || value === etag || value === `W/${etag}`;
+  });
+  if (!matches) return null;
+  return new NextResponse(null, {
+    status: 304,
+    headers: { ETag: etag, "Cache-Control": CACHE_CONTROL },
+  });
+}
+
+export function withETag(response: NextResponse, etag: string | null): NextResponse {
+  if (etag) {
+    response.headers.set("ETag", etag);
+    response.headers.set("Cache-Control", CACHE_CONTROL);
+  }
+  return response;
+}
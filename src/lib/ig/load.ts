@@ -2,13 +2,16 @@ import {
   ProfileSchema,
   PostsArraySchema,
   FollowersArraySchema,
+  InsightsSchema,
   type Profile,
   type Post,
   type Follower,
+  type Insights,
 } from "./schema";
 import {
   getCachedProfile,
   getCachedPosts,
+  getCachedStats,
   getCachedFollowers,
   getCachedFollowing,
   getLastRefreshTime,
@@ -115,6 +118,21 @@ export async function loadFollowingSafe(): Promise<Follower[]> {
   }
 }
 
+/**
+ * Load insights precomputed by the refresh.
+ * Returns null if not cached yet or validation fails.
+ */
+export async function loadInsightsSafe(): Promise<Insights | null> {
+  try {
+    const data = await getCachedStats();
+    if (!data) return null;
+    return InsightsSchema.parse(data);
+  } catch (error) {
+    console.error("Failed to load insights:", error);
+    return null;
+  }
+}
+
 /**
  * Get cache status information.
  */
@@ -177,6 +177,95 @@ export type PostsArray = z.infer<typeof PostsArraySchema>;
 export const FollowersArraySchema = z.array(FollowerSchema);
 export type FollowersArray = z.infer<typeof FollowersArraySchema>;
 
+/**
+ * Schema for insights precomputed at refresh time (ig:stats:{username})
+ */
+const PostSummarySchema = PostSchema.pick({
+  id: true,
+  shortcode: true,
+  typename: true,
+  mediaType: true,
+  caption: true,
+  timestamp: true,
+  likeCount: true,
+  commentCount: true,
+});
+
+const BucketSchema = z.object({ count: z.number(), avgLikes: z.number() });
+
+export const InsightsSchema = z.object({
+  generatedAt: z.string(),
+  profile: z
+    .object({
+      username: z.string(),
+      followersCount: z.number(),
+      followingCount: z.number(),
+      postsCount: z.number(),
+    })
+    .nullable(),
+  engagement: z
+    .object({
+      totalLikes: z.number(),
+      totalComments: z.number(),
+      totalVideoViews: z.number(),
+      avgLikesPerPost: z.number(),
+      avgCommentsPerPost: z.number(),
+      medianLikes: z.number(),
+      engagementRate: z.number(),
+    })
+    .nullable(),
+  content: z
+    .object({
+      totalPosts: z.number(),
+      imagePosts: z.number(),
+      videoPosts: z.number(),
+      carouselPosts: z.number(),
+      postsWithLocation: z.number(),
+      topHashtags: z.array(z.object({ tag: z.string(), count: z.number() })),
+    })
+    .nullable(),
+  timing: z
+    .object({
+      postsByDayOfWeek: z.record(z.string(), z.number()),
+      postsByHour: z.record(z.string(), z.number()),
+      bestDayToPost: z.string(),
+      bestHourToPost: z.number(),
+    })
+    .nullable(),
+  engagementTiming: z
+    .object({
+      byDay: z.array(BucketSchema.extend({ day: z.string() })),
+      byHour: z.array(BucketSchema.extend({ hour: z.number() })),
+      bestDay: z.string().nullable(),
+      bestHour: z.number().nullable(),
+    })
+    .nullable(),
+  hashtags: z.array(z.object({ tag: z.string(), count: z.number(), avgLikes: z.number() })),
+  postsByMonth: z.array(z.object({ month: z.string(), count: z.number() })),
+  topPostsByLikes: z.array(PostSummarySchema),
+  topPostsByComments: z.array(PostSummarySchema),
+  mediaTypes: z.record(
+    z.string(),
+    z.object({
+      count: z.number(),
+      medianLikes: z.number(),
+      medianComments: z.number(),
+      medianVideoViews: z.number().nullable(),
+    })
+  ),
+  rollingEngagement: z.array(
+    z.object({
+      shortcode: z.string(),
+      timestamp: z.string(),
+      engagementRate: z.number(),
+      rollingEngagementRate: z.number(),
+    })
+  ),
+});
+
+export type Insights = z.infer<typeof InsightsSchema>;
+export type PostSummary = z.infer<typeof PostSummarySchema>;
+
 /**
  * Schema for the complete Instagram data set
  */
@@ -0,0 +1,18 @@
+// Images served from the media cache (api/_media.py) instead of the Instagram CDN
+export const MEDIA_PREFIX = "/api/media/";
+
+// Thumbnail widths the refresh stores (MEDIA_THUMBNAIL_SIZES defaults)
+const THUMBNAIL_SIZES = [64, 320];
+
+export function isCachedMedia(url: string | null | undefined): boolean {
+  return !!url && url.startsWith(MEDIA_PREFIX);
+}
+
+// Smallest cached thumbnail at least `width` px wide; the original for larger
+// widths, and CDN URLs as they are
+export function mediaSrc(url: string | null | undefined, width?: number): string | undefined {
+  if (!url) return undefined;
+  if (!width || !isCachedMedia(url)) return url;
+  const size = THUMBNAIL_SIZES.find((candidate) => candidate >= width);
+  return size ? `${url}?w=${size}` : url;
+}
@@ -0,0 +1,45 @@
+"""Shared fixtures: api/ig-refresh.py as a module and an in-memory Redis."""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+
+@pytest.fixture(scope="session")
+def refresh():
+    """Import api/ig-refresh.py (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("ig_refresh", ROOT / "api" / "ig-refresh.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def r():
+    """A decode_responses fakeredis client with an empty server per test."""
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+@pytest.fixture
+def instagram():
+    """A small synthetic account (scripts/fake_instagram.py) served to instaloader while the test runs."""
+    from fake_instagram import FakeInstagram
+
+    fake = FakeInstagram(posts=6, likers=8, comments=4, replies=1, followers=40, following=30)
+    with fake.installed():
+        yield fake
+
+
+@pytest.fixture
+def loader(refresh, instagram):
+    """A loader for the fake account whose rate-limit waits are simulated (see scripts/bench_refresh.py)."""
+    from bench_refresh import SimulatedWait, create_bench_loader
+
+    return create_bench_loader(refresh, instagram, SimulatedWait())
@@ -0,0 +1,41 @@
+"""Follower churn diffs (api/_churn.py)."""
+
+import json
+
+from _churn import history_key, latest_churn, record_churn, snapshot_key, track_ids
+
+FIELDS = ("username", "fullName")
+USERS = "ig:users:alice"
+NEXT = "ig:followers_ids:alice:next"
+
+
+def snapshot(r, ids, complete=True):
+    assert list(track_ids(r, NEXT, ids, batch=2)) == list(ids)
+    return record_churn(r, "alice", "followers", NEXT, USERS, FIELDS, complete)
+
+
+def test_gained_and_lost(r):
+    r.hset(USERS, mapping={"1": json.dumps(["one", "One"]), "4": json.dumps(["four", "Four"])})
+    assert snapshot(r, ["1", "2", "3"]) is None
+    assert r.smembers(snapshot_key("alice", "followers")) == {"1", "2", "3"}
+
+    entry = snapshot(r, ["2", "3", "4", "5"])
+    assert entry["gained"] == [{"id": 4, "username": "four", "fullName": "Four"}, {"id": 5}]
+    assert entry["lost"] == [{"id": 1, "username": "one", "fullName": "One"}]
+    assert latest_churn(r, "alice", "followers") == entry
+    assert r.smembers(snapshot_key("alice", "followers")) == {"2", "3", "4", "5"}
+    assert not r.exists(NEXT)
+
+
+def test_unchanged_list_records_empty_entry(r):
+    snapshot(r, ["1", "2"])
+    entry = snapshot(r, ["2", "1"])
+    assert entry["gained"] == [] and entry["lost"] == []
+
+
+def test_truncated_list_is_not_diffed(r):
+    snapshot(r, ["1", "2", "3"])
+    assert snapshot(r, ["1"], complete=False) is None
+    assert r.zcard(history_key("alice", "followers")) == 0
+    assert r.smembers(snapshot_key("alice", "followers")) == {"1", "2", "3"}
+    assert not r.exists(NEXT)
@@ -0,0 +1,42 @@
+"""Storage envelope encoding (encode_payload/decode_payload) in api/ig-refresh.py."""
+
+import json
+
+import pytest
+
+PAYLOAD = {"username": "alice", "posts": [{"shortcode": "abc", "likes": 3, "caption": "héllo"}], "count": None}
+
+
+@pytest.mark.parametrize("fmt", ["json", "json+zlib", "json+zstd", "msgpack", "msgpack+zlib", "msgpack+zstd"])
+def test_round_trip(refresh, fmt):
+    if "msgpack" in fmt and refresh.msgpack is None:
+        pytest.skip("msgpack not installed")
+    if "zstd" in fmt and refresh.zstandard is None:
+        pytest.skip("zstandard not installed")
+    raw = refresh.encode_payload(PAYLOAD, fmt)
+    assert raw.startswith(refresh.ENVELOPE_MAGIC)
+    assert raw[len(refresh.ENVELOPE_MAGIC) + 1] == refresh.STORAGE_CODECS[fmt]
+    assert refresh.decode_payload(raw) == PAYLOAD
+
+
+def test_legacy_raw_json(refresh):
+    assert refresh.decode_payload(json.dumps(PAYLOAD)) == PAYLOAD
+    assert refresh.decode_payload(json.dumps(PAYLOAD).encode()) == PAYLOAD
+    assert refresh.decode_payload(None) is None
+
+
+def test_unknown_format(refresh):
+    with pytest.raises(ValueError):
+        refresh.encode_payload(PAYLOAD, "yaml")
+
+
+def test_unsupported_envelope_version(refresh):
+    raw = refresh.ENVELOPE_MAGIC + bytes([refresh.ENVELOPE_VERSION + 1, 0]) + b"{}"
+    with pytest.raises(ValueError):
+        refresh.decode_payload(raw)
+
+
+def test_store_data_writes_envelope(refresh, r):
+    assert refresh.store_data(r, "ig:profile:alice", PAYLOAD)
+    raw = refresh.binary_client(r).get("ig:profile:alice")
+    assert refresh.decode_payload(raw) == PAYLOAD
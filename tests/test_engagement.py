@@ -0,0 +1,72 @@
+"""Engagement graph index and follower joins (api/_engagement.py)."""
+
+import json
+
+from _churn import snapshot_key
+from _engagement import (
+    COMMENT_WEIGHT,
+    LIKE_WEIGHT,
+    REPLY_WEIGHT,
+    fans_key,
+    index_key,
+    nonfollowers_key,
+    refresh_follower_joins,
+    silent_key,
+    update_engagement_index,
+)
+
+OWNER = 1
+POSTS = [
+    {"shortcode": "p1", "likerIds": [10, 11, 12], "comments": [
+        {"ownerId": 11, "replies": [{"ownerId": OWNER}, {"ownerId": 12}]},
+    ]},
+    {"shortcode": "p2", "likerIds": [10], "comments": [{"ownerId": 13, "replies": []}]},
+]
+
+
+def top_fans(r):
+    return r.zrevrange(fans_key("alice"), 0, -1, withscores=True)
+
+
+def test_top_fans(r):
+    assert update_engagement_index(r, "alice", POSTS, exclude=OWNER) == {"posts": 2, "users": 4}
+    scores = dict(top_fans(r))
+    assert scores == {
+        "10": 2 * LIKE_WEIGHT,
+        "11": LIKE_WEIGHT + COMMENT_WEIGHT,
+        "12": LIKE_WEIGHT + REPLY_WEIGHT,
+        "13": COMMENT_WEIGHT,
+    }
+    assert str(OWNER) not in scores
+    row = json.loads(r.hget(index_key("alice"), "10"))
+    assert sorted(row["liked"]) == ["p1", "p2"]
+
+
+def test_only_changed_posts_are_applied(r):
+    update_engagement_index(r, "alice", POSTS, exclude=OWNER)
+    assert update_engagement_index(r, "alice", POSTS, exclude=OWNER) == {"posts": 0, "users": 0}
+
+    # p2 dropped: 13 only engaged there, 10 keeps p1
+    assert update_engagement_index(r, "alice", POSTS[:1], exclude=OWNER) == {"posts": 1, "users": 2}
+    scores = dict(top_fans(r))
+    assert "13" not in scores
+    assert scores["10"] == LIKE_WEIGHT
+    assert not r.hexists(index_key("alice"), "13")
+
+
+def test_nonfollowers_and_silent_followers(r):
+    update_engagement_index(r, "alice", POSTS, exclude=OWNER)
+    assert refresh_follower_joins(r, "alice") is None
+
+    r.sadd(snapshot_key("alice", "followers"), "10", "11", "20", "21")
+    assert refresh_follower_joins(r, "alice") == {"engagedNonFollowers": 2, "silentFollowers": 2}
+    assert dict(r.zrange(nonfollowers_key("alice"), 0, -1, withscores=True)) == {
+        "12": LIKE_WEIGHT + REPLY_WEIGHT,
+        "13": COMMENT_WEIGHT,
+    }
+    assert r.smembers(silent_key("alice")) == {"20", "21"}
+
+    r.delete(snapshot_key("alice", "followers"))
+    r.sadd(snapshot_key("alice", "followers"), "10", "11", "12", "13")
+    assert refresh_follower_joins(r, "alice") == {"engagedNonFollowers": 0, "silentFollowers": 0}
+    assert not r.exists(nonfollowers_key("alice"), silent_key("alice"))
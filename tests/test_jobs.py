@@ -0,0 +1,66 @@
+"""Refresh job coalescing (api/_jobs.py) and worker dispatch in api/ig-refresh.py."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from _jobs import ACTIVE_KEY, LATEST_KEY, claim_job, create_or_join_job, finish_job, job_key, load_job
+
+
+def test_concurrent_triggers_create_one_job(r):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outcomes = list(pool.map(lambda _: create_or_join_job(r, ["alice"], ["posts"]), range(16)))
+    created = [job for job, was_created in outcomes if was_created]
+    assert len(created) == 1
+    assert {job["id"] for job, _ in outcomes} == {created[0]["id"]}
+    assert r.get(ACTIVE_KEY) == created[0]["id"]
+    # Losing triggers don't leave records behind
+    assert set(r.scan_iter("ig:refresh_job:*")) == {job_key(created[0]["id"]), ACTIVE_KEY, LATEST_KEY}
+
+
+def test_concurrent_claims_run_a_job_once(r):
+    job, _ = create_or_join_job(r, ["alice"], ["posts"])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        claims = list(pool.map(lambda _: claim_job(r, job["id"]), range(16)))
+    assert claims.count(True) == 1
+
+
+def test_stale_pointer_is_taken_over(r):
+    r.set(ACTIVE_KEY, "expired")
+    job, created = create_or_join_job(r, ["alice"], ["posts"])
+    assert created
+    assert r.get(ACTIVE_KEY) == job["id"]
+
+
+def test_finished_job_frees_the_slot(r):
+    first, _ = create_or_join_job(r, ["alice"], ["posts"])
+    finish_job(r, first["id"], "complete")
+    assert load_job(r, first["id"])["status"] == "complete"
+    second, created = create_or_join_job(r, ["alice"], ["posts"])
+    assert created and second["id"] != first["id"]
+
+
+@pytest.fixture
+def handler(refresh, r, monkeypatch):
+    from bench_refresh import BenchHandler
+
+    monkeypatch.setattr(refresh, "get_redis_client", lambda: r)
+    return BenchHandler(refresh.handler)
+
+
+def test_unreachable_worker_fails_the_job(refresh, r, handler, monkeypatch):
+    monkeypatch.setattr(refresh, "REFRESH_WORKER_URL", "http://127.0.0.1:9/api/ig-refresh")
+    monkeypatch.setattr(refresh, "run_job", lambda *args: pytest.fail("job ran inline"))
+    body = handler.post()
+    assert handler.status == 503
+    assert load_job(r, body["jobId"])["status"] == "error:dispatch_failed"
+    assert not r.exists(ACTIVE_KEY)
+
+
+def test_joined_trigger_is_not_dispatched(refresh, r, handler, monkeypatch):
+    active, _ = create_or_join_job(r, ["alice"], ["posts"])
+    monkeypatch.setattr(refresh, "IG_ACCOUNTS", ["alice"])
+    monkeypatch.setattr(refresh, "dispatch_worker", lambda job_id: pytest.fail("dispatched a joined job"))
+    body = handler.post()
+    assert handler.status == 202
+    assert body["jobId"] == active["id"] and body["joined"]
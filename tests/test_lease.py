@@ -0,0 +1,84 @@
+"""Refresh lease ownership (api/_lease.py) and its checks in run_refresh."""
+
+import pytest
+
+import _lease
+from _lease import LOCK_KEY, STATUS_KEY, LeaseLost, RefreshLease
+
+
+@pytest.fixture
+def lease(r):
+    # No heartbeat thread within a test: beats are explicit
+    lease = RefreshLease(r, ttl=30, heartbeat=3600)
+    assert lease.acquire()
+    yield lease
+    lease.release("complete")
+
+
+def test_second_refresh_cannot_acquire(r, lease):
+    assert not RefreshLease(r).acquire()
+
+
+def test_heartbeat_extends_only_own_token(r, lease):
+    r.pexpire(LOCK_KEY, 1000)
+    assert lease.beat()
+    assert r.pttl(LOCK_KEY) > 1000
+
+    r.set(LOCK_KEY, "other", px=1000)
+    assert not lease.beat()
+    assert r.get(LOCK_KEY) == "other"
+    assert r.pttl(LOCK_KEY) <= 1000
+    with pytest.raises(LeaseLost):
+        lease.check()
+
+
+def test_release_keeps_another_holders_lease(r, lease):
+    r.set(LOCK_KEY, "other")
+    assert not lease.release("complete")
+    assert r.get(LOCK_KEY) == "other"
+    assert r.get(STATUS_KEY) != "complete"
+
+
+def test_release_frees_own_lease(r):
+    lease = RefreshLease(r, heartbeat=3600)
+    assert lease.acquire()
+    assert lease.release("complete")
+    assert not r.exists(LOCK_KEY)
+    assert r.get(STATUS_KEY) == "complete"
+
+
+def test_expired_lease_fails_check(lease, monkeypatch):
+    lease.check()
+    now = _lease.time.monotonic()
+    monkeypatch.setattr(_lease.time, "monotonic", lambda: now + lease.ttl)
+    with pytest.raises(LeaseLost):
+        lease.check()
+
+
+def test_expired_lease_stops_the_next_store(refresh, r, loader, lease, monkeypatch):
+    stored = []
+    store_data = refresh.store_data
+
+    def store_then_stall(r, key, data, *args, **kwargs):
+        stored.append(key)
+        written = store_data(r, key, data, *args, **kwargs)
+        # The refresh stalls past its lease TTL and the lock expires
+        now = _lease.time.monotonic()
+        monkeypatch.setattr(_lease.time, "monotonic", lambda: now + lease.ttl)
+        r.delete(LOCK_KEY)
+        return written
+
+    monkeypatch.setattr(refresh, "store_data", store_then_stall)
+    with pytest.raises(LeaseLost):
+        refresh.run_refresh(r, loader, progress=lease, username="alice", entities=["profile"])
+    assert stored == ["ig:profile:alice"]
+    assert not r.exists("ig:stats:alice")
+
+
+def test_taken_over_lease_stops_the_refresh(refresh, r, loader, lease):
+    r.set(LOCK_KEY, "other")
+    assert not lease.beat()
+    with pytest.raises(LeaseLost):
+        refresh.run_refresh(r, loader, progress=lease, username="alice", entities=["profile"])
+    assert not r.exists("ig:profile:alice")
+    assert r.get(LOCK_KEY) == "other"
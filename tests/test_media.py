@@ -0,0 +1,57 @@
+"""Media cache downloads (api/_media.py)."""
+
+import io
+from email.message import Message
+
+import pytest
+
+import _media
+from _media import MediaCache, download, media_key, sniff_type
+from fake_instagram import FakeCDN, solid_png
+
+PNG = solid_png(4, 4, (255, 0, 0))
+
+
+class Response(io.BytesIO):
+    def __init__(self, body: bytes, content_type: str):
+        super().__init__(body)
+        self.headers = Message()
+        self.headers["Content-Type"] = content_type
+
+
+def serve(monkeypatch, body: bytes, content_type: str):
+    monkeypatch.setattr(_media.urllib.request, "urlopen", lambda request, timeout: Response(body, content_type))
+
+
+def test_sniff_type():
+    assert sniff_type(PNG) == "image/png"
+    assert sniff_type(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert sniff_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_type(b"GIF89a...") == "image/gif"
+    assert sniff_type(b"<svg xmlns='http://www.w3.org/2000/svg'/>") is None
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (b"<svg xmlns='http://www.w3.org/2000/svg'><script>alert(1)</script></svg>", "image/svg+xml"),
+    (b"<html></html>", "text/html"),
+    # A raster content type must come with raster bytes
+    (b"<html><script>alert(1)</script></html>", "image/png"),
+])
+def test_download_rejects_non_raster(monkeypatch, body, content_type):
+    serve(monkeypatch, body, content_type)
+    with pytest.raises(ValueError):
+        download("https://cdn.example/x")
+
+
+def test_download_stores_the_sniffed_type(monkeypatch):
+    serve(monkeypatch, PNG, "image/jpeg")
+    assert download("https://cdn.example/x.jpg") == (PNG, "image/png")
+
+
+def test_fetch_stores_original_and_thumbnails(r):
+    pytest.importorskip("PIL")
+    media = MediaCache(r)
+    with FakeCDN(size=400) as cdn:
+        digest = media.fetch(f"{cdn.base}/v/a.jpg")
+    assert r.hget(media_key(digest), "type") == "image/png"
+    assert {f"w{size}" for size in _media.THUMBNAIL_SIZES if size < 400} <= set(r.hkeys(media_key(digest)))
@@ -0,0 +1,74 @@
+"""Paged post likers/comments (serve_post_engagement in api/ig-refresh.py)."""
+
+import json
+
+import pytest
+
+SECRET = "engagement-secret"
+
+
+@pytest.fixture
+def serve(refresh, r, instagram, monkeypatch):
+    """GET ``?post=`` with an optional bearer token; returns ``(status, body)``."""
+    from bench_refresh import BenchHandler, SimulatedWait, create_bench_loader
+
+    instagram.comments = 30
+    monkeypatch.setattr(refresh, "get_redis_client", lambda: r)
+    monkeypatch.setattr(refresh, "POST_ENGAGEMENT_SECRET", SECRET)
+    create_loader = refresh.create_loader
+    monkeypatch.setattr(
+        refresh, "create_loader", lambda limiter: create_bench_loader(refresh, instagram, SimulatedWait(), create_loader, limiter)
+    )
+    monkeypatch.setattr(refresh, "load_session", lambda loader: True)
+    shortcode = instagram.post(0).shortcode
+    refresh.store_list(r, "ig:posts:alice", [{"shortcode": shortcode}])
+
+    def get(kind: str, cursor: int = 0, token: str | None = None):
+        bench = BenchHandler(refresh.handler)
+        bench.handler.path = f"/api/ig-refresh?account=alice&post={shortcode}&kind={kind}&cursor={cursor}"
+        bench.handler.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        bench.handler.do_GET()
+        return bench.status, json.loads(bench.handler.wfile.getvalue())
+
+    return get
+
+
+def test_anonymous_callers_only_get_cached_pages(serve, instagram):
+    assert serve("likers")[0] == 403
+    assert serve("likers", token="wrong")[0] == 403
+    assert instagram.requests == 0
+
+    status, page = serve("likers", token=SECRET)
+    assert status == 200 and len(page["items"]) == 8 and page["nextCursor"] is None
+    requests = instagram.requests
+    assert serve("likers") == (200, page)
+    assert instagram.requests == requests
+
+
+def test_offset_pages_reserve_every_request(refresh, serve, instagram, monkeypatch):
+    reserved = []
+    reserve = refresh.RequestScheduler.reserve
+
+    def record(scheduler, cost, *args, **kwargs):
+        reserved.append(cost)
+        return reserve(scheduler, cost, *args, **kwargs)
+
+    monkeypatch.setattr(refresh.RequestScheduler, "reserve", record)
+    items = []
+    cursor = 0
+    while cursor is not None:
+        before = instagram.requests
+        status, page = serve("comments", cursor, token=SECRET)
+        assert status == 200
+        # Resolving the post, re-reading every earlier page and looking one item ahead
+        assert instagram.requests - before <= reserved[-1] == 1 + cursor + 2
+        items.extend(page["items"])
+        cursor = page["nextCursor"]
+    assert len(items) == 30
+    assert len({comment["id"] for comment in items}) == 30
+
+
+def test_spent_budget_answers_429(refresh, serve, instagram, monkeypatch):
+    monkeypatch.setattr(refresh.RequestScheduler, "reserve", lambda *args, **kwargs: False)
+    assert serve("likers", token=SECRET)[0] == 429
+    assert instagram.requests == 0
@@ -0,0 +1,66 @@
+"""Streaming export of the local refresh script (scripts/refresh_instagram_data.py)."""
+
+import json
+import sqlite3
+
+import refresh_instagram_data as script
+
+
+def stream(loader, tmp_path):
+    return script.refresh_account(
+        loader, "anyone", 100, True, tmp_path, sqlite_path=tmp_path / "ig.db", stream=True, fetch_followers=True
+    )
+
+
+def test_interrupted_export_resumes_from_checkpoint(loader, instagram, tmp_path, monkeypatch):
+    post_record = script.post_record
+    exported = []
+
+    def interrupted(post):
+        if len(exported) == 4:
+            raise ConnectionError("connection reset")
+        exported.append(post.shortcode)
+        return post_record(post)
+
+    monkeypatch.setattr(script, "post_record", interrupted)
+    summary = stream(loader, tmp_path)
+    assert summary["error"] == "connection reset"
+    assert (tmp_path / "export" / "checkpoint.json").exists()
+    assert not (tmp_path / "posts.json").exists()
+
+    monkeypatch.setattr(script, "post_record", post_record)
+    instagram.reset()
+    summary = stream(loader, tmp_path)
+    assert summary["error"] is None and summary["posts"] == 6
+    # Only the two posts the first run never reached had their likers fetched
+    assert instagram.stats()["byType"]["likes"] == 2
+    assert not (tmp_path / "export").exists()
+
+    posts = json.loads((tmp_path / "posts.json").read_text(encoding="utf-8"))
+    assert [post["shortcode"] for post in posts] == [f"C{i:09d}" for i in range(6)]
+    assert all(len(post["likers"]) == 8 for post in posts)
+    followers = json.loads((tmp_path / "followers.json").read_text(encoding="utf-8"))
+    assert len({user["username"] for user in followers}) == len(followers) == 40
+
+    db = sqlite3.connect(tmp_path / "ig.db")
+    assert db.execute("SELECT count(*) FROM posts").fetchone() == (6,)
+    assert db.execute("SELECT count(*) FROM likes").fetchone() == (48,)
+    assert db.execute("SELECT count(*) FROM follows WHERE kind = 'followers'").fetchone() == (40,)
+    db.close()
+
+
+def test_export_posts_joins_likers_by_offset(tmp_path):
+    posts_log = script.NDJSONLog(tmp_path / "posts.ndjson")
+    likers_log = script.NDJSONLog(tmp_path / "likers.ndjson")
+    for shortcode in ("a", "b", "c"):
+        posts_log.append({"shortcode": shortcode})
+    likers_log.append({"shortcode": "c", "likers": [{"username": "carol"}]})
+    likers_log.append({"shortcode": "a", "likers": []})
+    posts_log.close()
+    likers_log.close()
+
+    assert list(script.export_posts(tmp_path)) == [
+        {"shortcode": "a", "likers": []},
+        {"shortcode": "b"},
+        {"shortcode": "c", "likers": [{"username": "carol"}]},
+    ]
@@ -0,0 +1,43 @@
+"""Request cost estimates of api/_scheduler.py against instaloader's real paging."""
+
+import sys
+from pathlib import Path
+
+import instaloader
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+from _scheduler import engagement_cost, pages  # noqa: E402
+
+
+class PagingContext:
+    """Just enough of an InstaloaderContext to page ``count`` nodes, counting requests."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.requests = 0
+
+    def graphql_query(self, query_hash, variables, referer=None):
+        self.requests += 1
+        start = int(variables.get("after") or 0)
+        end = min(self.count, start + variables["first"])
+        return {"data": {"edges": [{"node": {"id": i}} for i in range(start, end)], "page_info": {
+            "has_next_page": end < self.count,
+            "end_cursor": str(end),
+        }}}
+
+
+def requests_to_fetch(count: int) -> int:
+    context = PagingContext(count)
+    iterator = instaloader.NodeIterator(context, "query", lambda d: d["data"], lambda node: node)
+    assert len(list(iterator)) == count
+    return context.requests
+
+
+def test_pages_match_instaloader_requests():
+    for count in (1, 11, 12, 13, 50, 100, 1000):
+        assert pages(count) == requests_to_fetch(count)
+
+
+def test_engagement_cost_matches_instaloader_requests():
+    post = {"likeCount": 80, "commentCount": 30}
+    assert engagement_cost(post, 50, 50) == requests_to_fetch(50) + requests_to_fetch(30)
@@ -0,0 +1,46 @@
+"""Caption and comment search (api/_search.py)."""
+
+from _search import search, tokenize, update_search_index
+
+POSTS = [
+    {"shortcode": "p1", "caption": "Sunset at the beach #summer", "captionHashtags": ["summer"], "comments": [
+        {"id": "c1", "text": "Sunsets are the best", "replies": [{"id": "c2", "text": "agreed @alice"}]},
+    ]},
+    {"shortcode": "p2", "caption": "Sun and sand", "comments": []},
+    {"shortcode": "p3", "caption": "Rainy day indoors", "comments": [{"id": "c3", "text": "cozy beach vibes"}]},
+]
+
+
+def docs(results):
+    return [(result["shortcode"], result["commentId"]) for result in results]
+
+
+def test_tokenize():
+    assert list(tokenize("Hi #Summer @Alice a b")) == ["hi", "#summer", "summer", "@alice", "alice"]
+
+
+def test_prefix_matches_rank_below_exact(r):
+    update_search_index(r, "alice", POSTS)
+    results = search(r, "alice", "sun")
+    assert docs(results) == [("p2", None), ("p1", None), ("p1", "c1")]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_every_word_must_match(r):
+    update_search_index(r, "alice", POSTS)
+    assert docs(search(r, "alice", "beach sunset")) == [("p1", None)]
+    assert docs(search(r, "alice", "#summer")) == [("p1", None)]
+    assert docs(search(r, "alice", "@ali")) == [("p1", "c2")]
+    assert search(r, "alice", "beach snow") == []
+    assert search(r, "alice", "x") == []
+
+
+def test_changed_and_dropped_posts(r):
+    update_search_index(r, "alice", POSTS)
+    assert update_search_index(r, "alice", POSTS) == {"posts": 0, "terms": 0}
+
+    edited = [{**POSTS[0], "caption": "Sunrise", "captionHashtags": []}, POSTS[2]]
+    update_search_index(r, "alice", edited)
+    assert docs(search(r, "alice", "beach")) == [("p3", "c3")]
+    assert docs(search(r, "alice", "sun")) == [("p1", None), ("p1", "c1")]
+    assert search(r, "alice", "sand") == []
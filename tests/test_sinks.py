@@ -0,0 +1,59 @@
+"""Normalized SQLite sink (api/_sinks.py)."""
+
+import pytest
+
+from _sinks import SQLiteSink
+
+BOB = {"username": "bob", "fullName": "Bob", "profilePicUrl": "https://x/b.jpg", "isVerified": True, "isPrivate": False}
+CAROL = {"username": "carol", "fullName": "Carol", "profilePicUrl": None, "isVerified": False, "isPrivate": True}
+
+
+def post(shortcode, **fields):
+    return {"shortcode": shortcode, "timestamp": "2026-03-01T12:00:00Z", "caption": "hi #Sun", "likeCount": 2, **fields}
+
+
+def comment(id, owner, replies=()):
+    return {"id": id, "owner": owner, "text": "nice", "timestamp": "2026-03-01T13:00:00Z", "replies": list(replies)}
+
+
+@pytest.fixture
+def sink(tmp_path):
+    with SQLiteSink(tmp_path / "ig.db") as sink:
+        yield sink
+
+
+def rows(sink, sql):
+    return sink.conn.execute(sql).fetchall()
+
+
+def test_upserts_are_idempotent(sink):
+    posts = [post("p1", likers=[BOB, CAROL], comments=[comment("c1", CAROL, [comment("c2", BOB)])])]
+    written = sink.write_posts("alice", posts)
+    snapshot = [rows(sink, f"SELECT * FROM {table} ORDER BY 1, 2") for table in ("posts", "users", "likes", "comments", "post_hashtags")]
+
+    assert sink.write_posts("alice", posts) == written
+    assert [rows(sink, f"SELECT * FROM {table} ORDER BY 1, 2") for table in ("posts", "users", "likes", "comments", "post_hashtags")] == snapshot
+    assert rows(sink, "SELECT hashtag FROM post_hashtags") == [("sun",)]
+    assert [c["id"] for c in sink.comments_by("bob")] == ["c2"]
+
+    assert sink.write_follow_list("alice", "followers", [BOB, CAROL]) == 2
+    assert sink.write_follow_list("alice", "followers", [CAROL]) == 1
+    assert rows(sink, "SELECT username FROM follows") == [("carol",)]
+
+
+def test_partial_payload_keeps_missing_children(sink):
+    sink.write_posts("alice", [post("p1", likers=[BOB, CAROL], comments=[comment("c1", CAROL)])])
+
+    # A script refresh: a sample of likers without isVerified/isPrivate, no comments
+    bob = {"username": "bob", "fullName": "Bob", "profilePicUrl": "https://x/b2.jpg"}
+    sink.write_posts("alice", [post("p1", likeCount=3, likers=[bob])])
+    assert rows(sink, "SELECT username FROM likes") == [("bob",)]
+    assert rows(sink, "SELECT id FROM comments") == [("c1",)]
+    assert rows(sink, "SELECT profile_pic_url, is_verified, is_private FROM users WHERE username = 'bob'") == [
+        ("https://x/b2.jpg", 1, 0),
+    ]
+
+    # Metadata only (lazy engagement): likes stay too
+    sink.write_posts("alice", [post("p1", likeCount=4)])
+    assert rows(sink, "SELECT username FROM likes") == [("bob",)]
+    assert rows(sink, "SELECT like_count FROM posts") == [(4,)]
@@ -0,0 +1,67 @@
+"""Keyframe/delta snapshot archive (api/_snapshots.py)."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from _snapshots import (
+    FileSnapshotStore,
+    RedisSnapshotStore,
+    gains,
+    iter_snapshots,
+    record_snapshot,
+    snapshot_state,
+    state_at,
+)
+
+DAY = datetime(2026, 3, 1, tzinfo=timezone.utc).timestamp()
+
+
+def profile(followers):
+    return {"followersCount": followers, "followingCount": 50, "postsCount": 2}
+
+
+def post(shortcode, likes, comments=0):
+    return {"shortcode": shortcode, "likeCount": likes, "commentCount": comments, "videoViewCount": None}
+
+
+REFRESHES = [
+    (DAY + 3600, profile(100), [post("a", 10), post("b", 5)]),
+    (DAY + 7200, profile(100), [post("a", 10), post("b", 5)]),
+    (DAY + 10800, profile(104), [post("a", 12), post("b", 5)]),
+    (DAY + 14400, profile(104), [post("a", 12), post("c", 1)]),
+    (DAY + 86400 + 3600, profile(110), [post("a", 15), post("c", 3, 1)]),
+]
+
+
+@pytest.fixture(params=["redis", "file"])
+def store(request, r, tmp_path):
+    return RedisSnapshotStore(r, "alice") if request.param == "redis" else FileSnapshotStore(tmp_path)
+
+
+def test_deltas_reconstruct_every_snapshot(store):
+    records = [record_snapshot(store, p, posts, at=at) for at, p, posts in REFRESHES]
+    assert records[0]["base"] is True
+    assert records[1] is None
+    assert records[2] == {"at": REFRESHES[2][0], "profile": {"followersCount": 104}, "posts": {"a": [12, 0, None]}}
+    assert records[3]["removed"] == ["b"] and records[3]["posts"] == {"c": [1, 0, None]}
+    assert records[4]["base"] is True
+
+    expected = [(at, snapshot_state(p, posts)) for i, (at, p, posts) in enumerate(REFRESHES) if records[i]]
+    assert list(iter_snapshots(store, DAY, DAY + 2 * 86400)) == expected
+
+
+def test_state_at_and_gains(store):
+    for at, p, posts in REFRESHES:
+        record_snapshot(store, p, posts, at=at)
+    at, state = state_at(store, DAY + 12000)
+    assert at == REFRESHES[2][0]
+    assert state == snapshot_state(REFRESHES[2][1], REFRESHES[2][2])
+    # The day-two lookup falls back to day one's last snapshot
+    assert state_at(store, DAY + 86400 + 60)[0] == REFRESHES[3][0]
+
+    delta = gains(store, DAY + 12000)
+    assert delta["profile"]["followersCount"] == 6
+    assert delta["posts"]["a"]["likeCount"] == 3
+    # c is newer than the base snapshot, so it counts from zero
+    assert delta["posts"]["c"] == {"likeCount": 3, "commentCount": 1, "videoViewCount": None}
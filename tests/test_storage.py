@@ -0,0 +1,128 @@
+"""Chunked list storage (store_list/load_list) in api/ig-refresh.py."""
+
+import json
+
+
+def manifest(r, key):
+    return json.loads(r.get(f"{key}:manifest"))
+
+
+def test_round_trip_in_chunks(refresh, r):
+    items = [{"id": str(i)} for i in range(25)]
+    assert refresh.store_list(r, "ig:followers:alice", iter(items), chunk_size=10) == 25
+    stored = manifest(r, "ig:followers:alice")
+    assert stored["count"] == 25
+    assert len(stored["chunks"]) == 3
+    assert refresh.load_list(r, "ig:followers:alice") == items
+
+
+def test_unchanged_chunks_are_reused(refresh, r):
+    items = [str(i) for i in range(30)]
+    refresh.store_list(r, "ig:followers:alice", items, chunk_size=10)
+    first = manifest(r, "ig:followers:alice")
+
+    items[25] = "changed"
+    refresh.store_list(r, "ig:followers:alice", items, chunk_size=10)
+    second = manifest(r, "ig:followers:alice")
+
+    assert second["chunks"][:2] == first["chunks"][:2]
+    assert second["chunks"][2] != first["chunks"][2]
+    assert second["version"] == first["version"] + 1
+    assert refresh.load_list(r, "ig:followers:alice") == items
+
+
+def test_identical_list_keeps_version(refresh, r):
+    items = [str(i) for i in range(15)]
+    refresh.store_list(r, "ig:following:alice", items, chunk_size=10)
+    first = manifest(r, "ig:following:alice")
+    refresh.store_list(r, "ig:following:alice", items, chunk_size=10)
+    second = manifest(r, "ig:following:alice")
+    assert second["chunks"] == first["chunks"]
+    assert second["version"] == first["version"]
+
+
+def test_manifest_swap_expires_superseded_chunks(refresh, r):
+    refresh.store_list(r, "ig:followers:alice", [str(i) for i in range(20)], chunk_size=10)
+    old = manifest(r, "ig:followers:alice")["chunks"]
+    refresh.store_list(r, "ig:followers:alice", ["x"], chunk_size=10)
+    new = manifest(r, "ig:followers:alice")["chunks"]
+
+    assert refresh.load_list(r, "ig:followers:alice") == ["x"]
+    for chunk_id in set(old) - set(new):
+        ttl = r.ttl(f"ig:followers:alice:chunk:{chunk_id}")
+        assert 0 < ttl <= refresh.SUPERSEDED_CHUNK_TTL
+
+
+def test_missing_chunk_loads_as_none(refresh, r):
+    refresh.store_list(r, "ig:followers:alice", [str(i) for i in range(20)], chunk_size=10)
+    chunk_id = manifest(r, "ig:followers:alice")["chunks"][1]
+    r.delete(f"ig:followers:alice:chunk:{chunk_id}")
+    assert refresh.load_list(r, "ig:followers:alice") is None
+
+
+def test_falls_back_to_single_blob(refresh, r):
+    r.set("ig:followers:alice", json.dumps(["a", "b"]))
+    assert refresh.load_list(r, "ig:followers:alice") == ["a", "b"]
+
+
+def signed(path, signature):
+    return f"https://scontent.cdninstagram.com/{path}.jpg?stp=dst-jpg&oh={signature}&oe=6700AB12&_nc_ht=x"
+
+
+def test_resigned_urls_keep_the_stored_payload(refresh, r):
+    profile = {"username": "alice", "profilePicUrl": signed("a", "1")}
+    assert refresh.store_data(r, "ig:profile:alice", profile)
+    assert not refresh.store_data(r, "ig:profile:alice", {**profile, "profilePicUrl": signed("a", "2")})
+    assert refresh.store_data(r, "ig:profile:alice", {**profile, "profilePicUrl": signed("b", "2")})
+    assert r.hget("ig:profile:alice:meta", "version") == "2"
+
+
+def test_resigned_urls_are_rewritten_in_a_new_period(refresh, r, monkeypatch):
+    profile = {"username": "alice", "profilePicUrl": signed("a", "1")}
+    refresh.store_data(r, "ig:profile:alice", profile)
+    monkeypatch.setattr(refresh, "url_epoch", lambda: 10**9)
+    assert refresh.store_data(r, "ig:profile:alice", {**profile, "profilePicUrl": signed("a", "2")})
+    assert refresh.load_list(r, "ig:profile:alice")["profilePicUrl"] == signed("a", "2")
+
+
+def test_format_change_rewrites(refresh, r, monkeypatch):
+    refresh.store_data(r, "ig:stats:alice", {"posts": 3})
+    refresh.store_list(r, "ig:followers:alice", [str(i) for i in range(20)], chunk_size=10)
+    chunks = manifest(r, "ig:followers:alice")["chunks"]
+    assert not refresh.store_data(r, "ig:stats:alice", {"posts": 3})
+
+    monkeypatch.setattr(refresh, "STORAGE_FORMAT", "json")
+    assert refresh.store_data(r, "ig:stats:alice", {"posts": 3})
+    assert r.hget("ig:stats:alice:meta", "format") == "json"
+    assert r.hget("ig:stats:alice:meta", "version") == "1"
+    assert refresh.binary_client(r).get("ig:stats:alice")[len(refresh.ENVELOPE_MAGIC) + 1] == 0
+    refresh.store_list(r, "ig:followers:alice", [str(i) for i in range(20)], chunk_size=10)
+    assert not set(manifest(r, "ig:followers:alice")["chunks"]) & set(chunks)
+    assert manifest(r, "ig:followers:alice")["version"] == 1
+
+
+class User:
+    def __init__(self, userid, picture):
+        self.userid = userid
+        self.username = f"user{userid}"
+        self.full_name = None
+        self.profile_pic_url = picture
+        self.is_verified = False
+        self.is_private = False
+
+
+def test_user_rows_ignore_resigned_pictures(refresh, r):
+    users = refresh.UserTable(r, username="alice")
+    user_id = users.intern(User(1, signed("u1", "1")))
+    users.flush()
+
+    users = refresh.UserTable(r, username="alice")
+    users.intern(User(1, signed("u1", "2")))
+    users.flush()
+    assert signed("u1", "1") in r.hget("ig:users:alice", user_id)
+    assert r.hget("ig:users:alice:meta", "version") == "1"
+
+    users = refresh.UserTable(r, username="alice")
+    users.intern(User(1, signed("u1-new", "2")))
+    users.flush()
+    assert signed("u1-new", "2") in r.hget("ig:users:alice", user_id)